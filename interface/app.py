@@ -35,6 +35,9 @@ try:
     from vanna_core import inicializar_vanna_para_interface
     from auth.auth_utils import login, logout
     from utils.session_cleanup_controller import SessionCleanupController
+    from kpis_materializados import iniciar_agendador
+    from snapshots_kpis import iniciar_agendador as iniciar_agendador_snapshots
+    from motor_alertas import iniciar_agendador as iniciar_agendador_alertas
     render_logger.info("✅ [IMPORT] Módulos principais importados com sucesso")
 except ImportError as e:
     render_logger.error(f"❌ [IMPORT] Erro ao importar módulos principais: {e}")
@@ -74,6 +77,13 @@ def main():
         # Inicia monitor leve de sessão
         cleanup_controller.start_session_monitor()
         
+        # Refresh das views de KPIs materializados (uma thread por processo)
+        iniciar_agendador()
+        # Histórico de KPIs (snapshot periódico dos valores)
+        iniciar_agendador_snapshots()
+        # Avaliação periódica dos alertas (a página só lê o estado gravado)
+        iniciar_agendador_alertas()
+        
         st.session_state.cleanup_registrado = True
         print("🔧 [INIT] Sistema de cleanup otimizado ativado")
         render_logger.info("🔧 [CLEANUP] Sistema de cleanup otimizado ativado")
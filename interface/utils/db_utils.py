@@ -1,5 +1,4 @@
 # db_utils.py – conexão com banco e funções auxiliares
-import psycopg2
 import os
 import logging
 import sys
@@ -32,25 +31,27 @@ render_logger.info(f"🔧 [ENV] Caminho do .env: {os.path.abspath(env_path)}")
 load_dotenv(dotenv_path=os.path.abspath(env_path))
 render_logger.info("✅ [ENV] Variáveis de ambiente carregadas")
 
-def conectar_db():
-    """Conexão psycopg2 para queries diretas (compatibilidade)"""
-    render_logger.info("🔌 [DB] Iniciando conexão com banco PostgreSQL")
+# Pool de conexões compartilhado (src/pool_conexoes.py)
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+from pool_conexoes import obter_conexao
+from armazenamento_clientes import opcoes_conexao, usa_schema_por_cliente, schema_do_cliente
+
+def conectar_db(id_client: int = None):
+    """Conexão psycopg2 emprestada do pool compartilhado (conn.close() devolve ao pool)"""
+    render_logger.info("🔌 [DB] Obtendo conexão do pool PostgreSQL")
     try:
-        conn = psycopg2.connect(
-            dbname=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            host=os.getenv("DB_HOST"),
-            port=os.getenv("DB_PORT")
-        )
-        render_logger.info("✅ [DB] Conexão PostgreSQL estabelecida com sucesso")
+        conn = obter_conexao(id_client)
+        render_logger.info("✅ [DB] Conexão PostgreSQL obtida do pool")
         return conn
     except Exception as e:
         render_logger.error(f"❌ [DB] Erro ao conectar com PostgreSQL: {e}")
         raise
 
-def criar_engine() -> Engine:
-    """Cria engine SQLAlchemy para uso com pandas.to_sql()"""
+def criar_engine(id_client: int = None) -> Engine:
+    """
+    Cria engine SQLAlchemy para uso com pandas.to_sql().
+    Com id_client e TENANT_STORAGE=schema, as conexões usam o search_path do cliente.
+    """
     render_logger.info("🔧 [DB] Criando engine SQLAlchemy")
     
     db_user = os.getenv("DB_USER")
@@ -71,8 +72,12 @@ def criar_engine() -> Engine:
             max_overflow=10,
             pool_timeout=30,
             pool_recycle=3600,
-            echo=False  # Mude para True se quiser logs SQL
+            echo=False,  # Mude para True se quiser logs SQL
+            connect_args=opcoes_conexao(id_client)
         )
+        if usa_schema_por_cliente() and id_client is not None:
+            with engine.begin() as conn:
+                conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{schema_do_cliente(id_client)}"'))
         render_logger.info("✅ [DB] Engine SQLAlchemy criada com sucesso")
         return engine
     except Exception as e:
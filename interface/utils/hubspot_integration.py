@@ -217,13 +217,19 @@ class HubSpotIntegration:
             st.error(f"❌ Erro na requisição de empresas: {e}")
             return pd.DataFrame()
 
-def salvar_dados_hubspot_usuario(df: pd.DataFrame, nome_tabela: str, id_client: int) -> bool:
-    """Salva dados do HubSpot na tabela específica do usuário usando SQLAlchemy"""
+def salvar_dados_hubspot_usuario(df: pd.DataFrame, nome_tabela: str, id_client: int,
+                                 incremental: bool = False) -> bool:
+    """
+    Salva dados do HubSpot na tabela específica do usuário usando SQLAlchemy.
+    Com incremental=True e a tabela já existente, faz upsert pelo id_hubspot
+    em vez de recriar a tabela inteira.
+    """
     
     try:
         # Import usando caminho relativo correto
         from db_utils import criar_engine
-        from sqlalchemy import text
+        from sqlalchemy import text, inspect
+        from armazenamento_clientes import schema_da_tabela
         
         # CORREÇÃO: Validar id_client primeiro
         if not id_client or id_client <= 0:
@@ -253,7 +259,8 @@ def salvar_dados_hubspot_usuario(df: pd.DataFrame, nome_tabela: str, id_client:
         st.info(f"   • Registros para salvar: {len(df)}")
         
         # Cria engine SQLAlchemy
-        engine = criar_engine()
+        engine = criar_engine(id_client)
+        schema = schema_da_tabela(nome_tabela_final)
         st.info("✅ Engine SQLAlchemy criada!")
         
         # Testa a conexão
@@ -265,14 +272,45 @@ def salvar_dados_hubspot_usuario(df: pd.DataFrame, nome_tabela: str, id_client:
         # Salva o DataFrame no PostgreSQL usando SQLAlchemy
         st.info("💾 Iniciando salvamento...")
         
-        df.to_sql(
-            name=nome_tabela_final,
-            con=engine,
-            if_exists='replace',
-            index=False,
-            method='multi',  # Otimização para inserções em lote
-            chunksize=1000   # Processa em chunks para DataFrames grandes
-        )
+        if incremental and inspect(engine).has_table(nome_tabela_final, schema=schema):
+            # Upsert: só grava contatos/deals/empresas novos ou alterados
+            from importacao_incremental import importar_dataframe_incremental
+            
+            raw_conn = engine.raw_connection()
+            try:
+                stats = importar_dataframe_incremental(
+                    raw_conn, df, nome_tabela_final,
+                    chave=["id_hubspot"],
+                    ignorar_no_hash=["importado_em"]
+                )
+            finally:
+                raw_conn.close()
+            st.info(f"🔁 {stats['inseridos']} inseridos, {stats['atualizados']} atualizados, "
+                    f"{stats['inalterados']} inalterados")
+        else:
+            from kpis_materializados import remover_views_dependentes
+            
+            # views de KPI sobre a tabela bloqueariam o replace (DROP TABLE)
+            raw_conn = engine.raw_connection()
+            try:
+                cursor = raw_conn.cursor()
+                remover_views_dependentes(cursor, nome_tabela_final)
+                raw_conn.commit()
+                cursor.close()
+            finally:
+                raw_conn.close()
+            df.to_sql(
+                name=nome_tabela_final,
+                con=engine,
+                schema=schema,
+                if_exists='replace',
+                index=False,
+                method='multi',  # Otimização para inserções em lote
+                chunksize=1000   # Processa em chunks para DataFrames grandes
+            )
+        
+        from kpis_materializados import notificar_importacao
+        notificar_importacao(nome_tabela_final)
         
         st.info("✅ Dados salvos com sucesso!")
         
@@ -285,6 +323,13 @@ def salvar_dados_hubspot_usuario(df: pd.DataFrame, nome_tabela: str, id_client:
         # Dispose da engine para liberar recursos
         engine.dispose()
         
+        # Tabela recriada: descarta o catálogo em cache do cliente
+        try:
+            from catalogo_schema import invalidar_cache
+            invalidar_cache(id_client)
+        except ImportError:
+            pass
+        
         return True
         
     except ImportError as e:
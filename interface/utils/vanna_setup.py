@@ -16,24 +16,19 @@ load_dotenv()
 def verificar_tabela_existe(nome_tabela: str) -> bool:
     """Verifica se uma tabela existe no banco de dados"""
     try:
-        import psycopg2
+        from pool_conexoes import obter_conexao
+        from armazenamento_clientes import schema_da_tabela
         
-        conn = psycopg2.connect(
-            dbname=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            host=os.getenv("DB_HOST"),
-            port=os.getenv("DB_PORT")
-        )
+        conn = obter_conexao()
         
         cursor = conn.cursor()
         cursor.execute("""
             SELECT EXISTS (
                 SELECT FROM information_schema.tables 
-                WHERE table_schema = 'public' 
+                WHERE table_schema = %s 
                 AND table_name = %s
             );
-        """, (nome_tabela,))
+        """, (schema_da_tabela(nome_tabela), nome_tabela))
         
         existe = cursor.fetchone()[0]
         cursor.close()
@@ -48,31 +43,10 @@ def verificar_tabela_existe(nome_tabela: str) -> bool:
 def verificar_usuario_tem_dados(id_client: int) -> dict:
     """Verifica quais dados o usuário possui no banco"""
     try:
-        import psycopg2
+        from catalogo_schema import obter_tabelas
         
-        conn = psycopg2.connect(
-            dbname=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            host=os.getenv("DB_HOST"),
-            port=os.getenv("DB_PORT")
-        )
-        
-        cursor = conn.cursor()
-        
-        # Busca todas as tabelas do usuário
-        cursor.execute("""
-            SELECT table_name
-            FROM information_schema.tables 
-            WHERE table_schema = 'public' 
-            AND table_name LIKE %s
-            ORDER BY table_name
-        """, (f"cli{id_client:02d}_%",))
-        
-        tabelas = [row[0] for row in cursor.fetchall()]
-        
-        cursor.close()
-        conn.close()
+        # Busca todas as tabelas do usuário (catálogo em cache)
+        tabelas = obter_tabelas(id_client)
         
         dados = {
             "tabelas": tabelas,
@@ -93,6 +67,7 @@ def setup_treinamento_cliente_interface(id_client: int, config: dict):
     Recebe configurações via dict config em vez de perguntar ao usuário
     """
     from vanna.remote import VannaDefault
+    from armazenamento_clientes import opcoes_conexao
     from vanna_core import (
         gerar_plan_treinamento, 
         treinar_com_kpis, 
@@ -107,7 +82,8 @@ def setup_treinamento_cliente_interface(id_client: int, config: dict):
         port=os.getenv("DB_PORT"),
         dbname=os.getenv("DB_NAME"),
         user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD")
+        password=os.getenv("DB_PASSWORD"),
+        **opcoes_conexao(id_client)
     )
 
     # 1) tenta carregar plano salvo
@@ -297,74 +273,17 @@ def obter_resumo_configuracao(config: dict) -> dict:
     
     return resumo
 
-def verificar_integridade_cliente(id_client: int) -> dict:
-    """Verifica a integridade dos dados de um cliente específico"""
+def verificar_integridade_cliente(id_client: int, contagem_exata: bool = False) -> dict:
+    """
+    Verifica a integridade dos dados de um cliente específico.
+    Linhas por tabela vêm das estatísticas do catálogo (estimadas, uma única
+    consulta); contagem_exata=True dispara COUNT(*) em segundo plano
+    (ver visao_geral_cliente.obter_contagem_exata).
+    """
     try:
-        import psycopg2
-        
-        conn = psycopg2.connect(
-            dbname=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            host=os.getenv("DB_HOST"),
-            port=os.getenv("DB_PORT")
-        )
+        from visao_geral_cliente import obter_visao_geral
         
-        cursor = conn.cursor()
-        
-        # 1. Verifica se o usuário existe
-        cursor.execute("SELECT id, nome, email FROM usuarios WHERE id = %s", (id_client,))
-        usuario = cursor.fetchone()
-        
-        if not usuario:
-            cursor.close()
-            conn.close()
-            return {"erro": f"Usuário com ID {id_client} não encontrado"}
-        
-        # 2. Busca todas as tabelas do usuário
-        cursor.execute("""
-            SELECT table_name, 
-                   (SELECT COUNT(*) FROM information_schema.columns WHERE table_name = t.table_name) as colunas
-            FROM information_schema.tables t
-            WHERE table_schema = 'public' 
-            AND table_name LIKE %s
-            ORDER BY table_name
-        """, (f"cli{id_client:02d}_%",))
-        
-        tabelas_info = cursor.fetchall()
-        
-        # 3. Conta registros em cada tabela
-        tabelas_detalhes = []
-        for nome_tabela, num_colunas in tabelas_info:
-            try:
-                cursor.execute(f'SELECT COUNT(*) FROM "{nome_tabela}"')
-                num_registros = cursor.fetchone()[0]
-                tabelas_detalhes.append({
-                    "nome": nome_tabela,
-                    "colunas": num_colunas,
-                    "registros": num_registros,
-                    "tipo": "kpis" if "kpis" in nome_tabela else "dados"
-                })
-            except Exception as e:
-                tabelas_detalhes.append({
-                    "nome": nome_tabela,
-                    "colunas": num_colunas,
-                    "registros": 0,
-                    "tipo": "erro",
-                    "erro": str(e)
-                })
-        
-        cursor.close()
-        conn.close()
-        
-        return {
-            "usuario": {"id": usuario[0], "nome": usuario[1], "email": usuario[2]},
-            "tabelas": tabelas_detalhes,
-            "total_tabelas": len(tabelas_detalhes),
-            "tem_dados": len(tabelas_detalhes) > 0,
-            "tem_kpis": any(t["tipo"] == "kpis" for t in tabelas_detalhes),
-            "prefixo_esperado": f"cli{id_client:02d}_"
-        }
+        return obter_visao_geral(id_client, contagem_exata=contagem_exata)
         
     except Exception as e:
         logging.error(f"Erro ao verificar integridade do cliente {id_client}: {e}")
@@ -373,15 +292,9 @@ def verificar_integridade_cliente(id_client: int) -> dict:
 def criar_estrutura_basica_cliente(id_client: int) -> bool:
     """Cria estrutura básica para um cliente (tabelas KPIs, etc.)"""
     try:
-        import psycopg2
+        from pool_conexoes import obter_conexao
         
-        conn = psycopg2.connect(
-            dbname=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            host=os.getenv("DB_HOST"),
-            port=os.getenv("DB_PORT")
-        )
+        conn = obter_conexao(id_client)
         
         cursor = conn.cursor()
         
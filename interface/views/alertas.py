@@ -4,12 +4,10 @@ import streamlit as st
 import pandas as pd
 import os
 import sys
-import json
 import logging
 from datetime import datetime, timedelta
 import plotly.express as px
 import plotly.graph_objects as go
-import contextlib
 
 # 🔧 [LOGGING] Configuração de logging para Render
 def setup_render_logging():
@@ -32,21 +30,12 @@ render_logger = setup_render_logging()
 
 # Adicionar src ao path para importar funções
 sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "src"))
-from import_csv import conectar_banco
-
-@contextlib.contextmanager
-def get_db_connection():
-    """Context manager para conexões de banco de dados"""
-    conn = None
-    try:
-        conn = conectar_banco()
-        yield conn
-    except Exception as e:
-        st.error(f"Erro de conexão com banco: {e}")
-        yield None
-    finally:
-        if conn:
-            conn.close()
+from catalogo_schema import obter_colunas_tabela as catalogo_obter_colunas, obter_tabelas
+from motor_alertas import (
+    status_alertas, verificar_cliente_com_lock, executar_query_alerta, avaliar_condicao_alerta, notificar_alteracao,
+    validar_sql_seguro, sql_ia_em_cache, guardar_sql_ia_validado
+)
+import repositorio_alertas
 
 def mostrar_alertas():
     st.title("🚨 Central de Alertas")
@@ -68,38 +57,41 @@ def mostrar_alertas():
     nome_usuario = st.session_state.get("name", "usuário")
     render_logger.info(f"✅ [ALERTAS] Usuário autenticado: {nome_usuario} (ID: {client_id})")
     
-    # Obter alertas para verificar status
-    alertas_ativos = obter_alertas_usuario(client_id)
-    alertas_disparados = []
-    alertas_erro = []
-    
-    if alertas_ativos:
-        alertas_status = verificar_todos_alertas(client_id, alertas_ativos)
-        alertas_disparados = [a for a in alertas_status if a['status'] == 'DISPARADO']
-        alertas_erro = [a for a in alertas_status if a['status'] == 'ERRO']
+    # Último status gravado pelo agendador de alertas (nenhuma consulta aqui)
+    try:
+        alertas_status = status_alertas(client_id)
+    except Exception as e:
+        st.error(f"Erro ao carregar status dos alertas: {e}")
+        alertas_status = []
+    alertas_disparados = [a for a in alertas_status if a['status'] == 'DISPARADO']
+    alertas_erro = [a for a in alertas_status if a['status'] in ('ERRO', 'TIMEOUT')]
     
     # Banner de status dos alertas no topo
-    if alertas_disparados or alertas_erro:
-        col_banner1, col_banner2 = st.columns([3, 1])
-        
-        with col_banner1:
-            if alertas_disparados:
-                st.error(f"🚨 **{len(alertas_disparados)} alerta(s) disparado(s)!** Verifique o dashboard abaixo.")
-            if alertas_erro:
-                st.warning(f"⚠️ **{len(alertas_erro)} alerta(s) com erro.** Verifique as configurações.")
-        
-        with col_banner2:
-            # Botão para verificar alertas manualmente
-            if st.button("🔄 Atualizar Status", type="secondary"):
+    col_banner1, col_banner2 = st.columns([3, 1])
+    
+    with col_banner1:
+        if alertas_disparados:
+            st.error(f"🚨 **{len(alertas_disparados)} alerta(s) disparado(s)!** Verifique o dashboard abaixo.")
+        if alertas_erro:
+            st.warning(f"⚠️ **{len(alertas_erro)} alerta(s) com erro.** Verifique as configurações.")
+        if not alertas_disparados and not alertas_erro:
+            st.success("✅ **Todos os alertas estão normais!**")
+    
+    with col_banner2:
+        # Verifica agora todos os alertas (inclusive os de frequência manual)
+        if st.button("🔄 Atualizar Status", type="secondary"):
+            with st.spinner("Verificando alertas..."):
+                estados = verificar_cliente_com_lock(client_id, forcar=True)
+            if estados is None:
+                st.info("Os alertas já estão sendo verificados. Tente novamente em instantes.")
+            else:
                 st.rerun()
-    else:
-        st.success("✅ **Todos os alertas estão normais!**")
     
     # Tabs para organizar funcionalidades
     tab1, tab2, tab3, tab4 = st.tabs(["📊 Dashboard de Alertas", "⚙️ Configurar Alertas", "🤖 Alertas com IA", "📋 Histórico"])
     
     with tab1:
-        mostrar_dashboard_alertas(client_id)
+        mostrar_dashboard_alertas(client_id, alertas_status)
     
     with tab2:
         configurar_alertas(client_id)
@@ -110,26 +102,24 @@ def mostrar_alertas():
     with tab4:
         mostrar_historico_alertas(client_id)
 
-def mostrar_dashboard_alertas(client_id: int):
-    """Dashboard principal com status dos alertas"""
+def mostrar_dashboard_alertas(client_id: int, alertas_status: list = None):
+    """Dashboard principal com status dos alertas (estado gravado pelo agendador)"""
     st.subheader("📊 Status dos Alertas")
     
-    alertas_ativos = obter_alertas_usuario(client_id)
+    if alertas_status is None:
+        alertas_status = status_alertas(client_id)
     
-    if not alertas_ativos:
+    if not alertas_status:
         st.info("📝 Nenhum alerta configurado. Vá para a aba 'Configurar Alertas' para criar seu primeiro alerta!")
         return
     
-    # Verifica status de cada alerta
-    alertas_status = verificar_todos_alertas(client_id, alertas_ativos)
-    
     # Métricas em cards
     col1, col2, col3, col4 = st.columns(4)
     
     total_alertas = len(alertas_status)
     alertas_disparados = sum(1 for a in alertas_status if a['status'] == 'DISPARADO')
     alertas_normais = sum(1 for a in alertas_status if a['status'] == 'NORMAL')
-    alertas_erro = sum(1 for a in alertas_status if a['status'] == 'ERRO')
+    alertas_erro = sum(1 for a in alertas_status if a['status'] in ('ERRO', 'TIMEOUT'))
     
     with col1:
         st.metric("Total de Alertas", total_alertas)
@@ -147,7 +137,9 @@ def mostrar_dashboard_alertas(client_id: int):
         status_color = {
             'DISPARADO': '🔴',
             'NORMAL': '🟢', 
-            'ERRO': '🟡'
+            'ERRO': '🟡',
+            'TIMEOUT': '🟠',
+            'PENDENTE': '⚪'
         }.get(alerta['status'], '⚫')
         
         with st.expander(f"{status_color} {alerta['nome']} - {alerta['status']}"):
@@ -174,7 +166,11 @@ def mostrar_dashboard_alertas(client_id: int):
             
             with col2:
                 st.write(f"**Valor Atual:** {alerta.get('valor_atual', 'N/A')}")
-                st.write(f"**Última Verificação:** {alerta.get('ultima_verificacao', 'N/A')}")
+                st.write(f"**Última Verificação:** {alerta.get('ultima_verificacao') or 'N/A'}")
+                if alerta.get('segundos') is not None:
+                    st.write(f"**Tempo de Avaliação:** {alerta['segundos'] * 1000:.0f} ms")
+                if alerta.get('proxima_verificacao'):
+                    st.write(f"**Próxima Verificação:** {alerta['proxima_verificacao']:%Y-%m-%d %H:%M:%S}")
                 
                 # Status do alerta
                 if alerta['status'] == 'DISPARADO':
@@ -183,7 +179,11 @@ def mostrar_dashboard_alertas(client_id: int):
                         st.error(f"Valor {alerta['valor_atual']} {alerta['condicao'].lower()} {alerta['valor_limite']}")
                 elif alerta['status'] == 'ERRO':
                     st.warning(f"❌ **Erro ao verificar:**")
-                    st.warning(alerta.get('erro', 'Erro desconhecido'))
+                    st.warning(alerta.get('erro') or 'Erro desconhecido')
+                elif alerta['status'] == 'TIMEOUT':
+                    st.warning(f"⏱️ **Consulta excedeu o tempo limite:** {alerta.get('erro') or ''}")
+                elif alerta['status'] == 'PENDENTE':
+                    st.info("⏳ **Aguardando a primeira verificação**")
                 else:
                     st.success("✅ **Status Normal**")
                 
@@ -509,37 +509,38 @@ def configurar_alertas(client_id: int):
                 st.rerun()
 
 def mostrar_historico_alertas(client_id: int):
-    """Mostra histórico de alertas disparados"""
+    """Mostra histórico de alertas disparados (paginado)"""
     st.subheader("📋 Histórico de Alertas")
     
-    historico = obter_historico_alertas(client_id)
-    
-    if not historico:
-        st.info("Nenhum histórico de alertas encontrado.")
-        return
-    
     # Filtros
-    col1, col2 = st.columns(2)
+    col1, col2, col3 = st.columns(3)
     with col1:
         periodo = st.selectbox("Período", ["Últimos 7 dias", "Últimos 30 dias", "Todos"])
     with col2:
         status_filtro = st.selectbox("Status", ["Todos", "Disparados", "Resolvidos"])
     
+    desde = None
+    if periodo == "Últimos 7 dias":
+        desde = datetime.now() - timedelta(days=7)
+    elif periodo == "Últimos 30 dias":
+        desde = datetime.now() - timedelta(days=30)
+    status = {"Disparados": "DISPARADO", "Resolvidos": "RESOLVIDO"}.get(status_filtro)
+    
+    with col3:
+        pagina = st.number_input("Página", min_value=1, value=1, step=1, key="historico_alertas_pagina")
+    
+    historico = obter_historico_alertas(client_id, desde, status, int(pagina))
+    
+    if not historico["total"]:
+        st.info("Nenhum histórico de alertas encontrado.")
+        return
+    
+    st.caption(f"{historico['total']} registros · página {historico['pagina']} de {historico['paginas']}")
+    
     # Tabela de histórico
-    df_historico = pd.DataFrame(historico)
+    df_historico = pd.DataFrame(historico["itens"])
     
     if not df_historico.empty:
-        # Aplica filtros
-        if periodo == "Últimos 7 dias":
-            data_limite = datetime.now() - timedelta(days=7)
-            df_historico = df_historico[pd.to_datetime(df_historico['data']) >= data_limite]
-        elif periodo == "Últimos 30 dias":
-            data_limite = datetime.now() - timedelta(days=30)
-            df_historico = df_historico[pd.to_datetime(df_historico['data']) >= data_limite]
-        
-        if status_filtro != "Todos":
-            df_historico = df_historico[df_historico['status'] == status_filtro.upper()]
-        
         st.dataframe(
             df_historico,
             use_container_width=True,
@@ -551,15 +552,19 @@ def mostrar_historico_alertas(client_id: int):
                 "limite": st.column_config.NumberColumn("Limite")
             }
         )
+    
+    # Gráfico de alertas por dia (agregado no banco, todo o período filtrado)
+    try:
+        por_dia = repositorio_alertas.contagem_por_dia(client_id, desde, status)
+    except Exception as e:
+        st.error(f"Erro ao carregar histórico: {e}")
+        return
+    if por_dia:
+        st.subheader("📈 Alertas por Dia")
+        df_por_dia = pd.DataFrame(por_dia, columns=['Data', 'Quantidade'])
         
-        # Gráfico de alertas por dia
-        if len(df_historico) > 0:
-            st.subheader("📈 Alertas por Dia")
-            df_por_dia = df_historico.groupby(df_historico['data'].dt.date).size().reset_index()
-            df_por_dia.columns = ['Data', 'Quantidade']
-            
-            fig = px.bar(df_por_dia, x='Data', y='Quantidade', title="Número de Alertas por Dia")
-            st.plotly_chart(fig, use_container_width=True)
+        fig = px.bar(df_por_dia, x='Data', y='Quantidade', title="Número de Alertas por Dia")
+        st.plotly_chart(fig, use_container_width=True)
 
 def configurar_alertas_ia(client_id: int):
     """Interface para configurar alertas usando linguagem natural com Vanna"""
@@ -612,55 +617,53 @@ def configurar_alertas_ia(client_id: int):
                "• Número de cliques, impressões\n"
                "• Valores médios, totais, contagens")
     
-    # Botão para gerar SQL
-    if st.button("🔮 Gerar SQL com IA", type="secondary", disabled=not descricao_temp):
+    # Botão para gerar SQL (reaproveita o SQL já validado para a mesma descrição)
+    col_gerar, col_regerar = st.columns([1, 1])
+    with col_gerar:
+        gerar = st.button("🔮 Gerar SQL com IA", type="secondary", disabled=not descricao_temp)
+    with col_regerar:
+        regerar = st.button("🔄 Gerar novamente", disabled=not descricao_temp,
+                            help="Ignora o SQL em cache e consulta a IA de novo")
+    if gerar or regerar:
         if descricao_temp:
             with st.spinner("🤖 A IA está analisando sua descrição e gerando o SQL..."):
-                sql_gerado, explicacao = gerar_sql_alerta_ia(vn, descricao_temp, tabelas_usuario)
+                sql_gerado, explicacao, compilado = gerar_sql_alerta_ia(
+                    vn, descricao_temp, tabelas_usuario, client_id, usar_cache=not regerar
+                )
                 
                 if sql_gerado:
                     st.session_state["sql_alerta_gerado"] = sql_gerado
                     st.session_state["descricao_alerta"] = descricao_temp
                     st.session_state["explicacao_sql"] = explicacao
+                    st.session_state["sql_alerta_compilado"] = compilado
                     st.rerun()
                 else:
                     st.error("❌ Não foi possível gerar SQL. Tente reformular a descrição ou verificar se mencionou tabelas/colunas corretas.")
+    
+    if st.session_state.get("sql_alerta_gerado"):
+        compilado = st.session_state.get("sql_alerta_compilado") or {}
+        st.write("**SQL do alerta:**")
+        st.code(st.session_state["sql_alerta_gerado"], language="sql")
+        if compilado.get("em_cache"):
+            st.caption("♻️ Reaproveitado do cache (sem nova chamada à IA)")
+        if not compilado.get("valido"):
+            st.error(f"❌ SQL não passou na validação: {compilado.get('erro')}")
+        elif compilado.get("caro"):
+            st.warning(f"🐢 Consulta cara: custo estimado {compilado['custo']:.0f}. Considere filtrar por período ou usar uma tabela menor.")
+        else:
+            custo = compilado.get("custo")
+            st.success("✅ SQL validado" + (f" (custo estimado {custo:.0f})" if custo is not None else ""))
 
 # Funções auxiliares
 
 def obter_alertas_usuario(client_id: int) -> list:
     """Carrega alertas salvos do usuário"""
     try:
-        alertas_path = f"/home/lanna/Estudos/2025-1/Soliris/interface/hist_alerta/alertas_cli{client_id:02d}.json"
-        if os.path.exists(alertas_path):
-            with open(alertas_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return []
+        return repositorio_alertas.listar_alertas(client_id)
     except Exception as e:
         st.error(f"Erro ao carregar alertas: {e}")
         return []
 
-def validar_sql_seguro(sql: str) -> bool:
-    """Valida se o SQL é seguro para execução (apenas SELECT)"""
-    sql_upper = sql.upper().strip()
-    
-    # Lista de comandos perigosos
-    comandos_proibidos = [
-        'DROP', 'DELETE', 'UPDATE', 'INSERT', 'ALTER', 'CREATE', 
-        'TRUNCATE', 'GRANT', 'REVOKE', 'EXEC', 'EXECUTE'
-    ]
-    
-    # Verifica se contém apenas SELECT
-    if not sql_upper.startswith('SELECT'):
-        return False
-    
-    # Verifica se contém comandos perigosos
-    for comando in comandos_proibidos:
-        if comando in sql_upper:
-            return False
-    
-    return True
-
 def salvar_alerta(client_id: int, alerta_config: dict):
     """Salva um novo alerta com validações"""
     try:
@@ -686,19 +689,13 @@ def salvar_alerta(client_id: int, alerta_config: dict):
             st.error("❌ Já existe um alerta com este nome!")
             return False
         
-        # Adiciona ID único e timestamp
-        alerta_config['id'] = len(alertas) + 1
+        # Grava no repositório (id gerado pelo banco)
         alerta_config['criado_em'] = datetime.now().isoformat()
         alerta_config['ativo'] = alerta_config.get('ativo', True)
+        alerta_config['id'] = repositorio_alertas.criar_alerta(client_id, alerta_config)
         
-        alertas.append(alerta_config)
-        
-        # Salva arquivo
-        os.makedirs("/home/lanna/Estudos/2025-1/Soliris/interface/hist_alerta", exist_ok=True)
-        alertas_path = f"/home/lanna/Estudos/2025-1/Soliris/interface/hist_alerta/alertas_cli{client_id:02d}.json"
-        
-        with open(alertas_path, 'w', encoding='utf-8') as f:
-            json.dump(alertas, f, indent=2, ensure_ascii=False)
+        # primeira verificação do novo alerta no próximo ciclo do agendador
+        notificar_alteracao()
             
         return True
         
@@ -706,187 +703,35 @@ def salvar_alerta(client_id: int, alerta_config: dict):
         st.error(f"Erro ao salvar alerta: {e}")
         return False
 
-def verificar_todos_alertas(client_id: int, alertas: list) -> list:
-    """Verifica status de todos os alertas"""
-    resultado = []
-    
-    for alerta in alertas:
-        if not alerta.get('ativo', True):
-            continue
-            
-        try:
-            valor_atual = executar_query_alerta(alerta)
-            status = avaliar_condicao_alerta(valor_atual, alerta)
-            
-            # Salva no histórico se alerta foi disparado
-            if status == 'DISPARADO':
-                salvar_historico_alerta(client_id, alerta, status, valor_atual)
-            
-            resultado.append({
-                **alerta,
-                'valor_atual': valor_atual,
-                'status': status,
-                'ultima_verificacao': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            })
-            
-        except Exception as e:
-            resultado.append({
-                **alerta,
-                'status': 'ERRO',
-                'erro': str(e),
-                'ultima_verificacao': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            })
-    
-    return resultado
-
-def executar_query_alerta(alerta: dict):
-    """Executa query para obter valor atual do alerta"""
-    with get_db_connection() as conn:
-        if not conn:
-            raise Exception("Falha na conexão com banco de dados")
-            
-        cursor = conn.cursor()
-        
-        try:
-            # Verifica se é um alerta personalizado (gerado por IA)
-            if alerta.get('tipo') == 'Personalizado IA' and 'sql_personalizado' in alerta:
-                query = alerta['sql_personalizado']
-            else:
-                # Alertas tradicionais
-                tabela = alerta['tabela']
-                coluna = alerta['coluna']
-                tipo = alerta['tipo']
-                
-                if tipo == "Valor Simples":
-                    query = f'SELECT "{coluna}" FROM "{tabela}" ORDER BY "id" DESC LIMIT 1'
-                elif tipo == "Agregação":
-                    query = f'SELECT COUNT("{coluna}") FROM "{tabela}"'
-                else:  # Outros tipos
-                    query = f'SELECT AVG("{coluna}") FROM "{tabela}"'
-            
-            cursor.execute(query)
-            resultado = cursor.fetchone()
-            
-            # Converte Decimal para float se necessário
-            if resultado:
-                valor = resultado[0]
-                if hasattr(valor, '__float__'):  # Se é um tipo numérico (incluindo Decimal)
-                    return float(valor)
-                return valor
-            return 0
-            
-        finally:
-            cursor.close()
-
-def avaliar_condicao_alerta(valor_atual, alerta: dict) -> str:
-    """Avalia se a condição do alerta foi atendida"""
-    valor_limite = alerta['valor_limite']
-    condicao = alerta['condicao']
-    
-    if condicao == "Maior que" and valor_atual > valor_limite:
-        return "DISPARADO"
-    elif condicao == "Menor que" and valor_atual < valor_limite:
-        return "DISPARADO"
-    elif condicao == "Igual a" and valor_atual == valor_limite:
-        return "DISPARADO"
-    elif condicao == "Diferente de" and valor_atual != valor_limite:
-        return "DISPARADO"
-    else:
-        return "NORMAL"
-
 def obter_tabelas_usuario_alertas(client_id: int) -> list:
     """Obtém lista de tabelas do usuário para alertas"""
-    with get_db_connection() as conn:
-        if not conn:
-            return []
-            
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute("""
-                SELECT table_name
-                FROM information_schema.tables 
-                WHERE table_schema = 'public' 
-                AND table_name LIKE %s
-                ORDER BY table_name
-            """, (f"cli{client_id:02d}_%",))
-            
-            tabelas = [row[0] for row in cursor.fetchall()]
-            return tabelas
-            
-        except Exception as e:
-            st.error(f"Erro ao obter tabelas: {e}")
-            return []
-        finally:
-            cursor.close()
+    try:
+        # catálogo do cliente (prefixo em public ou schema próprio)
+        return obter_tabelas(client_id)
+    except Exception as e:
+        st.error(f"Erro ao obter tabelas: {e}")
+        return []
 
 def obter_colunas_tabela(nome_tabela: str) -> list:
-    """Obtém colunas de uma tabela específica"""
-    with get_db_connection() as conn:
-        if not conn:
-            return []
-            
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute("""
-                SELECT column_name
-                FROM information_schema.columns 
-                WHERE table_name = %s
-                AND table_schema = 'public'
-                ORDER BY ordinal_position
-            """, (nome_tabela,))
-            
-            colunas = [row[0] for row in cursor.fetchall()]
-            return colunas
-            
-        except Exception as e:
-            st.error(f"Erro ao obter colunas: {e}")
-            return []
-        finally:
-            cursor.close()
-
-def obter_historico_alertas(client_id: int) -> list:
-    """Obtém histórico de alertas disparados"""
+    """Obtém colunas de uma tabela específica (via catálogo em cache)"""
     try:
-        historico_path = f"/home/lanna/Estudos/2025-1/Soliris/interface/hist_alerta/historico_alertas_cli{client_id:02d}.json"
-        if os.path.exists(historico_path):
-            with open(historico_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+        return [coluna for coluna, _ in catalogo_obter_colunas(nome_tabela)]
+    except Exception as e:
+        st.error(f"Erro ao obter colunas: {e}")
         return []
+
+def obter_historico_alertas(client_id: int, desde: datetime = None, status: str = None, pagina: int = 1) -> dict:
+    """Obtém uma página do histórico de alertas (filtros aplicados no banco)"""
+    try:
+        return repositorio_alertas.listar_historico(client_id, desde=desde, status=status, pagina=pagina)
     except Exception as e:
         st.error(f"Erro ao carregar histórico: {e}")
-        return []
+        return {"itens": [], "total": 0, "pagina": 1, "paginas": 1}
 
 def salvar_historico_alerta(client_id: int, alerta: dict, status: str, valor_atual=None):
     """Salva entrada no histórico de alertas"""
     try:
-        historico = obter_historico_alertas(client_id)
-        
-        entrada = {
-            'id': len(historico) + 1,
-            'data': datetime.now().isoformat(),
-            'alerta': alerta['nome'],
-            'status': status,
-            'valor': valor_atual,
-            'limite': alerta['valor_limite'],
-            'condicao': alerta['condicao'],
-            'tipo': alerta.get('tipo', 'N/A')
-        }
-        
-        historico.append(entrada)
-        
-        # Mantém apenas os últimos 1000 registros
-        if len(historico) > 1000:
-            historico = historico[-1000:]
-        
-        # Salva histórico
-        os.makedirs("/home/lanna/Estudos/2025-1/Soliris/interface/hist_alerta", exist_ok=True)
-        historico_path = f"/home/lanna/Estudos/2025-1/Soliris/interface/hist_alerta/historico_alertas_cli{client_id:02d}.json"
-        
-        with open(historico_path, 'w', encoding='utf-8') as f:
-            json.dump(historico, f, indent=2, ensure_ascii=False)
-            
+        repositorio_alertas.registrar_historico(client_id, alerta, status, valor_atual)
         return True
         
     except Exception as e:
@@ -900,12 +745,7 @@ def editar_alerta(alerta: dict):
 def remover_alerta(alerta_id: int, client_id: int):
     """Remove um alerta"""
     try:
-        alertas = obter_alertas_usuario(client_id)
-        alertas = [a for a in alertas if a.get('id') != alerta_id]
-        
-        alertas_path = f"/home/lanna/Estudos/2025-1/Soliris/interface/hist_alerta/alertas_cli{client_id:02d}.json"
-        with open(alertas_path, 'w', encoding='utf-8') as f:
-            json.dump(alertas, f, indent=2, ensure_ascii=False)
+        repositorio_alertas.remover_alerta(client_id, alerta_id)
         
         st.success("✅ Alerta removido com sucesso!")
         st.rerun()
@@ -917,7 +757,7 @@ def testar_alerta_agora(alerta: dict, client_id: int):
     """Testa um alerta específico imediatamente"""
     try:
         with st.spinner(f"Testando alerta '{alerta['nome']}'..."):
-            valor_atual = executar_query_alerta(alerta)
+            valor_atual = executar_query_alerta(alerta, client_id)
             status = avaliar_condicao_alerta(valor_atual, alerta)
             
             st.success(f"✅ **Teste concluído!**")
@@ -932,8 +772,27 @@ def testar_alerta_agora(alerta: dict, client_id: int):
     except Exception as e:
         st.error(f"Erro ao testar alerta: {e}")
 
-def gerar_sql_alerta_ia(vn, descricao: str, tabelas_disponiveis: list) -> tuple:
-    """Gera SQL usando Vanna baseado na descrição em linguagem natural"""
+def gerar_sql_alerta_ia(vn, descricao: str, tabelas_disponiveis: list, client_id: int = None,
+                        usar_cache: bool = True) -> tuple:
+    """
+    Gera SQL usando Vanna baseado na descrição em linguagem natural.
+    Retorna (sql, explicacao, compilado), com compilado = {valido, custo, caro, erro, em_cache}.
+    Descrições já vistas (normalizadas) reaproveitam o SQL validado sem
+    chamar a IA, enquanto as tabelas que ele usa continuarem existindo.
+    """
+    explicacao = f"Esta consulta analisa: {descricao}\n\nTabelas utilizadas: {', '.join(tabelas_disponiveis)}"
+    if client_id is not None and usar_cache:
+        try:
+            em_cache = sql_ia_em_cache(client_id, descricao, tabelas_disponiveis)
+        except Exception as e:
+            render_logger.warning(f"⚠️ [ALERTAS] Cache de SQL indisponível: {e}")
+            em_cache = None
+        if em_cache:
+            render_logger.info("♻️ [ALERTAS] SQL de alerta reaproveitado do cache")
+            return em_cache["sql"], explicacao, {
+                "valido": True, "custo": em_cache["custo"], "caro": em_cache["caro"], "erro": None, "em_cache": True
+            }
+    
     try:
         # Obter informações detalhadas das tabelas
         info_tabelas = []
@@ -970,14 +829,19 @@ def gerar_sql_alerta_ia(vn, descricao: str, tabelas_disponiveis: list) -> tuple:
         # Limpa o SQL (remove explicações extras se houver)
         sql_limpo = extrair_sql_limpo(sql_gerado)
         
-        # Gera explicação baseada na descrição
-        explicacao = f"Esta consulta analisa: {descricao}\n\nTabelas utilizadas: {', '.join(tabelas_disponiveis)}"
+        # Valida uma vez (segurança + EXPLAIN) e guarda no cache com o custo do plano
+        if client_id is not None:
+            compilado = guardar_sql_ia_validado(client_id, descricao, tabelas_disponiveis, sql_limpo)
+        else:
+            valido = validar_sql_seguro(sql_limpo)
+            compilado = {"valido": valido, "custo": None, "caro": False,
+                         "erro": None if valido else "SQL inválido ou inseguro (apenas SELECT)"}
         
-        return sql_limpo, explicacao
+        return sql_limpo, explicacao, {**compilado, "em_cache": False}
         
     except Exception as e:
         st.error(f"Erro ao gerar SQL: {e}")
-        return None, None
+        return None, None, None
 
 def extrair_sql_limpo(sql_bruto: str) -> str:
     """Extrai apenas o SQL válido, removendo comentários e explicações"""
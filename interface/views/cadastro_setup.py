@@ -15,6 +15,8 @@ load_dotenv()
 sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "src"))
 from utils.db_utils import conectar_db, criar_engine
 from import_csv import processar_csv_para_banco_usuario
+from armazenamento_clientes import opcoes_conexao
+from arquivos_compactados import abrir_csv, extensao_arquivo, nome_base_arquivo, EXTENSOES_UPLOAD
 
 def criar_usuario_no_banco(nome: str, email: str, senha: str) -> int:
     """Cria novo usuário no banco e retorna o ID"""
@@ -287,18 +289,26 @@ def etapa_importacao_dados(id_client: int, config: dict):
         if csvs_importados:
             st.success(f"✅ CSVs importados: {', '.join(csvs_importados)}")
         
-        uploaded_file = st.file_uploader(
-            "Escolha arquivo CSV:",
-            type=['csv'],
-            key="setup_csv_upload"
+        uploaded_files = st.file_uploader(
+            "Escolha arquivo(s) CSV (também .csv.gz, .zip ou .zst):",
+            type=EXTENSOES_UPLOAD,
+            key="setup_csv_upload",
+            accept_multiple_files=True,
+            help="Selecione vários arquivos para importá-los em paralelo"
         )
         
+        uploaded_file = uploaded_files[0] if len(uploaded_files or []) == 1 else None
+        
+        if uploaded_files and len(uploaded_files) > 1:
+            importar_varios_csvs_setup(id_client, uploaded_files, config)
+        
         if uploaded_file:
             try:
-                df = pd.read_csv(uploaded_file, nrows=5)
+                with abrir_csv(uploaded_file, uploaded_file.name) as f:
+                    df = pd.read_csv(f, nrows=5)
                 st.dataframe(df)
                 
-                nome_arquivo = os.path.splitext(uploaded_file.name)[0]
+                nome_arquivo = nome_base_arquivo(uploaded_file.name)
                 nome_personalizado = st.text_input(
                     "Nome da tabela:",
                     value=nome_arquivo,
@@ -306,21 +316,27 @@ def etapa_importacao_dados(id_client: int, config: dict):
                 )
                 
                 if st.button("📁 Importar CSV", type="secondary"):
-                    with tempfile.NamedTemporaryFile(mode='wb', suffix='.csv', delete=False) as tmp_file:
+                    # mantém a extensão (.csv.gz/.zip/.zst): o arquivo fica compactado em disco
+                    with tempfile.NamedTemporaryFile(mode='wb', suffix=extensao_arquivo(uploaded_file.name), delete=False) as tmp_file:
                         uploaded_file.seek(0)
                         tmp_file.write(uploaded_file.read())
                         tmp_path = tmp_file.name
                     
                     try:
-                        with st.spinner("Importando CSV..."):
-                            processar_csv_para_banco_usuario(tmp_path, nome_personalizado, id_client)
+                        from progresso_importacao import formatar_evento
+                        barra = st.progress(0.0, text="Importando CSV...")
+                        stats = processar_csv_para_banco_usuario(
+                            tmp_path, nome_personalizado, id_client,
+                            progresso=lambda ev: barra.progress(ev["percentual"] or 0.0, text=formatar_evento(ev))
+                        )
                         
                         csvs_importados.append(nome_personalizado)
                         dados_importados["csvs"] = csvs_importados
                         config["dados_importados"] = dados_importados
                         salvar_configuracao_setup(id_client, config)
                         
-                        st.success(f"✅ CSV '{nome_personalizado}' importado!")
+                        st.success(f"✅ CSV '{nome_personalizado}' importado! "
+                                   f"({stats['linhas']} linhas, {stats['linhas_por_segundo']:.0f} linhas/s)")
                         os.unlink(tmp_path)
                         st.rerun()
                         
@@ -342,6 +358,62 @@ def etapa_importacao_dados(id_client: int, config: dict):
     else:
         st.info("💡 Importe pelo menos um conjunto de dados para continuar")
 
+def importar_varios_csvs_setup(id_client: int, uploaded_files: list, config: dict):
+    """Importa vários CSVs de uma vez usando o pool de processos"""
+    from importacao_paralela import importar_csvs_paralelo_usuario
+    
+    # por posição: dois uploads com o mesmo nome de arquivo não se sobrescrevem
+    nomes = [nome_base_arquivo(f.name) for f in uploaded_files]
+    st.write(f"📦 **{len(uploaded_files)} arquivos selecionados:**")
+    st.dataframe(pd.DataFrame({
+        "Arquivo": [f.name for f in uploaded_files],
+        "Tabela": [f"cli{id_client:02d}_{n}" for n in nomes]
+    }), use_container_width=True)
+    
+    repetidas = sorted({n for n in nomes if nomes.count(n) > 1})
+    if repetidas:
+        st.error(f"❌ Mais de um arquivo iria para a mesma tabela: {', '.join(repetidas)}. "
+                 "Renomeie ou remova os arquivos repetidos.")
+        return
+    
+    if not st.button(f"📁 Importar {len(uploaded_files)} CSVs em paralelo", type="secondary"):
+        return
+    
+    arquivos = {}
+    try:
+        for f, nome in zip(uploaded_files, nomes):
+            with tempfile.NamedTemporaryFile(mode='wb', suffix=extensao_arquivo(f.name), delete=False) as tmp_file:
+                f.seek(0)
+                tmp_file.write(f.read())
+                arquivos[tmp_file.name] = nome
+        
+        with st.spinner(f"Importando {len(arquivos)} CSVs em paralelo..."):
+            resultados = importar_csvs_paralelo_usuario(arquivos, id_client)
+    finally:
+        for tmp_path in arquivos:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+    
+    st.dataframe(pd.DataFrame([{
+        "Tabela": r["tabela"],
+        "Status": "✅" if r["status"] == "OK" else "❌",
+        "Linhas": r["linhas"],
+        "Linhas/s": r["linhas_por_segundo"],
+        "Erro": r["erro"] or ""
+    } for r in resultados]), use_container_width=True)
+    
+    importados = [nome for (_, nome), r in zip(arquivos.items(), resultados) if r["status"] == "OK"]
+    if importados:
+        dados_importados = config.get("dados_importados", {})
+        dados_importados["csvs"] = dados_importados.get("csvs", []) + importados
+        config["dados_importados"] = dados_importados
+        salvar_configuracao_setup(id_client, config)
+        st.success(f"✅ {len(importados)} de {len(resultados)} CSVs importados!")
+    
+    erros = len(resultados) - len(importados)
+    if erros:
+        st.error(f"❌ {erros} arquivo(s) com erro. Veja a tabela acima.")
+
 def etapa_configuracao_modelo(id_client: int, config: dict):
     """Etapa 2: Configuração do modelo de treinamento"""
     
@@ -741,14 +813,22 @@ def processar_csv_kpis_usuario(csv_path: str, id_client: int) -> bool:
             port=os.getenv("DB_PORT"), 
             dbname=os.getenv("DB_NAME"),
             user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD")
+            password=os.getenv("DB_PASSWORD"),
+            **opcoes_conexao(id_client)
         )
         
         # Processa CSV usando a função do kpis_Setup (que gera SQL automaticamente)
-        processar_csv(csv_path, id_client, vn)
-        
-        st.info(f"✅ {len(df)} KPIs processados com geração automática de SQL!")
-        return True
+        relatorio = processar_csv(csv_path, id_client, vn)
+        
+        gravados = sum(1 for r in relatorio if r["status"] == "OK")
+        st.info(f"✅ {gravados} de {len(relatorio)} KPIs gravados com geração automática de SQL!")
+        if gravados < len(relatorio):
+            st.warning("⚠️ Alguns KPIs não foram gravados:")
+            st.dataframe(pd.DataFrame([
+                {"KPI": r["nome"], "Status": r["status"], "Erro": r["erro"], "SQL": r["formula_sql"] or ""}
+                for r in relatorio if r["status"] != "OK"
+            ]), use_container_width=True)
+        return gravados > 0
         
     except Exception as e:
         st.error(f"❌ Erro ao processar KPIs: {e}")
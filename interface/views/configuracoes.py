@@ -4,6 +4,7 @@ import os
 import pandas as pd
 import tempfile
 import logging
+from datetime import datetime, timedelta
 
 # 🔧 [LOGGING] Configuração de logging para Render
 def setup_render_logging():
@@ -26,7 +27,17 @@ render_logger = setup_render_logging()
 
 # Adiciona src ao path para importar funções
 sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "src"))
-from import_csv import processar_csv_para_banco_usuario
+from import_csv import processar_csv_para_banco_usuario, processar_colunar_para_banco_usuario
+from importacao_colunar import EXTENSOES_COLUNARES, eh_arquivo_colunar, ler_preview_colunar
+from arquivos_compactados import abrir_csv, extensao_arquivo, nome_base_arquivo, EXTENSOES_UPLOAD
+from catalogo_schema import obter_colunas_tabela, invalidar_cache_tabela, obter_tabelas, id_client_da_tabela
+from armazenamento_clientes import schema_da_tabela
+from indices_automaticos import listar_indices_automaticos, remover_indice_automatico
+from progresso_importacao import formatar_evento, listar_execucoes
+from motor_kpis import calcular_kpis
+from kpis_materializados import remover_views_dependentes, listar_kpis_materializados, desmaterializar_kpi
+from snapshots_kpis import serie_kpi, comparar_periodos
+from executor_async import consultar, consultar_df, em_paralelo, rodar
 from utils.db_utils import conectar_db
 
 def obter_tabelas_usuario(client_id: int) -> list:
@@ -34,20 +45,8 @@ def obter_tabelas_usuario(client_id: int) -> list:
     render_logger.info(f"🔍 [DB] Buscando tabelas para cliente {client_id}")
     
     try:
-        conn = conectar_db()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT table_name
-            FROM information_schema.tables 
-            WHERE table_schema = 'public' 
-            AND table_name LIKE %s
-            ORDER BY table_name
-        """, (f"cli{client_id:02d}_%",))
-        
-        tabelas = [row[0] for row in cursor.fetchall()]
-        cursor.close()
-        conn.close()
+        # catálogo do cliente (prefixo em public ou schema próprio)
+        tabelas = obter_tabelas(client_id)
         
         render_logger.info(f"✅ [DB] {len(tabelas)} tabelas encontradas para cliente {client_id}")
         return tabelas
@@ -60,25 +59,12 @@ def obter_tabelas_usuario(client_id: int) -> list:
 def obter_preview_tabela(nome_tabela: str, limit: int = 5):
     """Obtém preview de uma tabela"""
     try:
-        conn = conectar_db()
-        cursor = conn.cursor()
-        
-        # Obtém colunas
-        cursor.execute("""
-            SELECT column_name, data_type
-            FROM information_schema.columns 
-            WHERE table_name = %s
-            ORDER BY ordinal_position
-        """, (nome_tabela,))
-        
-        colunas = cursor.fetchall()
+        # Obtém colunas (catálogo em cache, sem consulta por tabela)
+        colunas = obter_colunas_tabela(nome_tabela)
         
         # Obtém dados
-        cursor.execute(f'SELECT * FROM "{nome_tabela}" LIMIT %s', (limit,))
-        dados = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
+        _, dados = rodar(consultar(f'SELECT * FROM "{nome_tabela}" LIMIT %s', (limit,),
+                                   id_client_da_tabela(nome_tabela)))
         
         return colunas, dados
         
@@ -86,12 +72,131 @@ def obter_preview_tabela(nome_tabela: str, limit: int = 5):
         st.error(f"Erro ao obter preview da tabela: {e}")
         return [], []
 
+def obter_previews_tabelas(tabelas: list, limit: int = 5) -> dict:
+    """Preview de várias tabelas com as consultas sobrepostas; {tabela: DataFrame ou exceção}"""
+    return rodar(em_paralelo({
+        tabela: consultar_df(f'SELECT * FROM "{tabela}" LIMIT %s', (limit,), id_client_da_tabela(tabela))
+        for tabela in tabelas
+    }))
+
+def mostrar_indices_automaticos(id_client: int):
+    """Revisão dos índices criados automaticamente após os imports"""
+    with st.expander("🗂️ Índices automáticos"):
+        try:
+            indices = listar_indices_automaticos(id_client)
+        except Exception as e:
+            render_logger.error(f"❌ [INDICES] Erro ao listar índices do cliente {id_client}: {e}")
+            st.error(f"Erro ao listar índices: {e}")
+            return
+        
+        if not indices:
+            st.info("Nenhum índice automático criado ainda.")
+            return
+        
+        st.dataframe(pd.DataFrame([{
+            "Tabela": i["tabela"].replace(f"cli{id_client:02d}_", ""),
+            "Índice": i["indice"],
+            "Colunas": ", ".join(i["colunas"]),
+            "Motivo": i["motivo"],
+            "Tamanho (KB)": round((i["bytes"] or 0) / 1024, 1),
+            "Usos": i["idx_scan"] or 0,
+            "Criado em": i["criado_em"],
+        } for i in indices]), use_container_width=True)
+        
+        indice_remover = st.selectbox("Remover índice:", [i["indice"] for i in indices], key="indice_auto_remover")
+        if st.button("🗑️ Remover índice", key="btn_indice_auto_remover"):
+            if remover_indice_automatico(id_client, indice_remover):
+                st.success(f"✅ Índice `{indice_remover}` removido")
+                st.rerun()
+            else:
+                st.error("❌ Índice não encontrado.")
+
+def mostrar_kpis_materializados(id_client: int):
+    """Opt-in de views materializadas para KPIs pesados"""
+    with st.expander("🧊 KPIs materializados"):
+        st.caption("A fórmula vira uma view pré-calculada, atualizada no intervalo escolhido e após cada importação.")
+        try:
+            from kpis_Setup import fetch_kpis, materializar_kpis
+            
+            materializados = listar_kpis_materializados(id_client)
+            nomes_kpis = [nome for nome, _, formula in fetch_kpis(id_client) if formula]
+        except Exception as e:
+            st.error(f"Erro ao listar KPIs materializados: {e}")
+            return
+        
+        if materializados:
+            st.dataframe(pd.DataFrame([{
+                "KPI": m["nome_kpi"],
+                "View": m["view"],
+                "Intervalo (min)": m["intervalo_min"],
+                "Último refresh": m["ultimo_refresh"],
+                "Tempo (s)": round(m["segundos_refresh"] or 0, 2),
+                "Situação": "⏳ pendente" if m["pendente"] else (f"❌ {m['erro']}" if m["erro"] else "✅"),
+            } for m in materializados]), use_container_width=True)
+        
+        ja_materializados = {m["nome_kpi"] for m in materializados}
+        escolhidos = st.multiselect(
+            "Materializar KPIs:", [n for n in nomes_kpis if n not in ja_materializados], key="kpis_mv_escolhidos"
+        )
+        intervalo = st.number_input("Intervalo de atualização (min)", min_value=1, value=60, key="kpis_mv_intervalo")
+        if escolhidos and st.button("🧊 Materializar", key="btn_kpis_mv"):
+            with st.spinner("Criando views..."):
+                resultados = materializar_kpis(id_client, escolhidos, int(intervalo))
+            for r in resultados:
+                if r["status"] == "OK":
+                    st.success(f"✅ {r['nome_kpi']} → `{r['view']}` ({r['segundos']:.2f}s)")
+                else:
+                    st.error(f"❌ {r['nome_kpi']}: {r['erro']}")
+        
+        if materializados:
+            remover = st.selectbox("Desfazer materialização:", sorted(ja_materializados), key="kpis_mv_remover")
+            if st.button("🗑️ Remover view", key="btn_kpis_mv_remover"):
+                desmaterializar_kpi(id_client, remover)
+                st.rerun()
+
+def mostrar_historico_kpis(id_client: int):
+    """Série temporal dos KPIs escalares gravada pelo agendador de snapshots"""
+    with st.expander("📈 Histórico de KPIs"):
+        try:
+            from kpis_Setup import fetch_kpis
+            nomes_kpis = [nome for nome, _, formula in fetch_kpis(id_client) if formula]
+        except Exception as e:
+            st.error(f"Erro ao listar KPIs: {e}")
+            return
+        if not nomes_kpis:
+            st.info("📭 Nenhum KPI cadastrado")
+            return
+        
+        col1, col2, col3 = st.columns(3)
+        nome_kpi = col1.selectbox("KPI:", nomes_kpis, key="kpis_hist_nome")
+        dias = col2.number_input("Período (dias)", min_value=1, value=90, key="kpis_hist_dias")
+        agregacao = col3.selectbox("Agregação:", ["avg", "min", "max", "last"], key="kpis_hist_agregacao")
+        
+        try:
+            inicio = datetime.now().astimezone() - timedelta(days=int(dias))
+            serie = serie_kpi(id_client, nome_kpi, inicio=inicio, agregacao=agregacao)
+            comparacao = comparar_periodos(id_client, nome_kpi, int(dias))
+        except Exception as e:
+            st.error(f"Erro ao consultar histórico: {e}")
+            return
+        
+        if not serie:
+            st.info("📭 Ainda não há snapshots deste KPI no período")
+            return
+        if comparacao["crescimento_pct"] is not None:
+            st.metric(f"Média dos últimos {int(dias)} dias", f"{comparacao['atual']:.2f}",
+                      f"{comparacao['crescimento_pct']:+.2f}%")
+        st.line_chart(pd.DataFrame(serie).set_index("periodo")["valor"])
+
 def deletar_tabela(nome_tabela: str) -> bool:
     """Deleta uma tabela do banco de dados"""
     try:
-        conn = conectar_db()
+        conn = conectar_db(id_client_da_tabela(nome_tabela))
         cursor = conn.cursor()
         
+        # Views de KPI sobre a tabela bloqueariam o DROP
+        remover_views_dependentes(cursor, nome_tabela)
+        
         # Executa DROP TABLE
         cursor.execute(f'DROP TABLE IF EXISTS "{nome_tabela}"')
         conn.commit()
@@ -99,6 +204,8 @@ def deletar_tabela(nome_tabela: str) -> bool:
         cursor.close()
         conn.close()
         
+        invalidar_cache_tabela(nome_tabela)
+        
         return True
         
     except Exception as e:
@@ -145,7 +252,7 @@ def mostrar_configuracoes():
             return
         
         st.write("📋 **Instruções:**")
-        st.write("- Carregue arquivos CSV para criar tabelas no banco de dados")
+        st.write("- Carregue arquivos CSV, Parquet ou Arrow para criar tabelas no banco de dados")
         st.write("- O nome da tabela será: `cli{:02d}_<nome_arquivo>`".format(id_client))
         st.write("- Arquivos grandes podem demorar alguns minutos para processar")
         
@@ -153,16 +260,21 @@ def mostrar_configuracoes():
         
         # Upload de arquivo
         uploaded_file = st.file_uploader(
-            "Escolha um arquivo CSV",
-            type=['csv'],
-            help="Selecione um arquivo CSV para importar"
+            "Escolha um arquivo CSV, Parquet ou Arrow",
+            type=EXTENSOES_UPLOAD + [ext.lstrip('.') for ext in sorted(EXTENSOES_COLUNARES)],
+            help="Selecione um CSV (também .csv.gz, .zip ou .zst), Parquet ou Arrow IPC (Feather) para importar"
         )
         
         if uploaded_file is not None:
             # Preview do arquivo
             st.write("📊 **Preview do arquivo:**")
             try:
-                df = pd.read_csv(uploaded_file, nrows=5)
+                colunar = eh_arquivo_colunar(uploaded_file.name)
+                if colunar:
+                    df = ler_preview_colunar(uploaded_file, 5)
+                else:
+                    with abrir_csv(uploaded_file, uploaded_file.name) as f:
+                        df = pd.read_csv(f, nrows=5)
                 st.dataframe(df)
                 
                 col1, col2 = st.columns(2)
@@ -172,7 +284,7 @@ def mostrar_configuracoes():
                 
                 with col2:
                     # Nome da tabela
-                    nome_base = os.path.splitext(uploaded_file.name)[0]
+                    nome_base = nome_base_arquivo(uploaded_file.name)
                     nome_tabela = f"cli{id_client:02d}_{nome_base}"
                     st.write(f"**Nome da tabela:** `{nome_tabela}`")
                 
@@ -193,6 +305,21 @@ def mostrar_configuracoes():
                         "Confirmo que quero importar este arquivo",
                         help="Marque para habilitar a importação"
                     )
+                    modos_importacao = {
+                        "Adicionar linhas": "completo",
+                        "Atualizar tabela existente (incremental)": "incremental",
+                        "Substituir tabela inteira (troca atômica)": "atomico",
+                    }
+                    if colunar:
+                        modo_escolhido = "Adicionar linhas"
+                        st.caption("Arquivos colunares usam os tipos do próprio arquivo e são adicionados à tabela.")
+                    else:
+                        modo_escolhido = st.radio(
+                            "Modo de importação",
+                            list(modos_importacao),
+                            help="Incremental insere linhas novas e atualiza as alteradas pela chave primária. "
+                                 "Troca atômica recarrega a tabela sem que consultas vejam dados pela metade."
+                        )
                 
                 # Botão de importação
                 if st.button("🚀 Importar para Banco de Dados", disabled=not confirmar_importacao):
@@ -202,17 +329,42 @@ def mostrar_configuracoes():
                         nome_final = nome_base
                     
                     # Salva arquivo temporário
-                    with tempfile.NamedTemporaryFile(mode='wb', suffix='.csv', delete=False) as tmp_file:
+                    sufixo = extensao_arquivo(uploaded_file.name)
+                    with tempfile.NamedTemporaryFile(mode='wb', suffix=sufixo, delete=False) as tmp_file:
                         uploaded_file.seek(0)
                         tmp_file.write(uploaded_file.read())
                         tmp_path = tmp_file.name
                     
                     try:
-                        with st.spinner(f"Importando {uploaded_file.name}..."):
-                            processar_csv_para_banco_usuario(tmp_path, nome_final, id_client)
+                        barra = st.progress(0.0, text=f"Importando {uploaded_file.name}...")
+                        
+                        def atualizar_progresso(evento):
+                            fracao = evento["percentual"]
+                            barra.progress(fracao if fracao is not None else 0.0, text=formatar_evento(evento))
+                        
+                        if colunar:
+                            stats = processar_colunar_para_banco_usuario(
+                                tmp_path, nome_final, id_client, progresso=atualizar_progresso
+                            )
+                        else:
+                            stats = processar_csv_para_banco_usuario(
+                                tmp_path, nome_final, id_client,
+                                modo=modos_importacao[modo_escolhido],
+                                progresso=atualizar_progresso
+                            )
+                        barra.progress(1.0, text="Importação concluída")
                         
                         st.success(f"✅ Arquivo importado com sucesso!")
-                        st.success(f"📊 Tabela criada: `cli{id_client:02d}_{nome_final}`")
+                        st.success(f"📊 Tabela: `cli{id_client:02d}_{nome_final}`")
+                        st.info(f"🚚 {stats['linhas']} linhas em {stats['segundos']:.1f}s "
+                                f"({stats['linhas_por_segundo']:.0f} linhas/s)")
+                        if stats.get("modo") == "incremental":
+                            st.info(f"🔁 Chave {stats['chave']}: {stats['inseridos']} inseridas, "
+                                    f"{stats['atualizados']} atualizadas, {stats['inalterados']} inalteradas")
+                            if stats.get("sem_chave"):
+                                st.warning(f"⚠️ {stats['sem_chave']} linhas com chave vazia foram descartadas")
+                        if stats.get("indices_criados"):
+                            st.info(f"🗂️ Índices criados: {', '.join(stats['indices_criados'])}")
                         
                         # Remove arquivo temporário
                         os.unlink(tmp_path)
@@ -228,6 +380,27 @@ def mostrar_configuracoes():
                 
             except Exception as e:
                 st.error(f"❌ Erro ao ler arquivo: {str(e)}")
+        
+        with st.expander("📈 Histórico de importações"):
+            try:
+                execucoes = listar_execucoes(id_client, limite=20)
+            except Exception as e:
+                render_logger.error(f"❌ [PROGRESSO] Erro ao listar execuções do cliente {id_client}: {e}")
+                execucoes = []
+            if execucoes:
+                st.dataframe(pd.DataFrame([{
+                    "Início": e["iniciado_em"],
+                    "Tabela": e["tabela"].replace(f"cli{id_client:02d}_", ""),
+                    "Modo": e["modo"],
+                    "Status": "✅" if e["status"] == "OK" else "❌",
+                    "Linhas": e["linhas_carregadas"],
+                    "Linhas/s": round(e["linhas_por_segundo"] or 0),
+                    "MB": round((e["bytes_total"] or 0) / 1024 / 1024, 1),
+                    "Segundos": round(e["segundos"] or 0, 1),
+                    "Erro": e["erro"] or "",
+                } for e in execucoes]), use_container_width=True)
+            else:
+                st.info("Nenhuma importação registrada ainda.")
     
     # ========== TAB 3: MINHAS TABELAS ==========
     with tab_tabelas:
@@ -327,6 +500,19 @@ def mostrar_configuracoes():
                             st.info("A tabela está vazia.")
                     else:
                         st.error("Não foi possível obter informações da tabela.")
+            
+            with st.expander("👀 Preview de todas as tabelas"):
+                if st.button("Carregar previews", key="btn_previews_tabelas"):
+                    for tabela, preview in obter_previews_tabelas(tabelas).items():
+                        st.write(f"**{tabela.replace(f'cli{id_client:02d}_', '')}**")
+                        if isinstance(preview, Exception):
+                            st.error(f"Erro ao obter preview da tabela: {preview}")
+                        elif preview.empty:
+                            st.info("A tabela está vazia.")
+                        else:
+                            st.dataframe(preview, use_container_width=True)
+            
+            mostrar_indices_automaticos(id_client)
         else:
             st.info("📭 Você ainda não possui tabelas importadas.")
             st.write("💡 **Dica:** Use a aba 'Upload CSV' para importar seus dados.")
@@ -477,6 +663,12 @@ def mostrar_configuracoes():
                 help="Nome que será dado à tabela no banco de dados"
             )
         
+        hubspot_incremental = st.checkbox(
+            "Atualização incremental (mantém a tabela e atualiza pelo id_hubspot)",
+            value=True,
+            help="Desmarque para recriar a tabela do zero"
+        )
+        
         # CORREÇÃO: Preview da tabela que será criada
         nome_tabela_final_preview = f"cli{id_client:02d}_{nome_tabela}"
         st.info(f"📋 **Tabela que será criada:** `{nome_tabela_final_preview}`")
@@ -508,7 +700,7 @@ def mostrar_configuracoes():
                         
                         # Salva automaticamente no banco
                         with st.spinner("💾 Salvando no banco de dados..."):
-                            if salvar_dados_hubspot_usuario(df, nome_tabela, id_client):
+                            if salvar_dados_hubspot_usuario(df, nome_tabela, id_client, incremental=hubspot_incremental):
                                 st.balloons()
                                 st.success(f"🎉 {len(df)} registros importados com sucesso!")
                                 
@@ -566,17 +758,17 @@ def mostrar_configuracoes():
         nome_tabela_kpis = f"cli{id_client:02d}_kpis_definicoes"
         
         try:
-            conn = conectar_db()
+            conn = conectar_db(id_client)
             cursor = conn.cursor()
             
             # Verifica se tabela existe
             cursor.execute("""
                 SELECT EXISTS (
                     SELECT FROM information_schema.tables 
-                    WHERE table_schema = 'public' 
+                    WHERE table_schema = %s 
                     AND table_name = %s
                 );
-            """, (nome_tabela_kpis,))
+            """, (schema_da_tabela(nome_tabela_kpis), nome_tabela_kpis))
             
             tabela_existe = cursor.fetchone()[0]
             
@@ -604,6 +796,29 @@ def mostrar_configuracoes():
         except Exception as e:
             st.error(f"❌ Erro ao verificar KPIs: {e}")
         
+        if st.button("▶️ Calcular KPIs", key="btn_calcular_kpis"):
+            try:
+                with st.spinner("Calculando KPIs..."):
+                    resultado = calcular_kpis(id_client)
+                st.caption(
+                    f"{len(resultado['kpis'])} KPIs em {resultado['segundos']:.2f}s · "
+                    f"{resultado['consultas_executadas']} consultas executadas, "
+                    f"{resultado['consultas_em_cache']} do cache"
+                )
+                st.dataframe(pd.DataFrame([{
+                    "KPI": k["nome"],
+                    "Valor": k["valor"] if k["tipo"] == "escalar" else f"{len(k['linhas'])} linhas",
+                    "Status": k["status"],
+                    "Tempo (ms)": round(k["segundos"] * 1000, 1),
+                    "Cache": "✅" if k["em_cache"] else "",
+                    "Erro": k["erro"] or "",
+                } for k in resultado["kpis"]]), use_container_width=True)
+            except Exception as e:
+                st.error(f"❌ Erro ao calcular KPIs: {e}")
+        
+        mostrar_kpis_materializados(id_client)
+        mostrar_historico_kpis(id_client)
+        
         st.divider()
         
         # Upload de novo arquivo de KPIs
@@ -0,0 +1,240 @@
+"""
+Modo de armazenamento das tabelas de cada cliente.
+
+TENANT_STORAGE=prefixo (padrão): tabelas cliXX_* no schema public, isoladas
+    pelo prefixo (catálogo filtrado com LIKE 'cliXX\\_%').
+TENANT_STORAGE=schema: as mesmas tabelas cliXX_* ficam no schema próprio do
+    cliente (cliXX). As conexões do pool recebem search_path = cliXX, public,
+    então nomes não qualificados continuam funcionando, e as consultas ao
+    catálogo filtram por schema (igualdade indexada em pg_namespace) em vez
+    de varrer todas as tabelas de todos os clientes com LIKE.
+
+A migração de um modo para o outro é só de metadados (ALTER TABLE ... SET
+SCHEMA move tabela, índices e sequências sem reescrever dados):
+
+    python src/armazenamento_clientes.py migrar 1       # cliente 01
+    python src/armazenamento_clientes.py migrar --todos
+    python src/armazenamento_clientes.py reverter 1     # volta para public
+"""
+
+import os
+import re
+import sys
+import logging
+import threading
+
+from dotenv import load_dotenv
+
+# 🔧 [LOGGING] Configuração de logging para Render
+def setup_render_logging():
+    """Configura logging para ser visível no Render"""
+    logger = logging.getLogger('soliris_armazenamento')
+    if not logger.handlers:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setLevel(logging.INFO)
+        formatter = logging.Formatter(
+            '%(asctime)s - SOLIRIS-ARMAZENAMENTO - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+        console_handler.setFormatter(formatter)
+        logger.addHandler(console_handler)
+        logger.setLevel(logging.INFO)
+    return logger
+
+# Inicializar logger
+render_logger = setup_render_logging()
+
+load_dotenv()
+
+MODO_ARMAZENAMENTO = os.getenv("TENANT_STORAGE", "prefixo").lower()
+
+_schemas_garantidos: set[int] = set()
+_schemas_lock = threading.Lock()
+
+def usa_schema_por_cliente() -> bool:
+    return MODO_ARMAZENAMENTO == "schema"
+
+def schema_do_cliente(id_client: int) -> str:
+    """Schema do cliente (ex: 1 → 'cli01')"""
+    return f"cli{int(id_client):02d}"
+
+def schema_da_tabela(nome_tabela: str) -> str:
+    """Schema onde a tabela cliXX_* fica no modo atual"""
+    match = re.match(r"^cli(\d+)_", nome_tabela or "", re.IGNORECASE)
+    if usa_schema_por_cliente() and match:
+        return schema_do_cliente(int(match.group(1)))
+    return "public"
+
+def nome_regclass(nome_tabela: str) -> str:
+    """Nome qualificado para to_regclass()/::regclass"""
+    return f'"{schema_da_tabela(nome_tabela)}"."{nome_tabela}"'
+
+def filtro_catalogo(id_client: int, coluna_schema: str = "table_schema",
+                    coluna_tabela: str = "table_name") -> tuple[str, tuple]:
+    """
+    Condição WHERE (com parâmetros) que seleciona as tabelas do cliente em
+    information_schema/pg_stats/pg_tables, conforme o modo de armazenamento.
+    """
+    prefixo = f"cli{int(id_client):02d}\\_%"
+    if usa_schema_por_cliente():
+        return (f"{coluna_schema} = %s AND {coluna_tabela} LIKE %s",
+                (schema_do_cliente(id_client), prefixo))
+    return f"{coluna_schema} = 'public' AND {coluna_tabela} LIKE %s", (prefixo,)
+
+def filtro_catalogo_literal(id_client: int, coluna_schema: str = "table_schema",
+                            coluna_tabela: str = "table_name") -> str:
+    """Mesma condição de filtro_catalogo, sem parâmetros (para vn.run_sql)"""
+    prefixo = f"cli{int(id_client):02d}\\_%"
+    if usa_schema_por_cliente():
+        return f"{coluna_schema} = '{schema_do_cliente(id_client)}' AND {coluna_tabela} LIKE '{prefixo}'"
+    return f"{coluna_schema} = 'public' AND {coluna_tabela} LIKE '{prefixo}'"
+
+def opcoes_conexao(id_client: int = None) -> dict:
+    """
+    Parâmetros extras para psycopg2.connect / vn.connect_to_postgres:
+    no modo schema, fixa o search_path do cliente já na conexão.
+    """
+    if not usa_schema_por_cliente() or id_client is None:
+        return {}
+    return {"options": f"-c search_path={schema_do_cliente(id_client)},public"}
+
+def garantir_schema(conn, id_client: int):
+    """CREATE SCHEMA IF NOT EXISTS, uma vez por cliente por processo"""
+    if id_client in _schemas_garantidos:
+        return
+    with _schemas_lock:
+        if id_client in _schemas_garantidos:
+            return
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f'CREATE SCHEMA IF NOT EXISTS "{schema_do_cliente(id_client)}"')
+        finally:
+            cursor.close()
+        _schemas_garantidos.add(id_client)
+
+def aplicar_search_path(conn, id_client: int):
+    """
+    Define o search_path da sessão para o cliente (modo schema). Roda em
+    autocommit para que um rollback posterior não desfaça o SET.
+    """
+    if not usa_schema_por_cliente() or id_client is None:
+        return
+    autocommit = conn.autocommit
+    conn.autocommit = True
+    try:
+        garantir_schema(conn, id_client)
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f'SET search_path TO "{schema_do_cliente(id_client)}", public')
+        finally:
+            cursor.close()
+    finally:
+        conn.autocommit = autocommit
+
+# --- migração --------------------------------------------------------------
+
+def _mover_tabelas(conn, id_client: int, origem: str, destino: str, executar: bool) -> list[str]:
+    prefixo = f"cli{int(id_client):02d}\\_%"
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT c.relname
+              FROM pg_class c
+              JOIN pg_namespace n ON n.oid = c.relnamespace
+             WHERE n.nspname = %s AND c.relkind IN ('r', 'p', 'v', 'm') AND c.relname LIKE %s
+             ORDER BY c.relname
+        """, (origem, prefixo))
+        tabelas = [r[0] for r in cursor.fetchall()]
+        if not executar:
+            return tabelas
+
+        cursor.execute(f'CREATE SCHEMA IF NOT EXISTS "{destino}"')
+        for tabela in tabelas:
+            # SET SCHEMA leva junto índices, constraints e sequências da tabela
+            cursor.execute(f'ALTER TABLE "{origem}"."{tabela}" SET SCHEMA "{destino}"')
+        conn.commit()
+        return tabelas
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def migrar_cliente(id_client: int, executar: bool = True) -> list[str]:
+    """
+    Move as tabelas cliXX_* do cliente de public para o schema cliXX, em uma
+    única transação. Com executar=False apenas lista o que seria movido.
+    """
+    from pool_conexoes import obter_conexao
+    from catalogo_schema import invalidar_cache
+
+    conn = obter_conexao()
+    try:
+        tabelas = _mover_tabelas(conn, id_client, "public", schema_do_cliente(id_client), executar)
+    finally:
+        conn.close()
+    if executar:
+        invalidar_cache(id_client)
+        render_logger.info(f"📦 [ARMAZENAMENTO] Cliente {id_client:02d}: {len(tabelas)} tabelas movidas para {schema_do_cliente(id_client)}")
+    return tabelas
+
+def reverter_cliente(id_client: int, executar: bool = True) -> list[str]:
+    """Move as tabelas do schema cliXX de volta para public"""
+    from pool_conexoes import obter_conexao
+    from catalogo_schema import invalidar_cache
+
+    conn = obter_conexao()
+    try:
+        tabelas = _mover_tabelas(conn, id_client, schema_do_cliente(id_client), "public", executar)
+    finally:
+        conn.close()
+    if executar:
+        invalidar_cache(id_client)
+        render_logger.info(f"↩️ [ARMAZENAMENTO] Cliente {id_client:02d}: {len(tabelas)} tabelas devolvidas para public")
+    return tabelas
+
+def clientes_com_tabelas_prefixadas() -> list[int]:
+    """Ids de clientes que ainda têm tabelas cliXX_* em public"""
+    from pool_conexoes import obter_conexao
+
+    conn = obter_conexao()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT DISTINCT substring(tablename FROM '^cli(\\d+)_')::int
+              FROM pg_tables
+             WHERE schemaname = 'public' AND tablename ~ '^cli\\d+_'
+             ORDER BY 1
+        """)
+        return [r[0] for r in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Migra tabelas cliXX_ entre public e schema por cliente")
+    parser.add_argument("acao", choices=["migrar", "reverter", "listar"])
+    parser.add_argument("id_client", nargs="?", type=int)
+    parser.add_argument("--todos", action="store_true", help="todos os clientes com tabelas em public")
+    parser.add_argument("--simular", action="store_true", help="apenas lista o que seria movido")
+    args = parser.parse_args()
+
+    if args.acao == "listar":
+        print(clientes_com_tabelas_prefixadas())
+        sys.exit(0)
+
+    if args.todos:
+        ids = clientes_com_tabelas_prefixadas()
+    elif args.id_client is not None:
+        ids = [args.id_client]
+    else:
+        parser.error("informe o id do cliente ou --todos")
+
+    funcao = migrar_cliente if args.acao == "migrar" else reverter_cliente
+    for id_client in ids:
+        tabelas = funcao(id_client, executar=not args.simular)
+        print(f"cliente {id_client:02d}: {len(tabelas)} tabelas {'(simulação)' if args.simular else ''}")
+        for tabela in tabelas:
+            print(f"  - {tabela}")
@@ -0,0 +1,137 @@
+"""
+Leitura em streaming de CSVs compactados (.csv.gz, .zip, .zst).
+
+O arquivo compactado é descompactado sob demanda enquanto o pandas lê os
+chunks, sem gerar um CSV descompactado em disco. O suporte a zstd depende
+do pacote `zstandard` (requirements.txt); sem ele o uploader não oferece .zst.
+"""
+
+import os
+import gzip
+import zipfile
+from contextlib import contextmanager
+
+# extensão → método de compressão (None = CSV puro)
+COMPRESSOES = {
+    ".csv": None,
+    ".csv.gz": "gzip",
+    ".gz": "gzip",
+    ".zip": "zip",
+    ".csv.zst": "zstd",
+    ".zst": "zstd",
+}
+
+def _tem_zstandard() -> bool:
+    try:
+        import zstandard  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+# .zst só é oferecido no upload quando o pacote está instalado
+EXTENSOES_UPLOAD = ["csv", "gz", "zip"] + (["zst"] if _tem_zstandard() else [])
+
+def extensao_arquivo(nome_arquivo: str) -> str:
+    """Extensão completa reconhecida (ex: 'vendas.csv.gz' → '.csv.gz')"""
+    nome = os.path.basename(nome_arquivo).lower()
+    for ext in sorted(COMPRESSOES, key=len, reverse=True):
+        if nome.endswith(ext):
+            return ext
+    return os.path.splitext(nome)[1]
+
+def nome_base_arquivo(nome_arquivo: str) -> str:
+    """Nome sem as extensões de CSV/compressão (ex: 'vendas.csv.gz' → 'vendas')"""
+    nome = os.path.basename(nome_arquivo)
+    ext = extensao_arquivo(nome)
+    base = nome[:-len(ext)] if ext and nome.lower().endswith(ext) else os.path.splitext(nome)[0]
+    # 'vendas.csv.zip' → 'vendas'
+    return base[:-4] if base.lower().endswith(".csv") else base
+
+def compressao_do_arquivo(nome_arquivo: str):
+    return COMPRESSOES.get(extensao_arquivo(nome_arquivo))
+
+class _LeitorContador:
+    """Repassa leituras ao arquivo original informando os bytes lidos"""
+
+    def __init__(self, arquivo, contador):
+        self._arquivo = arquivo
+        self._contador = contador
+
+    def read(self, *args):
+        dados = self._arquivo.read(*args)
+        self._contador(len(dados))
+        return dados
+
+    def read1(self, *args):
+        dados = self._arquivo.read1(*args)
+        self._contador(len(dados))
+        return dados
+
+    def readinto(self, buffer):
+        n = self._arquivo.readinto(buffer)
+        self._contador(n or 0)
+        return n
+
+    def readline(self, *args):
+        dados = self._arquivo.readline(*args)
+        self._contador(len(dados))
+        return dados
+
+    def __iter__(self):
+        return iter(self.readline, b"")
+
+    def __getattr__(self, nome):
+        return getattr(self._arquivo, nome)
+
+def _membro_csv_zip(arquivo_zip: zipfile.ZipFile) -> str:
+    membros = [
+        m for m in arquivo_zip.namelist()
+        if not m.endswith("/") and not m.startswith("__MACOSX/")
+    ]
+    csvs = [m for m in membros if m.lower().endswith(".csv")]
+    if len(csvs) == 1 or (not csvs and len(membros) == 1):
+        return (csvs or membros)[0]
+    raise ValueError(
+        f"O arquivo .zip deve conter exatamente um CSV (encontrados: {', '.join(csvs or membros) or 'nenhum'})"
+    )
+
+@contextmanager
+def abrir_csv(origem, nome_arquivo: str = None, contador=None):
+    """
+    Abre um CSV (compactado ou não) como stream binário descompactado.
+    origem: caminho ou arquivo binário já aberto (ex: upload do Streamlit);
+    nome_arquivo define a compressão quando origem não é um caminho.
+    contador(n), se informado, recebe os bytes lidos do arquivo original
+    (compactados), para acompanhar o progresso contra o tamanho em disco.
+    """
+    nome = nome_arquivo or (origem if isinstance(origem, str) else getattr(origem, "name", ""))
+    compressao = compressao_do_arquivo(nome)
+    recursos = []
+    try:
+        bruto = open(origem, "rb") if isinstance(origem, str) else origem
+        if isinstance(origem, str):
+            recursos.append(bruto)
+        if contador:
+            bruto = _LeitorContador(bruto, contador)
+
+        if compressao == "gzip":
+            stream = gzip.GzipFile(fileobj=bruto, mode="rb")
+        elif compressao == "zip":
+            arquivo_zip = zipfile.ZipFile(bruto)
+            recursos.append(arquivo_zip)
+            stream = arquivo_zip.open(_membro_csv_zip(arquivo_zip))
+        elif compressao == "zstd":
+            try:
+                import zstandard
+            except ImportError:
+                raise ValueError("Arquivos .zst exigem o pacote 'zstandard' (pip install zstandard)")
+            stream = zstandard.ZstdDecompressor().stream_reader(bruto, closefd=False)
+        else:
+            stream = bruto
+
+        if stream is not bruto:
+            recursos.append(stream)
+        yield stream
+    finally:
+        for recurso in reversed(recursos):
+            recurso.close()
@@ -0,0 +1,85 @@
+"""
+Carga em massa no PostgreSQL via COPY ... FROM STDIN.
+
+Substitui o INSERT linha a linha (df.iterrows + cursor.execute) por COPY em
+formato CSV, enviando os chunks lidos do arquivo um a um para o servidor.
+NaN/NaT viram campos vazios e o COPY os grava como NULL.
+"""
+
+import io
+import sys
+import time
+import logging
+
+# 🔧 [LOGGING] Configuração de logging para Render
+def setup_render_logging():
+    """Configura logging para ser visível no Render"""
+    logger = logging.getLogger('soliris_copy')
+    if not logger.handlers:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setLevel(logging.INFO)
+        formatter = logging.Formatter(
+            '%(asctime)s - SOLIRIS-COPY - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+        console_handler.setFormatter(formatter)
+        logger.addHandler(console_handler)
+        logger.setLevel(logging.INFO)
+    return logger
+
+# Inicializar logger
+render_logger = setup_render_logging()
+
+def _lista_colunas(colunas) -> str:
+    return ", ".join(f'"{c}"' for c in colunas)
+
+def _estatisticas(nome_tabela: str, linhas: int, inicio: float) -> dict:
+    segundos = max(time.perf_counter() - inicio, 1e-9)
+    stats = {
+        "tabela": nome_tabela,
+        "linhas": int(linhas),
+        "segundos": round(segundos, 3),
+        "linhas_por_segundo": round(linhas / segundos, 1),
+    }
+    render_logger.info(
+        f"🚚 [COPY] {stats['linhas']} linhas em {nome_tabela} "
+        f"({stats['segundos']:.2f}s, {stats['linhas_por_segundo']:.0f} linhas/s)"
+    )
+    return stats
+
+def copiar_chunks(conn, nome_tabela: str, chunks, commit: bool = True,
+                  ao_carregar=None) -> dict:
+    """
+    Envia uma sequência de DataFrames (ex: pd.read_csv(chunksize=...)) para
+    nome_tabela, um COPY por chunk, na mesma transação. Apenas um chunk fica
+    em memória por vez. ao_carregar(n), se informado, é chamado após cada
+    COPY com as linhas enviadas. Retorna as estatísticas agregadas da carga.
+    """
+    inicio = time.perf_counter()
+    total = 0
+    cursor = conn.cursor()
+    try:
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            copy_sql = (
+                f'COPY "{nome_tabela}" ({_lista_colunas(chunk.columns)}) '
+                "FROM STDIN WITH (FORMAT csv, NULL '')"
+            )
+            buffer = io.StringIO()
+            chunk.to_csv(buffer, index=False, header=False, na_rep="")
+            buffer.seek(0)
+            cursor.copy_expert(copy_sql, buffer)
+            total += len(chunk)
+            if ao_carregar:
+                ao_carregar(len(chunk))
+            render_logger.info(f"📦 [COPY] {nome_tabela}: {total} linhas enviadas")
+        if commit:
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    return _estatisticas(nome_tabela, total, inicio)
@@ -0,0 +1,148 @@
+"""
+Introspecção do catálogo do PostgreSQL por cliente.
+
+Retorna o mapa completo {tabela: [(coluna, tipo), ...]} das tabelas cliXX_
+com UMA única consulta ao information_schema, em vez de uma consulta por
+tabela. O resultado fica em cache no processo (por cliente) até expirar ou
+ser invalidado após imports/remoções de tabelas.
+"""
+
+import os
+import re
+import sys
+import time
+import logging
+import threading
+from dotenv import load_dotenv
+from pool_conexoes import obter_conexao
+from armazenamento_clientes import filtro_catalogo
+
+# 🔧 [LOGGING] Configuração de logging para Render
+def setup_render_logging():
+    """Configura logging para ser visível no Render"""
+    logger = logging.getLogger('soliris_catalogo')
+    if not logger.handlers:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setLevel(logging.INFO)
+        formatter = logging.Formatter(
+            '%(asctime)s - SOLIRIS-CATALOGO - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+        console_handler.setFormatter(formatter)
+        logger.addHandler(console_handler)
+        logger.setLevel(logging.INFO)
+    return logger
+
+# Inicializar logger
+render_logger = setup_render_logging()
+
+load_dotenv()
+
+# Tempo de vida do cache em segundos (0 desativa o cache)
+CACHE_TTL = int(os.getenv("CATALOGO_CACHE_TTL", "300"))
+
+_cache: dict[int, tuple[float, dict[str, list[tuple[str, str]]]]] = {}
+_cache_lock = threading.Lock()
+
+_PADRAO_PREFIXO = re.compile(r"^cli(\d+)_", re.IGNORECASE)
+
+def _conectar(id_client: int = None):
+    return obter_conexao(id_client)
+
+def prefixo_cliente(id_client: int) -> str:
+    """Prefixo das tabelas do cliente (ex: 1 → 'cli01_')"""
+    return f"cli{int(id_client):02d}_"
+
+def id_client_da_tabela(nome_tabela: str):
+    """Extrai o id do cliente a partir do prefixo cliXX_ (ou None)"""
+    match = _PADRAO_PREFIXO.match(nome_tabela or "")
+    return int(match.group(1)) if match else None
+
+def _consultar_catalogo(id_client: int) -> dict[str, list[tuple[str, str]]]:
+    """Busca tabelas e colunas do cliente em uma única consulta"""
+    conn = _conectar(id_client)
+    cur = conn.cursor()
+    condicao, params = filtro_catalogo(id_client, "c.table_schema", "c.table_name")
+    try:
+        cur.execute(f"""
+            SELECT c.table_name, c.column_name, c.data_type
+              FROM information_schema.columns c
+             WHERE {condicao}
+             ORDER BY c.table_name, c.ordinal_position
+        """, params)
+        mapa: dict[str, list[tuple[str, str]]] = {}
+        for tabela, coluna, tipo in cur.fetchall():
+            mapa.setdefault(tabela, []).append((coluna, tipo))
+        return mapa
+    finally:
+        cur.close()
+        conn.close()
+
+def obter_mapa_colunas(id_client: int, usar_cache: bool = True) -> dict[str, list[tuple[str, str]]]:
+    """
+    Retorna {table_name: [(column_name, data_type), ...]} para todas as
+    tabelas cliXX_ do cliente, em ordem alfabética de tabela e na ordem
+    original das colunas.
+    """
+    id_client = int(id_client)
+    agora = time.monotonic()
+
+    if usar_cache and CACHE_TTL > 0:
+        with _cache_lock:
+            entrada = _cache.get(id_client)
+        if entrada and agora - entrada[0] < CACHE_TTL:
+            return entrada[1]
+
+    inicio = time.perf_counter()
+    mapa = _consultar_catalogo(id_client)
+    render_logger.info(
+        f"📚 [CATALOGO] Cliente {id_client:02d}: {len(mapa)} tabelas lidas em "
+        f"{(time.perf_counter() - inicio) * 1000:.1f} ms"
+    )
+
+    with _cache_lock:
+        _cache[id_client] = (agora, mapa)
+    return mapa
+
+def obter_tabelas(id_client: int, usar_cache: bool = True) -> list[str]:
+    """Lista ordenada das tabelas cliXX_ do cliente"""
+    return sorted(obter_mapa_colunas(id_client, usar_cache))
+
+def obter_colunas_tabela(nome_tabela: str, usar_cache: bool = True) -> list[tuple[str, str]]:
+    """
+    Retorna [(column_name, data_type), ...] de uma tabela.
+    Tabelas sem prefixo de cliente são consultadas diretamente, sem cache.
+    """
+    id_client = id_client_da_tabela(nome_tabela)
+    if id_client is not None:
+        return list(obter_mapa_colunas(id_client, usar_cache).get(nome_tabela, []))
+
+    conn = _conectar()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT column_name, data_type
+              FROM information_schema.columns
+             WHERE table_schema = 'public'
+               AND table_name = %s
+             ORDER BY ordinal_position
+        """, (nome_tabela,))
+        return cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
+
+def invalidar_cache(id_client: int = None):
+    """Descarta o cache de um cliente (ou de todos, se id_client for None)"""
+    with _cache_lock:
+        if id_client is None:
+            _cache.clear()
+        else:
+            _cache.pop(int(id_client), None)
+    render_logger.info(f"🧹 [CATALOGO] Cache invalidado: {'todos' if id_client is None else f'cliente {int(id_client):02d}'}")
+
+def invalidar_cache_tabela(nome_tabela: str):
+    """Invalida o cache do cliente dono da tabela (se houver prefixo)"""
+    id_client = id_client_da_tabela(nome_tabela)
+    if id_client is not None:
+        invalidar_cache(id_client)
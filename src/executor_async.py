@@ -0,0 +1,143 @@
+"""
+Executor asyncio para consultas ao PostgreSQL.
+
+O driver disponível (psycopg2) é síncrono, então cada consulta roda em um
+pool de threads dimensionado pelo pool de conexões (pool_conexoes.POOL_MAX),
+e a API exposta é de corrotinas (consultar, consultar_df, em_thread). Assim
+várias consultas independentes (alertas, previews das tabelas, KPIs)
+sobrepõem suas idas ao banco em vez de rodar uma após a outra. Para código
+síncrono (páginas do Streamlit) há rodar() e mapear_em_paralelo().
+"""
+
+import sys
+import asyncio
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from pool_conexoes import obter_conexao, POOL_MAX
+
+# 🔧 [LOGGING] Configuração de logging para Render
+def setup_render_logging():
+    """Configura logging para ser visível no Render"""
+    logger = logging.getLogger('soliris_async')
+    if not logger.handlers:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setLevel(logging.INFO)
+        formatter = logging.Formatter(
+            '%(asctime)s - SOLIRIS-ASYNC - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+        console_handler.setFormatter(formatter)
+        logger.addHandler(console_handler)
+        logger.setLevel(logging.INFO)
+    return logger
+
+# Inicializar logger
+render_logger = setup_render_logging()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _obter_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # mais threads que conexões só criaria fila no pool
+                _executor = ThreadPoolExecutor(max_workers=POOL_MAX, thread_name_prefix="soliris-db")
+    return _executor
+
+async def em_thread(func, *args, **kwargs):
+    """Roda uma função bloqueante no pool de threads do banco"""
+    loop = asyncio.get_running_loop()
+    # leva o contexto (ex: pool_conexoes.em_segundo_plano) para a thread
+    contexto = contextvars.copy_context()
+    return await loop.run_in_executor(_obter_executor(), lambda: contexto.run(func, *args, **kwargs))
+
+def _consultar_sync(sql: str, params=None, id_client: int = None):
+    conn = obter_conexao(id_client)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, params)
+        colunas = [d[0] for d in cursor.description] if cursor.description else []
+        linhas = cursor.fetchall() if cursor.description else []
+        conn.commit()
+        return colunas, linhas
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+async def consultar(sql: str, params=None, id_client: int = None) -> tuple[list[str], list[tuple]]:
+    """Executa uma consulta com uma conexão do pool e retorna (colunas, linhas)"""
+    return await em_thread(_consultar_sync, sql, params, id_client)
+
+async def consultar_df(sql: str, params=None, id_client: int = None) -> pd.DataFrame:
+    colunas, linhas = await consultar(sql, params, id_client)
+    return pd.DataFrame(linhas, columns=colunas)
+
+async def em_paralelo(tarefas, limite: int = None, retornar_excecoes: bool = True):
+    """
+    Aguarda várias corrotinas ao mesmo tempo.
+    tarefas: lista de corrotinas (retorna lista na mesma ordem) ou
+             dict {chave: corrotina} (retorna dict com as mesmas chaves).
+    limite: máximo de corrotinas simultâneas (None = todas).
+    Com retornar_excecoes=True, uma falha vira a exceção no resultado
+    em vez de cancelar as demais.
+    """
+    chaves = list(tarefas) if isinstance(tarefas, dict) else None
+    corrotinas = list(tarefas.values()) if chaves is not None else list(tarefas)
+
+    if limite:
+        semaforo = asyncio.Semaphore(limite)
+
+        async def limitada(corrotina):
+            async with semaforo:
+                return await corrotina
+        corrotinas = [limitada(c) for c in corrotinas]
+
+    resultados = await asyncio.gather(*corrotinas, return_exceptions=retornar_excecoes)
+    return dict(zip(chaves, resultados)) if chaves is not None else resultados
+
+def rodar(corrotina):
+    """
+    Executa uma corrotina a partir de código síncrono. Se já houver um loop
+    rodando nesta thread, usa uma thread auxiliar com loop próprio.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(corrotina)
+
+    resultado = {}
+    contexto = contextvars.copy_context()
+
+    def alvo():
+        try:
+            resultado["valor"] = contexto.run(asyncio.run, corrotina)
+        except BaseException as e:
+            resultado["erro"] = e
+
+    thread = threading.Thread(target=alvo)
+    thread.start()
+    thread.join()
+    if "erro" in resultado:
+        raise resultado["erro"]
+    return resultado["valor"]
+
+def mapear_em_paralelo(func, itens, limite: int = None) -> list:
+    """
+    Versão síncrona de fan-out: aplica func a cada item em paralelo no pool
+    de threads do banco. Retorna a lista de resultados na ordem dos itens;
+    itens que falharam trazem a exceção no lugar do resultado.
+    """
+    itens = list(itens)
+    if not itens:
+        return []
+    return rodar(em_paralelo([em_thread(func, item) for item in itens], limite))
@@ -4,6 +4,7 @@ import logging
 from vanna.remote import VannaDefault
 from gerar_schema_cliente import gerar_plan_treinamento
 from kpis_Setup import conectar_postgres
+from armazenamento_clientes import filtro_catalogo, opcoes_conexao
 
 def gerar_ddl_para_cliente(id_client: int,
                            vn: VannaDefault,
@@ -21,16 +22,15 @@ def gerar_ddl_para_cliente(id_client: int,
     gerar_plan_treinamento(id_client, vn, salvar_em_arquivo=False)
 
     # 2) Lista tabelas do cliente
-    conn = conectar_postgres()
+    conn = conectar_postgres(id_client)
     cur = conn.cursor()
-    prefixo = f"cli{id_client:02d}_%"
-    cur.execute("""
+    condicao, params = filtro_catalogo(id_client)
+    cur.execute(f"""
         SELECT table_name
           FROM information_schema.tables
-         WHERE table_schema='public'
-           AND table_name LIKE %s
+         WHERE {condicao}
          ORDER BY table_name
-    """, (prefixo,))
+    """, params)
     tabelas = [r[0] for r in cur.fetchall()]
     cur.close()
     conn.close()
@@ -73,6 +73,7 @@ def criar_agente_e_gerar_ddl(id_client: int,
         port=os.getenv("DB_PORT"),
         dbname=os.getenv("DB_NAME"),
         user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD")
+        password=os.getenv("DB_PASSWORD"),
+        **opcoes_conexao(id_client)
     )
     return gerar_ddl_para_cliente(id_client, vn, salvar_em_arquivo=salvar_em_arquivo)
\ No newline at end of file
@@ -1,6 +1,7 @@
 import os, json, logging
-import psycopg2
 from dotenv import load_dotenv
+from pool_conexoes import obter_conexao
+from armazenamento_clientes import filtro_catalogo_literal, opcoes_conexao
 from vanna.remote import VannaDefault
 """
 Este codigo ja esta linkado dentro o kpis_Setup.py, 
@@ -11,22 +12,16 @@ e o segundo pelo kpis_Setup.py
 load_dotenv()
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 
-def conectar_postgres():
-    return psycopg2.connect(
-        host=os.getenv("DB_HOST"),
-        port=os.getenv("DB_PORT"),
-        dbname=os.getenv("DB_NAME"),
-        user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD")
-    )
+def conectar_postgres(id_client: int = None):
+    """Conexão emprestada do pool (conn.close() devolve ao pool)"""
+    return obter_conexao(id_client)
 
 def gerar_plan_treinamento(id_client: int,
                            vn: VannaDefault,
                            salvar_em_arquivo: bool = False):
-    prefixo = f"cli{id_client:02d}"
     consulta = f"""
         SELECT * FROM INFORMATION_SCHEMA.COLUMNS
-        WHERE table_name LIKE '{prefixo}%'
+        WHERE {filtro_catalogo_literal(id_client)}
     """
     try:
         df_info = vn.run_sql(consulta)
@@ -55,7 +50,8 @@ if __name__ == "__main__":
         port=os.getenv("DB_PORT"),
         dbname=os.getenv("DB_NAME"),
         user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD")
+        password=os.getenv("DB_PASSWORD"),
+        **opcoes_conexao(1)
     )
 
     plan = gerar_plan_treinamento(1, vn, salvar_em_arquivo=True)
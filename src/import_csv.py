@@ -1,10 +1,14 @@
 import os
+import re
 import pandas as pd
-import psycopg2
-import datetime
 import logging
 import sys
 from dotenv import load_dotenv
+from pool_conexoes import obter_conexao
+from catalogo_schema import invalidar_cache_tabela, id_client_da_tabela
+from carga_copy import copiar_chunks
+from inferencia_tipos import inferir_tipos, aplicar_tipos, colunas_ddl
+from arquivos_compactados import abrir_csv
 
 # 🔧 [LOGGING] Configuração de logging para Render
 def setup_render_logging():
@@ -48,62 +52,78 @@ PK_SUGGESTIONS = {
 
 TABLE_PREFIX = "cli02_"
 
-def conectar_banco():
-    render_logger.info("🔌 [DB] Conectando ao banco PostgreSQL para import")
+# Ingestão em streaming: linhas usadas para inferir o schema e tamanho dos chunks
+AMOSTRA_LINHAS = int(os.getenv("IMPORT_AMOSTRA_LINHAS", "10000"))
+LINHAS_POR_CHUNK = int(os.getenv("IMPORT_LINHAS_POR_CHUNK", "50000"))
+
+def sugestao_pk(nome_tabela: str) -> list:
+    """
+    Chave sugerida em PK_SUGGESTIONS para a tabela, aceitando o nome com ou
+    sem o prefixo cliXX_ (ex: cli02_olist_orders_dataset → ["order_id"]).
+    """
+    base = re.sub(r"^cli\d+_", "", nome_tabela, flags=re.IGNORECASE)
+    pk = PK_SUGGESTIONS.get(nome_tabela) or PK_SUGGESTIONS.get(base)
+    if pk and not isinstance(pk, (list, tuple)):
+        pk = [pk]
+    return list(pk) if pk else []
+
+def conectar_banco(id_client: int = None):
+    """Conexão emprestada do pool compartilhado (conn.close() devolve ao pool)"""
+    render_logger.info("🔌 [DB] Obtendo conexão do pool para import")
     try:
-        conn = psycopg2.connect(
-            host=DB_HOST, port=DB_PORT,
-            dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD
-        )
-        render_logger.info("✅ [DB] Conexão estabelecida com sucesso")
+        conn = obter_conexao(id_client)
+        render_logger.info("✅ [DB] Conexão obtida com sucesso")
         return conn
     except Exception as e:
         render_logger.error(f"❌ [DB] Erro ao conectar: {e}")
         raise
 
-def criar_tabela_automatica(nome_tabela: str, df: pd.DataFrame):
+def criar_tabela_automatica(nome_tabela: str, df: pd.DataFrame, tipos: dict = None):
     """
     Cria tabela no Postgres usando o nome e colunas de df.
     Mantém nomes originais de colunas para preservar JOINs.
+    Se `tipos` (saída de inferencia_tipos.inferir_tipos) for informado,
+    usa os tipos inferidos; senão mapeia pelos dtypes do DataFrame.
     """
     render_logger.info(f"🏗️ [TABLE] Criando tabela: {nome_tabela}")
-    conn = conectar_banco()
+    conn = conectar_banco(id_client_da_tabela(nome_tabela))
     cursor = conn.cursor()
 
-    col_defs = []
-    for col in df.columns:
-        dtype = str(df[col].dtype)
-        if dtype.startswith("datetime64"):
-            # detecta apenas data ou timestamp
-            if (df[col].dt.time == datetime.time(0, 0)).all():
-                sql_type = "DATE"
+    if tipos:
+        col_defs = colunas_ddl(tipos)
+    else:
+        col_defs = []
+        for col in df.columns:
+            dtype = str(df[col].dtype)
+            if dtype.startswith("datetime64"):
+                # detecta apenas data ou timestamp (comparação vetorizada)
+                valores = df[col].dropna()
+                if (valores == valores.dt.normalize()).all():
+                    sql_type = "DATE"
+                else:
+                    sql_type = "TIMESTAMP"
             else:
-                sql_type = "TIMESTAMP"
-        else:
-            map_tipo = {
-                "int64": "INTEGER",
-                "float64": "DECIMAL(18,6)",
-                "bool": "BOOLEAN",
-                "object": "TEXT"
-            }
-            sql_type = map_tipo.get(dtype, "TEXT")
-        # preserva nome exato da coluna
-        col_defs.append(f'"{col}" {sql_type}')
-
-    # monta lista de linhas (colunas + comentário de PK)
-    items = col_defs.copy()
-    pk = PK_SUGGESTIONS.get(nome_tabela)
+                map_tipo = {
+                    "int64": "INTEGER",
+                    "float64": "DECIMAL(18,6)",
+                    "bool": "BOOLEAN",
+                    "object": "TEXT"
+                }
+                sql_type = map_tipo.get(dtype, "TEXT")
+            # preserva nome exato da coluna
+            col_defs.append(f'"{col}" {sql_type}')
+
+    # comentário de PK fica fora da lista de colunas (evita vírgula sobrando)
+    comentario_pk = ""
+    pk = sugestao_pk(nome_tabela)
     if pk:
-        if isinstance(pk, (list, tuple)):
-            cols = '", "'.join(pk)
-        else:
-            cols = pk
-        items.append(f'-- SUGESTÃO PK: PRIMARY KEY ("{cols}")')
+        cols = '", "'.join(pk)
+        comentario_pk = f'\n  -- SUGESTÃO PK: PRIMARY KEY ("{cols}")'
 
-    # gera DDL sem vírgula sobrando
     ddl = (
         f'CREATE TABLE IF NOT EXISTS "{nome_tabela}" (\n  '
-        + ",\n  ".join(items)
+        + ",\n  ".join(col_defs)
+        + comentario_pk
         + "\n);"
     )
 
@@ -116,54 +136,125 @@ def criar_tabela_automatica(nome_tabela: str, df: pd.DataFrame):
     cursor.close()
     conn.close()
 
-def inserir_dados(nome_tabela, df: pd.DataFrame):
+def ler_amostra_csv(caminho_csv: str, linhas: int = None) -> pd.DataFrame:
     """
-    Insere linhas de df na tabela nome_tabela.
-    Usa placeholders para evitar SQL injection.
+    Lê apenas as primeiras linhas do CSV, como texto. A amostra é usada
+    pela inferência de tipos para definir o schema da tabela.
+    Aceita .csv.gz, .zip e .zst (descompactados em streaming).
     """
-    conn = conectar_banco()
-    cursor = conn.cursor()
+    with abrir_csv(caminho_csv) as f:
+        return pd.read_csv(f, nrows=linhas or AMOSTRA_LINHAS, dtype=str)
 
-    cols = ', '.join(f'"{c}"' for c in df.columns)
-    placeholders = ', '.join(['%s'] * len(df.columns))
-    insert_sql = f'INSERT INTO "{nome_tabela}" ({cols}) VALUES ({placeholders});'
+def ler_csv_em_chunks(caminho_csv: str, linhas_por_chunk: int = None, monitor=None):
+    """
+    Iterador de chunks de tamanho fixo. Todas as colunas são lidas como texto:
+    os tipos ficam estáveis entre chunks e quem converte é o Postgres no COPY,
+    de acordo com a DDL inferida da amostra. Arquivos compactados são
+    descompactados sob demanda, sem CSV intermediário em disco.
+    Com um monitor (progresso_importacao), informa bytes e linhas lidos.
+    """
+    contador = monitor.ao_ler_bytes if monitor else None
+    with abrir_csv(caminho_csv, contador=contador) as f:
+        for chunk in pd.read_csv(
+            f,
+            dtype=str,
+            chunksize=linhas_por_chunk or LINHAS_POR_CHUNK,
+        ):
+            if monitor:
+                monitor.ao_ler_linhas(len(chunk))
+            yield chunk
 
-    for _, row in df.iterrows():
-        # converte NaN/NaT em None para virar NULL no Postgres
-        vals = [None if pd.isna(v) else v for v in row.values]
-        cursor.execute(insert_sql, tuple(vals))
+def processar_csv_para_banco(caminho_csv: str, nome_tabela: str,
+                             linhas_por_chunk: int = None, modo: str = "completo",
+                             progresso=None, notificar: bool = True) -> dict:
+    """
+    modo="incremental" faz upsert pela chave (PK_SUGGESTIONS ou detectada),
+    gravando apenas linhas novas/alteradas (ver importacao_incremental).
+    modo="atomico" carrega em uma staging UNLOGGED e substitui a tabela
+    inteira com rename em uma única transação (ver troca_atomica).
 
-    conn.commit()
-    cursor.close()
-    conn.close()
+    Importa o CSV em streaming com memória constante:
+    1) infere os tipos a partir de uma amostra limitada (inferencia_tipos)
+    2) cria a tabela
+    3) lê chunks de tamanho fixo, converte datas fora do padrão ISO com o
+       formato detectado e carrega via COPY, numa única transação
+    Ao final, em todos os modos, roda a etapa pós-importação (ANALYZE e
+    índices automáticos, ver indices_automaticos) e marca para refresh os
+    KPIs materializados que leem a tabela (ver kpis_materializados).
 
-def processar_csv_para_banco(caminho_csv: str, nome_tabela: str):
-    """
-    Lê CSV, converte colunas object para datetime quando possível,
-    cria tabela e popula dados.
+    progresso(evento), se informado, recebe eventos com bytes lidos, linhas
+    lidas/carregadas, linhas/s e ETA (ver progresso_importacao). Toda
+    execução, com ou sem callback, é registrada em importacoes_execucoes.
+    notificar=False deixa a notificação dos agendadores para quem chamou
+    (ex: processos filhos da importação paralela, onde eles não rodam).
+    Retorna as estatísticas da carga.
     """
-    logging.info("Processando %s → tabela %s", caminho_csv, nome_tabela)
-    df = pd.read_csv(caminho_csv, low_memory=False)
-
-    # tenta converter strings para datetime
-    for col in df.select_dtypes(include=["object"]).columns:
-        try:
-            df[col] = pd.to_datetime(df[col])
-            logging.info("Coluna %s convertida para datetime", col)
-        except (ValueError, TypeError):
-            pass
-
-    criar_tabela_automatica(nome_tabela, df)
+    from indices_automaticos import pos_importacao
+    from progresso_importacao import MonitorImportacao
+    from kpis_materializados import notificar_importacao
+
+    logging.info("Processando %s → tabela %s (modo %s)", caminho_csv, nome_tabela, modo)
+    monitor = MonitorImportacao(nome_tabela, caminho_csv, modo, progresso)
+    try:
+        if modo == "incremental":
+            from importacao_incremental import importar_csv_incremental
+            stats = importar_csv_incremental(caminho_csv, nome_tabela, linhas_por_chunk=linhas_por_chunk,
+                                             monitor=monitor)
+        elif modo == "atomico":
+            from troca_atomica import importar_csv_atomico
+            stats = importar_csv_atomico(caminho_csv, nome_tabela, linhas_por_chunk, monitor=monitor)
+        else:
+            stats = _importar_csv_completo(caminho_csv, nome_tabela, linhas_por_chunk, monitor)
+
+        monitor.mudar_fase("indices")
+        stats["indices_criados"] = [i["indice"] for i in pos_importacao(nome_tabela)]
+        if notificar:
+            notificar_importacao(nome_tabela)
+    except Exception as e:
+        monitor.finalizar("ERRO", str(e))
+        raise
+    monitor.finalizar("OK", stats=stats)
+    return stats
+
+def _importar_csv_completo(caminho_csv: str, nome_tabela: str, linhas_por_chunk: int = None,
+                           monitor=None) -> dict:
+    amostra = ler_amostra_csv(caminho_csv)
+    tipos = inferir_tipos(amostra)
+    render_logger.info(f"🔍 [SCHEMA] Schema inferido de {len(amostra)} linhas de amostra")
+
+    criar_tabela_automatica(nome_tabela, amostra, tipos)
+    del amostra
+
     logging.info("Preparando inserção de dados na tabela %s …", nome_tabela)
-    inserir_dados(nome_tabela, df)
-    logging.info("Inseridos %d registros em %s.", len(df), nome_tabela)
+    conn = conectar_banco(id_client_da_tabela(nome_tabela))
+    try:
+        chunks = (aplicar_tipos(chunk, tipos) for chunk in ler_csv_em_chunks(caminho_csv, linhas_por_chunk, monitor))
+        stats = copiar_chunks(conn, nome_tabela, chunks,
+                              ao_carregar=monitor.ao_carregar_linhas if monitor else None)
+    finally:
+        conn.close()
 
-def processar_csv_para_banco_usuario(caminho_csv: str, nome_base: str, id_client: int):
+    invalidar_cache_tabela(nome_tabela)
+    logging.info("Inseridos %d registros em %s (%.0f linhas/s).",
+                 stats["linhas"], nome_tabela, stats["linhas_por_segundo"])
+    return stats
+
+def processar_csv_para_banco_usuario(caminho_csv: str, nome_base: str, id_client: int,
+                                     modo: str = "completo", progresso=None) -> dict:
     """
     Versão específica para usuários que adiciona prefixo automaticamente
     """
     nome_tabela = f"cli{id_client:02d}_{nome_base}"
-    return processar_csv_para_banco(caminho_csv, nome_tabela)
+    return processar_csv_para_banco(caminho_csv, nome_tabela, modo=modo, progresso=progresso)
+
+def processar_colunar_para_banco_usuario(caminho_arquivo: str, nome_base: str, id_client: int,
+                                         progresso=None) -> dict:
+    """
+    Importa Parquet/Arrow IPC com o prefixo do cliente (ver importacao_colunar)
+    """
+    from importacao_colunar import processar_colunar_para_banco
+    nome_tabela = f"cli{id_client:02d}_{nome_base}"
+    return processar_colunar_para_banco(caminho_arquivo, nome_tabela, progresso=progresso)
 
 # def importar_todas_planilhas_olist():
 #     """
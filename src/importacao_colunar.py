@@ -0,0 +1,275 @@
+"""
+Ingestão colunar de arquivos Parquet e Arrow IPC (Feather v2).
+
+Os arquivos são lidos com pyarrow em lotes (row groups do Parquet ou
+record batches do IPC), os tipos Arrow viram tipos Postgres direto do
+schema do arquivo, sem inferência por amostra, e cada lote é serializado
+pelo escritor CSV do próprio Arrow e enviado com COPY FROM STDIN. Nenhum
+DataFrame pandas de dtype object é criado no caminho.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import logging
+import contextlib
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from catalogo_schema import invalidar_cache_tabela, id_client_da_tabela
+
+# 🔧 [LOGGING] Configuração de logging para Render
+def setup_render_logging():
+    """Configura logging para ser visível no Render"""
+    logger = logging.getLogger('soliris_colunar')
+    if not logger.handlers:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setLevel(logging.INFO)
+        formatter = logging.Formatter(
+            '%(asctime)s - SOLIRIS-COLUNAR - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+        console_handler.setFormatter(formatter)
+        logger.addHandler(console_handler)
+        logger.setLevel(logging.INFO)
+    return logger
+
+# Inicializar logger
+render_logger = setup_render_logging()
+
+EXTENSOES_PARQUET = {".parquet", ".parq", ".pq"}
+EXTENSOES_ARROW = {".arrow", ".feather", ".ipc", ".arrows"}
+EXTENSOES_COLUNARES = EXTENSOES_PARQUET | EXTENSOES_ARROW
+
+# Linhas por lote lido do Parquet (o IPC usa os batches do próprio arquivo)
+LINHAS_POR_LOTE = int(os.getenv("IMPORT_LINHAS_POR_LOTE_COLUNAR", "65536"))
+
+def eh_arquivo_colunar(nome_arquivo: str) -> bool:
+    return os.path.splitext(nome_arquivo)[1].lower() in EXTENSOES_COLUNARES
+
+def _eh_parquet(caminho) -> bool:
+    if isinstance(caminho, str):
+        if os.path.splitext(caminho)[1].lower() in EXTENSOES_PARQUET:
+            return True
+        with open(caminho, "rb") as f:
+            return f.read(4) == b"PAR1"
+    posicao = caminho.tell()
+    assinatura = caminho.read(4)
+    caminho.seek(posicao)
+    return assinatura == b"PAR1"
+
+def tipo_postgres(tipo: pa.DataType) -> str:
+    """Tipo Postgres equivalente a um tipo Arrow"""
+    t = pa.types
+    if t.is_dictionary(tipo):
+        return tipo_postgres(tipo.value_type)
+    if t.is_boolean(tipo):
+        return "BOOLEAN"
+    if t.is_int8(tipo) or t.is_int16(tipo) or t.is_uint8(tipo):
+        return "SMALLINT"
+    if t.is_int32(tipo) or t.is_uint16(tipo):
+        return "INTEGER"
+    if t.is_int64(tipo) or t.is_uint32(tipo):
+        return "BIGINT"
+    if t.is_uint64(tipo):
+        return "NUMERIC(20,0)"
+    if t.is_float16(tipo) or t.is_float32(tipo):
+        return "REAL"
+    if t.is_float64(tipo):
+        return "DOUBLE PRECISION"
+    if t.is_decimal(tipo):
+        return f"NUMERIC({tipo.precision},{tipo.scale})"
+    if t.is_date(tipo):
+        return "DATE"
+    if t.is_timestamp(tipo):
+        return "TIMESTAMPTZ" if tipo.tz else "TIMESTAMP"
+    if t.is_time(tipo):
+        return "TIME"
+    if t.is_duration(tipo):
+        return "INTERVAL"
+    if t.is_binary(tipo) or t.is_large_binary(tipo) or t.is_fixed_size_binary(tipo):
+        return "BYTEA"
+    if t.is_nested(tipo):
+        return "JSONB"
+    return "TEXT"
+
+def colunas_ddl(schema: pa.Schema) -> list[str]:
+    """Lista de definições '"coluna" TIPO' a partir do schema Arrow"""
+    return [f'"{campo.name}" {tipo_postgres(campo.type)}' for campo in schema]
+
+def _preparar_coluna(coluna: pa.Array) -> pa.Array:
+    """
+    Converte as colunas que o escritor CSV do Arrow não entrega em um
+    formato aceito pelo COPY. Tipos escalares passam sem cópia.
+    """
+    t = pa.types
+    tipo = coluna.type
+    if t.is_dictionary(tipo):
+        return _preparar_coluna(coluna.dictionary_decode())
+    if t.is_binary(tipo) or t.is_large_binary(tipo) or t.is_fixed_size_binary(tipo):
+        # BYTEA em formato hex: \x0a1b...
+        return pa.array(
+            [None if v is None else "\\x" + v.hex() for v in coluna.to_pylist()], pa.string()
+        )
+    if t.is_duration(tipo):
+        micros = pc.cast(pc.cast(coluna, pa.duration("us")), pa.int64())
+        return pc.binary_join_element_wise(pc.cast(micros, pa.string()), " microseconds", "")
+    if t.is_nested(tipo):
+        # listas/structs/maps: JSON por linha (só estas colunas passam pelo Python)
+        return pa.array(
+            [None if v is None else json.dumps(v, default=str) for v in coluna.to_pylist()],
+            pa.string(),
+        )
+    if t.is_null(tipo):
+        return pa.nulls(len(coluna), pa.string())
+    return coluna
+
+def _preparar_lote(lote: pa.RecordBatch) -> pa.RecordBatch:
+    colunas = [_preparar_coluna(c) for c in lote.columns]
+    return pa.RecordBatch.from_arrays(colunas, names=lote.schema.names)
+
+@contextlib.contextmanager
+def abrir_arquivo_colunar(caminho, linhas_por_lote: int = None):
+    """
+    Abre um Parquet ou Arrow IPC (arquivo ou stream) sem carregá-lo inteiro.
+    Produz (schema, iterador de RecordBatch, total_de_linhas ou None) e fecha
+    o arquivo ao sair do bloco (um arquivo recebido já aberto fica aberto).
+    """
+    if _eh_parquet(caminho):
+        arquivo = pq.ParquetFile(caminho)
+        try:
+            lotes = arquivo.iter_batches(batch_size=linhas_por_lote or LINHAS_POR_LOTE)
+            yield arquivo.schema_arrow, lotes, arquivo.metadata.num_rows
+        finally:
+            arquivo.close()
+        return
+
+    origem = pa.memory_map(caminho, "r") if isinstance(caminho, str) else caminho
+    try:
+        try:
+            leitor = pa.ipc.open_file(origem)
+            lotes = (leitor.get_batch(i) for i in range(leitor.num_record_batches))
+            schema = leitor.schema
+        except pa.ArrowInvalid:
+            # formato stream (.arrows): não tem footer, só dá para iterar
+            origem.seek(0)
+            leitor = pa.ipc.open_stream(origem)
+            lotes, schema = iter(leitor), leitor.schema
+        yield schema, lotes, None
+    finally:
+        if origem is not caminho:
+            origem.close()
+
+def ler_preview_colunar(arquivo, linhas: int = 5):
+    """Primeiras linhas do arquivo como DataFrame, para o preview da interface"""
+    with abrir_arquivo_colunar(arquivo, linhas) as (_, lotes, _):
+        primeiro = next(iter(lotes), None)
+    if primeiro is None:
+        return pa.table({}).to_pandas()
+    return pa.Table.from_batches([primeiro]).slice(0, linhas).to_pandas()
+
+def copiar_lotes(conn, nome_tabela: str, lotes, commit: bool = True, ao_carregar=None) -> dict:
+    """
+    Envia RecordBatches para nome_tabela, um COPY por lote, na mesma transação.
+    ao_carregar(n), se informado, recebe as linhas de cada lote enviado.
+    Retorna {tabela, linhas, segundos, linhas_por_segundo}.
+    """
+    inicio = time.perf_counter()
+    total = 0
+    opcoes = pa_csv.WriteOptions(include_header=False)
+    cursor = conn.cursor()
+    try:
+        for lote in lotes:
+            if lote.num_rows == 0:
+                continue
+            lote = _preparar_lote(lote)
+            lista = ", ".join(f'"{c}"' for c in lote.schema.names)
+            copy_sql = f'COPY "{nome_tabela}" ({lista}) FROM STDIN WITH (FORMAT csv, NULL \'\')'
+            buffer = io.BytesIO()
+            pa_csv.write_csv(lote, buffer, write_options=opcoes)
+            buffer.seek(0)
+            cursor.copy_expert(copy_sql, buffer)
+            total += lote.num_rows
+            if ao_carregar:
+                ao_carregar(lote.num_rows)
+            render_logger.info(f"📦 [COLUNAR] {nome_tabela}: {total} linhas enviadas")
+        if commit:
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    segundos = max(time.perf_counter() - inicio, 1e-9)
+    return {
+        "tabela": nome_tabela,
+        "linhas": int(total),
+        "segundos": round(segundos, 3),
+        "linhas_por_segundo": round(total / segundos, 1),
+    }
+
+def processar_colunar_para_banco(caminho, nome_tabela: str, linhas_por_lote: int = None,
+                                 progresso=None) -> dict:
+    """
+    Importa um Parquet/Arrow em streaming: cria a tabela a partir do schema
+    do arquivo (se ainda não existir) e carrega lote a lote via COPY.
+    progresso(evento) recebe eventos de progresso (ver progresso_importacao).
+    """
+    from import_csv import conectar_banco, sugestao_pk
+    from indices_automaticos import pos_importacao
+    from kpis_materializados import notificar_importacao
+    from progresso_importacao import MonitorImportacao
+
+    arquivo = contextlib.ExitStack()
+    schema, lotes, total_previsto = arquivo.enter_context(abrir_arquivo_colunar(caminho, linhas_por_lote))
+    render_logger.info(
+        f"🏛️ [COLUNAR] {nome_tabela}: {len(schema)} colunas"
+        + (f", {total_previsto} linhas previstas" if total_previsto is not None else "")
+    )
+
+    comentario_pk = ""
+    pk = sugestao_pk(nome_tabela)
+    if pk:
+        cols = '", "'.join(pk)
+        comentario_pk = f'\n  -- SUGESTÃO PK: PRIMARY KEY ("{cols}")'
+    ddl = (
+        f'CREATE TABLE IF NOT EXISTS "{nome_tabela}" (\n  '
+        + ",\n  ".join(colunas_ddl(schema))
+        + comentario_pk
+        + "\n);"
+    )
+
+    monitor = MonitorImportacao(nome_tabela, caminho, "colunar", progresso, total_previsto)
+    try:
+        # o arquivo (e o memory map) é liberado antes das etapas pós-importação
+        with arquivo:
+            conn = conectar_banco(id_client_da_tabela(nome_tabela))
+            try:
+                cursor = conn.cursor()
+                cursor.execute(ddl)
+                cursor.close()
+                # DDL e carga na mesma transação: erro no meio não deixa tabela vazia
+                stats = copiar_lotes(conn, nome_tabela, lotes, ao_carregar=monitor.ao_carregar_linhas)
+            finally:
+                conn.close()
+
+        invalidar_cache_tabela(nome_tabela)
+        render_logger.info(
+            f"✅ [COLUNAR] {stats['linhas']} linhas em {nome_tabela} "
+            f"({stats['segundos']:.2f}s, {stats['linhas_por_segundo']:.0f} linhas/s)"
+        )
+        monitor.mudar_fase("indices")
+        indices = [i["indice"] for i in pos_importacao(nome_tabela)]
+        notificar_importacao(nome_tabela)
+    except Exception as e:
+        monitor.finalizar("ERRO", str(e))
+        raise
+    stats = {**stats, "modo": "colunar", "indices_criados": indices}
+    monitor.finalizar("OK", stats=stats)
+    return stats
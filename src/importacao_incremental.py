@@ -0,0 +1,265 @@
+"""
+Importação incremental (upsert) usando chaves primárias sugeridas.
+
+Em vez de recriar a tabela ou duplicar linhas a cada novo upload, os dados
+são carregados via COPY em uma tabela temporária de staging, comparados com
+a tabela do cliente por um hash da linha e apenas as linhas novas ou
+alteradas são gravadas com INSERT ... ON CONFLICT DO UPDATE. O custo de uma
+atualização diária fica proporcional ao delta.
+"""
+
+import sys
+import time
+import logging
+import pandas as pd
+
+from carga_copy import copiar_chunks
+from catalogo_schema import invalidar_cache_tabela, id_client_da_tabela
+from armazenamento_clientes import nome_regclass, schema_da_tabela
+
+# 🔧 [LOGGING] Configuração de logging para Render
+def setup_render_logging():
+    """Configura logging para ser visível no Render"""
+    logger = logging.getLogger('soliris_incremental')
+    if not logger.handlers:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setLevel(logging.INFO)
+        formatter = logging.Formatter(
+            '%(asctime)s - SOLIRIS-INCREMENTAL - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+        console_handler.setFormatter(formatter)
+        logger.addHandler(console_handler)
+        logger.setLevel(logging.INFO)
+    return logger
+
+# Inicializar logger
+render_logger = setup_render_logging()
+
+STAGING = "_stg_incremental"
+DELTA = "_stg_delta"
+# posição da linha no arquivo, preenchida pelo COPY (que lista só as colunas dos dados)
+POSICAO = "_stg_posicao"
+
+def _q(colunas) -> str:
+    return ", ".join(f'"{c}"' for c in colunas)
+
+def tabela_existe(cursor, nome_tabela: str) -> bool:
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (nome_regclass(nome_tabela),))
+    return cursor.fetchone()[0]
+
+def chave_primaria_existente(cursor, nome_tabela: str) -> list[str]:
+    """Colunas da PRIMARY KEY da tabela no banco (lista vazia se não houver)"""
+    cursor.execute("""
+        SELECT a.attname
+          FROM pg_index i
+          JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+         WHERE i.indrelid = to_regclass(%s) AND i.indisprimary
+         ORDER BY array_position(i.indkey, a.attnum)
+    """, (nome_regclass(nome_tabela),))
+    return [r[0] for r in cursor.fetchall()]
+
+def detectar_chave(nome_tabela: str, colunas: list[str], amostra: pd.DataFrame = None,
+                   cursor=None) -> list[str]:
+    """
+    Define a chave usada no upsert, nesta ordem:
+    1) PK_SUGGESTIONS (import_csv.sugestao_pk)
+    2) PRIMARY KEY já existente na tabela
+    3) coluna 'id' ou '*_id' sem repetição e sem nulos na amostra
+    """
+    from import_csv import sugestao_pk
+
+    chave = [c for c in sugestao_pk(nome_tabela) if c in colunas]
+    if chave:
+        return chave
+
+    if cursor is not None:
+        chave = [c for c in chave_primaria_existente(cursor, nome_tabela) if c in colunas]
+        if chave:
+            return chave
+
+    candidatas = [c for c in colunas if c.lower() == "id"] + \
+                 [c for c in colunas if c.lower().endswith("_id") and c.lower() != "id"]
+    for col in candidatas:
+        if amostra is None:
+            return [col]
+        valores = amostra[col]
+        if valores.notna().all() and valores.is_unique:
+            return [col]
+    return []
+
+def _garantir_indice_unico(cursor, nome_tabela: str, chave: list[str]):
+    """
+    ON CONFLICT exige um índice único sobre exatamente as colunas da chave.
+    Tabelas carregadas antes em modo "Adicionar linhas" podem ter chaves
+    repetidas: nesse caso a importação para com uma mensagem clara em vez
+    do erro de violação de unicidade do CREATE UNIQUE INDEX.
+    """
+    nome_indice = f"{nome_tabela}_{'_'.join(chave)}_uk"[:63]
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL",
+                   (f'"{schema_da_tabela(nome_tabela)}"."{nome_indice}"',))
+    if cursor.fetchone()[0]:
+        return
+    nao_nulas = " AND ".join(f'"{c}" IS NOT NULL' for c in chave)
+    cursor.execute(f"""
+        SELECT COUNT(*), COALESCE(SUM(n - 1), 0)
+          FROM (SELECT COUNT(*) AS n FROM "{nome_tabela}" WHERE {nao_nulas}
+                 GROUP BY {_q(chave)} HAVING COUNT(*) > 1) repetidas
+    """)
+    chaves_repetidas, linhas_extras = cursor.fetchone()
+    if chaves_repetidas:
+        raise ValueError(
+            f"A tabela '{nome_tabela}' já tem {chaves_repetidas} valores repetidos da chave "
+            f"({', '.join(chave)}), somando {linhas_extras} linhas duplicadas. O modo incremental "
+            "exige chave única: remova as duplicatas, substitua a tabela (modo completo/atômico) "
+            "ou informe outra chave."
+        )
+    cursor.execute(
+        f'CREATE UNIQUE INDEX IF NOT EXISTS "{nome_indice}" ON "{nome_tabela}" ({_q(chave)})'
+    )
+
+def aplicar_delta(conn, nome_tabela: str, colunas: list[str], chave: list[str],
+                  ignorar_no_hash: list[str] = None) -> dict:
+    """
+    Compara a staging já carregada com a tabela alvo e aplica o upsert.
+    Deve rodar na mesma transação/conexão que carregou a staging.
+    Linhas com chave nula são descartadas (nunca casariam com a tabela e
+    seriam reinseridas a cada carga); entre chaves repetidas no arquivo
+    vale a última linha.
+    Retorna {inseridos, atualizados, inalterados, duplicados, sem_chave}.
+    """
+    ignorar = set(ignorar_no_hash or [])
+    cols_hash = [c for c in colunas if c not in ignorar] or colunas
+    cond_join = " AND ".join(f's."{c}" = t."{c}"' for c in chave)
+    hash_s = "md5(ROW(" + ", ".join(f's."{c}"' for c in cols_hash) + ")::text)"
+    hash_t = "md5(ROW(" + ", ".join(f't."{c}"' for c in cols_hash) + ")::text)"
+
+    cursor = conn.cursor()
+    try:
+        nao_nulas = " AND ".join(f'"{c}" IS NOT NULL' for c in chave)
+        cursor.execute(f'SELECT COUNT(*), COUNT(*) FILTER (WHERE NOT ({nao_nulas})) FROM "{STAGING}"')
+        total_staging, sem_chave = cursor.fetchone()
+
+        # uma linha por chave (a última do arquivo) + flag de existência
+        cursor.execute(f"""
+            CREATE TEMP TABLE "{DELTA}" ON COMMIT DROP AS
+            SELECT s.*, (t."{chave[0]}" IS NOT NULL) AS _existe
+              FROM (SELECT DISTINCT ON ({_q(chave)}) * FROM "{STAGING}"
+                     WHERE {nao_nulas}
+                     ORDER BY {_q(chave)}, "{POSICAO}" DESC) s
+              LEFT JOIN "{nome_tabela}" t ON {cond_join}
+             WHERE t."{chave[0]}" IS NULL OR {hash_s} IS DISTINCT FROM {hash_t}
+        """)
+        cursor.execute(f'SELECT COUNT(*) FILTER (WHERE NOT _existe), COUNT(*) FILTER (WHERE _existe) FROM "{DELTA}"')
+        inseridos, atualizados = cursor.fetchone()
+
+        cursor.execute(f'SELECT COUNT(*) FROM (SELECT DISTINCT {_q(chave)} FROM "{STAGING}" WHERE {nao_nulas}) k')
+        distintos = cursor.fetchone()[0]
+
+        nao_chave = [c for c in colunas if c not in chave]
+        if nao_chave:
+            acao = "DO UPDATE SET " + ", ".join(f'"{c}" = EXCLUDED."{c}"' for c in nao_chave)
+        else:
+            acao = "DO NOTHING"
+        cursor.execute(f"""
+            INSERT INTO "{nome_tabela}" ({_q(colunas)})
+            SELECT {_q(colunas)} FROM "{DELTA}"
+            ON CONFLICT ({_q(chave)}) {acao}
+        """)
+    finally:
+        cursor.close()
+
+    return {
+        "inseridos": int(inseridos),
+        "atualizados": int(atualizados),
+        "inalterados": int(distintos - inseridos - atualizados),
+        "duplicados": int(total_staging - sem_chave - distintos),
+        "sem_chave": int(sem_chave),
+    }
+
+def upsert_chunks(conn, nome_tabela: str, chunks, colunas: list[str], chave: list[str],
+                  ignorar_no_hash: list[str] = None, monitor=None) -> dict:
+    """
+    Carrega os chunks na staging temporária (mesma estrutura da tabela alvo)
+    e aplica o delta, tudo em uma única transação.
+    """
+    if not chave:
+        raise ValueError(
+            f"Não foi possível determinar a chave de '{nome_tabela}'. "
+            "Informe as colunas de chave para o modo incremental."
+        )
+
+    inicio = time.perf_counter()
+    cursor = conn.cursor()
+    try:
+        _garantir_indice_unico(cursor, nome_tabela, chave)
+        cursor.execute(
+            f'CREATE TEMP TABLE "{STAGING}" (LIKE "{nome_tabela}" INCLUDING DEFAULTS) ON COMMIT DROP'
+        )
+        cursor.execute(f'ALTER TABLE "{STAGING}" ADD COLUMN "{POSICAO}" BIGINT GENERATED ALWAYS AS IDENTITY')
+        carga = copiar_chunks(conn, STAGING, chunks, commit=False,
+                              ao_carregar=monitor.ao_carregar_linhas if monitor else None)
+        if monitor:
+            monitor.mudar_fase("upsert")
+        resultado = aplicar_delta(conn, nome_tabela, colunas, chave, ignorar_no_hash)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    invalidar_cache_tabela(nome_tabela)
+    segundos = max(time.perf_counter() - inicio, 1e-9)
+    stats = {
+        "tabela": nome_tabela,
+        "modo": "incremental",
+        "chave": chave,
+        "linhas": carga["linhas"],
+        "segundos": round(segundos, 3),
+        "linhas_por_segundo": round(carga["linhas"] / segundos, 1),
+        **resultado,
+    }
+    render_logger.info(
+        f"🔁 [INCREMENTAL] {nome_tabela} (chave {chave}): {stats['inseridos']} inseridos, "
+        f"{stats['atualizados']} atualizados, {stats['inalterados']} inalterados"
+    )
+    if stats["sem_chave"]:
+        render_logger.warning(
+            f"⚠️ [INCREMENTAL] {nome_tabela}: {stats['sem_chave']} linhas com chave nula descartadas"
+        )
+    return stats
+
+def importar_csv_incremental(caminho_csv: str, nome_tabela: str, chave: list[str] = None,
+                             linhas_por_chunk: int = None, monitor=None) -> dict:
+    """
+    Importa o CSV em modo incremental. Se a tabela ainda não existir, ela é
+    criada a partir da amostra e todas as linhas entram como inseridas.
+    """
+    from import_csv import (
+        conectar_banco, ler_amostra_csv, ler_csv_em_chunks, criar_tabela_automatica
+    )
+    from inferencia_tipos import inferir_tipos, aplicar_tipos
+
+    amostra = ler_amostra_csv(caminho_csv)
+    tipos = inferir_tipos(amostra)
+    colunas = list(amostra.columns)
+
+    conn = conectar_banco(id_client_da_tabela(nome_tabela))
+    try:
+        cursor = conn.cursor()
+        if not tabela_existe(cursor, nome_tabela):
+            criar_tabela_automatica(nome_tabela, amostra, tipos)
+        chave = chave or detectar_chave(nome_tabela, colunas, amostra, cursor)
+        cursor.close()
+        del amostra
+
+        chunks = (aplicar_tipos(c, tipos) for c in ler_csv_em_chunks(caminho_csv, linhas_por_chunk, monitor))
+        return upsert_chunks(conn, nome_tabela, chunks, colunas, chave, monitor=monitor)
+    finally:
+        conn.close()
+
+def importar_dataframe_incremental(conn, df: pd.DataFrame, nome_tabela: str, chave: list[str],
+                                   ignorar_no_hash: list[str] = None) -> dict:
+    """Upsert de um DataFrame já em memória (ex: dados do HubSpot)"""
+    return upsert_chunks(conn, nome_tabela, [df], list(df.columns), chave, ignorar_no_hash)
@@ -0,0 +1,161 @@
+"""
+Importação paralela de vários CSVs em um pool de processos.
+
+Cada arquivo é lido e carregado por um processo próprio, com sua própria
+conexão ao banco (via import_csv.processar_csv_para_banco). O número de
+processos e o tamanho dos chunks são limitados por um orçamento total de
+memória, e o resultado traz o status e o erro de cada arquivo.
+
+Os agendadores (refresh de views de KPI, alertas) vivem no processo pai:
+os filhos não os notificam, o pai faz isso assim que cada arquivo termina.
+"""
+
+import os
+import sys
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from import_csv import processar_csv_para_banco, LINHAS_POR_CHUNK
+from catalogo_schema import invalidar_cache_tabela
+from arquivos_compactados import abrir_csv
+
+# 🔧 [LOGGING] Configuração de logging para Render
+def setup_render_logging():
+    """Configura logging para ser visível no Render"""
+    logger = logging.getLogger('soliris_import_paralelo')
+    if not logger.handlers:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setLevel(logging.INFO)
+        formatter = logging.Formatter(
+            '%(asctime)s - SOLIRIS-IMPORT-PARALELO - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+        console_handler.setFormatter(formatter)
+        logger.addHandler(console_handler)
+        logger.setLevel(logging.INFO)
+    return logger
+
+# Inicializar logger
+render_logger = setup_render_logging()
+
+# Orçamento total de memória para todos os processos do pool (MB)
+LIMITE_MEMORIA_MB = int(os.getenv("IMPORT_LIMITE_MEMORIA_MB", "1024"))
+# Multiplicador bytes-em-disco → bytes-em-memória de um chunk lido como texto
+FATOR_MEMORIA_PANDAS = 6
+LINHAS_AMOSTRA_TAMANHO = 1000
+MINIMO_LINHAS_POR_CHUNK = 1000
+
+def _bytes_por_linha(caminho_csv: str) -> float:
+    """Tamanho médio de linha (já descompactada) nas primeiras linhas do arquivo"""
+    total = linhas = 0
+    with abrir_csv(caminho_csv) as f:
+        for linha in f:
+            total += len(linha)
+            linhas += 1
+            if linhas >= LINHAS_AMOSTRA_TAMANHO:
+                break
+    return total / linhas if linhas else 1.0
+
+def planejar_recursos(caminhos: list[str], max_processos: int = None,
+                      limite_memoria_mb: int = None) -> tuple[int, int]:
+    """
+    Define (processos, linhas_por_chunk) de forma que
+    processos × memória_de_um_chunk caiba em limite_memoria_mb.
+    """
+    limite = (limite_memoria_mb or LIMITE_MEMORIA_MB) * 1024 * 1024
+    processos = min(max_processos or os.cpu_count() or 1, len(caminhos)) or 1
+
+    maior_linha = max(_bytes_por_linha(c) for c in caminhos)
+    memoria_por_linha = maior_linha * FATOR_MEMORIA_PANDAS
+
+    # reduz o chunk até o mínimo; se ainda não couber, reduz processos
+    while True:
+        linhas_por_chunk = int(limite / processos / memoria_por_linha)
+        if linhas_por_chunk >= MINIMO_LINHAS_POR_CHUNK or processos == 1:
+            break
+        processos -= 1
+
+    linhas_por_chunk = max(MINIMO_LINHAS_POR_CHUNK, min(linhas_por_chunk, LINHAS_POR_CHUNK))
+    return processos, linhas_por_chunk
+
+def _importar_arquivo(caminho_csv: str, nome_tabela: str, linhas_por_chunk: int) -> dict:
+    """Executado dentro do processo filho: importa um arquivo e nunca levanta exceção"""
+    inicio = time.perf_counter()
+    try:
+        stats = processar_csv_para_banco(caminho_csv, nome_tabela, linhas_por_chunk, notificar=False)
+        return {**stats, "arquivo": caminho_csv, "status": "OK", "erro": None}
+    except Exception as e:
+        return {
+            "arquivo": caminho_csv,
+            "tabela": nome_tabela,
+            "status": "ERRO",
+            "erro": str(e),
+            "linhas": 0,
+            "segundos": round(time.perf_counter() - inicio, 3),
+            "linhas_por_segundo": 0.0,
+        }
+
+def importar_csvs_paralelo(arquivos: dict[str, str], max_processos: int = None,
+                           limite_memoria_mb: int = None) -> list[dict]:
+    """
+    Importa vários CSVs em paralelo.
+    arquivos: {caminho_csv: nome_tabela}
+    Retorna uma lista (na ordem de entrada) com
+    {arquivo, tabela, status, erro, linhas, segundos, linhas_por_segundo}.
+    """
+    from kpis_materializados import notificar_importacao
+    from motor_alertas import notificar_alteracao
+
+    if not arquivos:
+        return []
+
+    caminhos = list(arquivos)
+    processos, linhas_por_chunk = planejar_recursos(caminhos, max_processos, limite_memoria_mb)
+    render_logger.info(
+        f"🚀 [PARALELO] {len(caminhos)} arquivos em {processos} processos "
+        f"({linhas_por_chunk} linhas/chunk)"
+    )
+
+    inicio = time.perf_counter()
+    resultados: dict[str, dict] = {}
+    # spawn evita herdar threads/conexões do processo do Streamlit
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=processos, mp_context=contexto) as pool:
+        futuros = {
+            pool.submit(_importar_arquivo, caminho, arquivos[caminho], linhas_por_chunk): caminho
+            for caminho in caminhos
+        }
+        for futuro in as_completed(futuros):
+            caminho = futuros[futuro]
+            try:
+                resultado = futuro.result()
+            except Exception as e:  # processo filho morreu (ex: OOM)
+                resultado = {
+                    "arquivo": caminho, "tabela": arquivos[caminho], "status": "ERRO",
+                    "erro": str(e), "linhas": 0, "segundos": 0.0, "linhas_por_segundo": 0.0,
+                }
+            resultados[caminho] = resultado
+            if resultado["status"] == "OK":
+                render_logger.info(f"✅ [PARALELO] {resultado['tabela']}: {resultado['linhas']} linhas")
+                # o cache do catálogo e os agendadores vivem neste processo, não nos filhos
+                invalidar_cache_tabela(resultado["tabela"])
+                notificar_importacao(resultado["tabela"])
+                notificar_alteracao()
+            else:
+                render_logger.error(f"❌ [PARALELO] {resultado['tabela']}: {resultado['erro']}")
+
+    total_linhas = sum(r["linhas"] for r in resultados.values())
+    render_logger.info(
+        f"🏁 [PARALELO] {total_linhas} linhas em {time.perf_counter() - inicio:.2f}s"
+    )
+    return [resultados[c] for c in caminhos]
+
+def importar_csvs_paralelo_usuario(arquivos: dict[str, str], id_client: int, **kwargs) -> list[dict]:
+    """
+    Versão específica para usuários: arquivos = {caminho_csv: nome_base},
+    o prefixo cliXX_ é adicionado automaticamente a cada tabela.
+    """
+    com_prefixo = {caminho: f"cli{id_client:02d}_{nome}" for caminho, nome in arquivos.items()}
+    return importar_csvs_paralelo(com_prefixo, **kwargs)
@@ -0,0 +1,282 @@
+"""
+Etapa pós-importação: ANALYZE e criação automática de índices.
+
+Depois de cada import a tabela recebe estatísticas novas (ANALYZE) e índices
+nas colunas que provavelmente serão usadas em JOINs e filtros pelo SQL
+gerado no chat:
+1) chave de PK_SUGGESTIONS
+2) colunas 'id' / '*_id'
+filtradas pela cardinalidade estimada pelo ANALYZE (pg_stats), que é uma
+amostra da tabela. Cada índice criado é registrado em indices_automaticos
+para revisão (tamanho e uso via pg_stat_user_indexes) e pode ser removido.
+
+Os índices são sempre comuns: um índice único criado só porque os dados
+atuais não têm repetições faria o modo "Adicionar linhas" falhar na próxima
+carga com linhas sobrepostas. A unicidade fica com o modo incremental, que
+cria o próprio índice único da chave do upsert (importacao_incremental).
+"""
+
+import os
+import sys
+import hashlib
+import logging
+import threading
+
+from catalogo_schema import id_client_da_tabela
+from armazenamento_clientes import nome_regclass, schema_da_tabela, filtro_catalogo
+
+# 🔧 [LOGGING] Configuração de logging para Render
+def setup_render_logging():
+    """Configura logging para ser visível no Render"""
+    logger = logging.getLogger('soliris_indices')
+    if not logger.handlers:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setLevel(logging.INFO)
+        formatter = logging.Formatter(
+            '%(asctime)s - SOLIRIS-INDICES - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+        console_handler.setFormatter(formatter)
+        logger.addHandler(console_handler)
+        logger.setLevel(logging.INFO)
+    return logger
+
+# Inicializar logger
+render_logger = setup_render_logging()
+
+# "0" desliga a etapa pós-importação
+INDICES_AUTOMATICOS = os.getenv("IMPORT_INDICES_AUTOMATICOS", "1") == "1"
+MAX_INDICES_POR_TABELA = 5
+# Colunas *_id com menos valores distintos que isso não ganham índice
+MINIMO_DISTINTOS = 50
+# sempre em public, mesmo quando a conexão usa o search_path do cliente
+TABELA_REGISTRO = "public.indices_automaticos"
+
+_tabela_criada = False
+_tabela_lock = threading.Lock()
+
+def criar_tabela_registro(cursor):
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABELA_REGISTRO} (
+            id SERIAL PRIMARY KEY,
+            id_client INTEGER,
+            tabela TEXT NOT NULL,
+            indice TEXT NOT NULL,
+            colunas TEXT[] NOT NULL,
+            motivo TEXT,
+            distintos_estimados BIGINT,
+            ddl TEXT,
+            criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (tabela, indice)
+        )
+    """)
+
+def _garantir_tabela_registro(conn, cursor):
+    """criar_tabela_registro uma única vez por processo"""
+    global _tabela_criada
+    if not _tabela_criada:
+        with _tabela_lock:
+            if not _tabela_criada:
+                criar_tabela_registro(cursor)
+                conn.commit()
+                _tabela_criada = True
+
+def _colunas_indexadas(cursor, nome_tabela: str) -> set[str]:
+    """Colunas que já são a primeira coluna de algum índice da tabela"""
+    cursor.execute("""
+        SELECT a.attname
+          FROM pg_index i
+          JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+         WHERE i.indrelid = to_regclass(%s)
+    """, (nome_regclass(nome_tabela),))
+    return {r[0] for r in cursor.fetchall()}
+
+def _estatisticas_colunas(cursor, nome_tabela: str) -> tuple[float, dict[str, float]]:
+    """(linhas estimadas, {coluna: n_distinct do pg_stats})"""
+    cursor.execute(
+        "SELECT reltuples FROM pg_class WHERE oid = to_regclass(%s)",
+        (nome_regclass(nome_tabela),)
+    )
+    linha = cursor.fetchone()
+    reltuples = max(float(linha[0]), 0.0) if linha else 0.0
+    cursor.execute(
+        "SELECT attname, n_distinct FROM pg_stats WHERE schemaname = %s AND tablename = %s",
+        (schema_da_tabela(nome_tabela), nome_tabela)
+    )
+    return reltuples, {col: float(nd) for col, nd in cursor.fetchall()}
+
+def _distintos(n_distinct: float, reltuples: float) -> int:
+    # n_distinct negativo = fração das linhas (-1 → todos distintos)
+    return int(-n_distinct * reltuples) if n_distinct < 0 else int(n_distinct)
+
+def sugerir_indices(cursor, nome_tabela: str) -> list[dict]:
+    """
+    Lista de índices recomendados (ainda não existentes) para a tabela.
+    Requer estatísticas atualizadas (rodar ANALYZE antes).
+    """
+    from import_csv import sugestao_pk
+
+    cursor.execute("""
+        SELECT column_name FROM information_schema.columns
+         WHERE table_schema = %s AND table_name = %s
+         ORDER BY ordinal_position
+    """, (schema_da_tabela(nome_tabela), nome_tabela))
+    colunas = [r[0] for r in cursor.fetchall()]
+    indexadas = _colunas_indexadas(cursor, nome_tabela)
+    reltuples, n_distinct = _estatisticas_colunas(cursor, nome_tabela)
+
+    sugestoes = []
+    pk = [c for c in sugestao_pk(nome_tabela) if c in colunas]
+    if pk and pk[0] not in indexadas:
+        sugestoes.append({
+            "colunas": pk,
+            "motivo": "PK_SUGGESTIONS",
+            "distintos": _distintos(n_distinct.get(pk[0], 0), reltuples),
+        })
+        indexadas.add(pk[0])
+
+    for col in colunas:
+        nome = col.lower()
+        if col in indexadas or not (nome == "id" or nome.endswith("_id")):
+            continue
+        distintos = _distintos(n_distinct.get(col, 0), reltuples)
+        if distintos < MINIMO_DISTINTOS:
+            continue
+        sugestoes.append({
+            "colunas": [col],
+            "motivo": f"nome *_id, ~{distintos} valores distintos",
+            "distintos": distintos,
+        })
+
+    # os mais seletivos primeiro, a chave sugerida sempre no topo
+    sugestoes.sort(key=lambda s: (s["motivo"] != "PK_SUGGESTIONS", -s["distintos"]))
+    return sugestoes[:MAX_INDICES_POR_TABELA]
+
+def nome_indice_automatico(nome_tabela: str, colunas: list[str]) -> str:
+    """
+    <tabela>_<colunas>_<hash>_auto em até 63 caracteres: o hash das colunas
+    mantém distintos os nomes que o truncamento tornaria iguais
+    """
+    sufixo = hashlib.sha1(",".join(colunas).encode("utf-8")).hexdigest()[:8]
+    return f"{nome_tabela}_{'_'.join(colunas)}"[:49] + f"_{sufixo}_auto"
+
+def _criar_indice(conn, nome_tabela: str, sugestao: dict) -> tuple[str, str]:
+    """Cria o índice e devolve (nome, DDL executado)"""
+    nome_indice = nome_indice_automatico(nome_tabela, sugestao["colunas"])
+    lista = ", ".join(f'"{c}"' for c in sugestao["colunas"])
+    cursor = conn.cursor()
+    try:
+        ddl = f'CREATE INDEX IF NOT EXISTS "{nome_indice}" ON "{nome_tabela}" ({lista})'
+        cursor.execute(ddl)
+        conn.commit()
+        return nome_indice, ddl
+    finally:
+        cursor.close()
+
+def analisar_e_indexar(conn, nome_tabela: str) -> list[dict]:
+    """
+    Roda ANALYZE, cria os índices sugeridos e registra cada um.
+    Retorna a lista de índices criados.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f'ANALYZE "{nome_tabela}"')
+        conn.commit()
+        _garantir_tabela_registro(conn, cursor)
+        sugestoes = sugerir_indices(cursor, nome_tabela)
+    finally:
+        cursor.close()
+
+    criados = []
+    for sugestao in sugestoes:
+        nome_indice, ddl = _criar_indice(conn, nome_tabela, sugestao)
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            INSERT INTO {TABELA_REGISTRO}
+                (id_client, tabela, indice, colunas, motivo, distintos_estimados, ddl)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (tabela, indice) DO UPDATE
+               SET colunas = EXCLUDED.colunas,
+                   motivo = EXCLUDED.motivo,
+                   ddl = EXCLUDED.ddl,
+                   distintos_estimados = EXCLUDED.distintos_estimados,
+                   criado_em = CURRENT_TIMESTAMP
+        """, (id_client_da_tabela(nome_tabela), nome_tabela, nome_indice,
+              sugestao["colunas"], sugestao["motivo"], sugestao["distintos"], ddl))
+        conn.commit()
+        cursor.close()
+        criados.append({"indice": nome_indice, **sugestao})
+        render_logger.info(f"🗂️ [INDICES] {nome_indice} ({sugestao['motivo']})")
+    return criados
+
+def pos_importacao(nome_tabela: str) -> list[dict]:
+    """
+    Etapa executada ao fim de cada import. Nunca derruba o import:
+    falhas são apenas registradas no log.
+    """
+    if not INDICES_AUTOMATICOS:
+        return []
+    from import_csv import conectar_banco
+    try:
+        conn = conectar_banco(id_client_da_tabela(nome_tabela))
+    except Exception as e:
+        render_logger.warning(f"⚠️ [INDICES] Sem conexão para pós-importação de {nome_tabela}: {e}")
+        return []
+    try:
+        return analisar_e_indexar(conn, nome_tabela)
+    except Exception as e:
+        conn.rollback()
+        render_logger.warning(f"⚠️ [INDICES] Pós-importação de {nome_tabela} falhou: {e}")
+        return []
+    finally:
+        conn.close()
+
+def listar_indices_automaticos(id_client: int) -> list[dict]:
+    """Índices criados automaticamente para o cliente, com tamanho e uso"""
+    from import_csv import conectar_banco
+    conn = conectar_banco()
+    cursor = conn.cursor()
+    # schema do cliente no modo atual: um índice homônimo de outro schema não conta
+    condicao, params = filtro_catalogo(id_client, "s.schemaname", "s.relname")
+    try:
+        _garantir_tabela_registro(conn, cursor)
+        cursor.execute(f"""
+            SELECT r.tabela, r.indice, r.colunas, r.motivo, r.distintos_estimados, r.criado_em,
+                   pg_relation_size(s.indexrelid) AS bytes,
+                   s.idx_scan
+              FROM {TABELA_REGISTRO} r
+              JOIN pg_stat_user_indexes s
+                ON s.relname = r.tabela AND s.indexrelname = r.indice AND {condicao}
+             WHERE r.id_client = %s
+             ORDER BY r.tabela, r.criado_em
+        """, (*params, id_client))
+        nomes = [d[0] for d in cursor.description]
+        return [dict(zip(nomes, linha)) for linha in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+
+def remover_indice_automatico(id_client: int, nome_indice: str) -> bool:
+    """Remove um índice criado automaticamente (só os registrados para o cliente)"""
+    from import_csv import conectar_banco
+    conn = conectar_banco()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            f"SELECT tabela FROM {TABELA_REGISTRO} WHERE id_client = %s AND indice = %s",
+            (id_client, nome_indice)
+        )
+        registro = cursor.fetchone()
+        if not registro:
+            return False
+        cursor.execute(f'DROP INDEX IF EXISTS "{schema_da_tabela(registro[0])}"."{nome_indice}"')
+        cursor.execute(
+            f"DELETE FROM {TABELA_REGISTRO} WHERE id_client = %s AND indice = %s",
+            (id_client, nome_indice)
+        )
+        conn.commit()
+        render_logger.info(f"🗑️ [INDICES] {nome_indice} removido")
+        return True
+    finally:
+        cursor.close()
+        conn.close()
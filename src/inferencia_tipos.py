@@ -0,0 +1,173 @@
+"""
+Inferência vetorizada de tipos para CSVs importados.
+
+Trabalha sobre uma amostra lida como texto: cada coluna é testada contra um
+conjunto fixo de padrões (regex) para booleanos, inteiros, decimais e
+datas/timestamps. O resultado é um dict por coluna com o tipo SQL e, para
+datas fora do padrão ISO, o formato explícito usado para converter a coluna
+inteira em uma única chamada de pd.to_datetime.
+
+A amostra não vê o arquivo todo, então os tipos numéricos não são
+dimensionados por ela: inteiros viram BIGINT e decimais NUMERIC sem
+precisão/escala, para que linhas posteriores maiores ou com mais casas
+decimais não estourem o COPY nem sejam arredondadas.
+"""
+
+import sys
+import logging
+import pandas as pd
+
+# 🔧 [LOGGING] Configuração de logging para Render
+def setup_render_logging():
+    """Configura logging para ser visível no Render"""
+    logger = logging.getLogger('soliris_tipos')
+    if not logger.handlers:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setLevel(logging.INFO)
+        formatter = logging.Formatter(
+            '%(asctime)s - SOLIRIS-TIPOS - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+        console_handler.setFormatter(formatter)
+        logger.addHandler(console_handler)
+        logger.setLevel(logging.INFO)
+    return logger
+
+# Inicializar logger
+render_logger = setup_render_logging()
+
+# Valores aceitos nativamente pelo tipo BOOLEAN do Postgres
+VALORES_BOOLEANOS = {"true", "false", "t", "f", "yes", "no", "y", "n"}
+
+REGEX_INTEIRO = r"[+-]?\d+"
+REGEX_DECIMAL = r"[+-]?(?:\d+\.\d*|\.\d+|\d+)"
+REGEX_CIENTIFICO = r"[+-]?(?:\d+\.?\d*|\.\d+)[eE][+-]?\d+"
+
+# Candidatos de data/hora testados em ordem: (regex, formato, tem_hora, iso)
+# Formatos ISO são enviados como texto ao COPY (o Postgres já os entende);
+# os demais são convertidos com o formato explícito.
+CANDIDATOS_DATA = [
+    (r"\d{4}-\d{2}-\d{2}", "%Y-%m-%d", False, True),
+    (r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}", "%Y-%m-%d %H:%M:%S", True, True),
+    (r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d+", "%Y-%m-%d %H:%M:%S.%f", True, True),
+    (r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}", "%Y-%m-%d %H:%M", True, True),
+    (r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}", "%Y-%m-%dT%H:%M:%S", True, True),
+    (r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:?\d{2})", "ISO8601", True, True),
+    (r"\d{2}/\d{2}/\d{4}", "%d/%m/%Y", False, False),
+    (r"\d{2}/\d{2}/\d{4}", "%m/%d/%Y", False, False),
+    (r"\d{2}/\d{2}/\d{4} \d{2}:\d{2}:\d{2}", "%d/%m/%Y %H:%M:%S", True, False),
+    (r"\d{2}/\d{2}/\d{4} \d{2}:\d{2}:\d{2}", "%m/%d/%Y %H:%M:%S", True, False),
+    (r"\d{2}/\d{2}/\d{4} \d{2}:\d{2}", "%d/%m/%Y %H:%M", True, False),
+    (r"\d{2}/\d{2}/\d{4} \d{2}:\d{2}", "%m/%d/%Y %H:%M", True, False),
+    (r"\d{2}-\d{2}-\d{4}", "%d-%m-%Y", False, False),
+]
+
+LIMITE_BIGINT = 9_223_372_036_854_775_807
+
+def _tipo(sql: str, categoria: str, formato: str = None) -> dict:
+    return {"sql": sql, "categoria": categoria, "formato": formato}
+
+def _inferir_inteiro(valores: pd.Series) -> dict:
+    # zeros à esquerda indicam códigos (CEP, documentos): preserva como texto
+    if (valores.str.lstrip("+-").str.match(r"0\d")).any():
+        return _tipo("TEXT", "texto")
+
+    # comparação pelo número de dígitos: valores acima de 2^63 não cabem em int64
+    absolutos = valores.str.lstrip("+-").str.lstrip("0")
+    digitos = absolutos.str.len()
+    if digitos.max() < 19:
+        return _tipo("BIGINT", "inteiro")
+    if digitos.max() > 19:
+        return _tipo("NUMERIC", "decimal")
+    # com 19 dígitos a ordem das strings é a numérica; o negativo vai até ...808
+    negativos = valores.str.startswith("-")
+    longos = digitos == 19
+    if (absolutos[longos & ~negativos] <= str(LIMITE_BIGINT)).all() and \
+       (absolutos[longos & negativos] <= str(LIMITE_BIGINT + 1)).all():
+        return _tipo("BIGINT", "inteiro")
+    return _tipo("NUMERIC", "decimal")
+
+def _inferir_data(valores: pd.Series):
+    for regex, formato, tem_hora, iso in CANDIDATOS_DATA:
+        if not valores.str.fullmatch(regex).all():
+            continue
+        convertidos = pd.to_datetime(
+            valores, format=formato, errors="coerce", utc=(formato == "ISO8601")
+        )
+        if convertidos.isna().any():
+            continue  # ex: 13/25/2020 não vale como %m/%d/%Y
+
+        if formato == "ISO8601":
+            return _tipo("TIMESTAMPTZ", "timestamp", None)
+        # formato com hora é sempre TIMESTAMP, mesmo que a amostra só tenha
+        # meia-noite: DATE truncaria em silêncio as horas das linhas seguintes
+        if not tem_hora:
+            return _tipo("DATE", "data", None if iso else formato)
+        return _tipo("TIMESTAMP", "timestamp", None if iso else formato)
+    return None
+
+def inferir_tipo_coluna(serie: pd.Series) -> dict:
+    """
+    Infere o tipo de uma coluna de texto.
+    Retorna {"sql": tipo_postgres, "categoria": ..., "formato": strftime ou None}.
+    """
+    valores = serie.dropna().astype(str).str.strip()
+    valores = valores[valores != ""]
+    if valores.empty:
+        return _tipo("TEXT", "texto")
+
+    if valores.str.lower().isin(VALORES_BOOLEANOS).all():
+        return _tipo("BOOLEAN", "booleano")
+    if valores.str.fullmatch(REGEX_INTEIRO).all():
+        return _inferir_inteiro(valores)
+    if valores.str.fullmatch(REGEX_DECIMAL).all():
+        return _tipo("NUMERIC", "decimal")
+    if valores.str.fullmatch(f"{REGEX_DECIMAL}|{REGEX_CIENTIFICO}").all():
+        return _tipo("DOUBLE PRECISION", "decimal")
+
+    tipo_data = _inferir_data(valores)
+    if tipo_data:
+        return tipo_data
+    return _tipo("TEXT", "texto")
+
+def inferir_tipos(amostra: pd.DataFrame) -> dict[str, dict]:
+    """Infere o tipo de cada coluna de uma amostra lida com dtype=str"""
+    tipos = {col: inferir_tipo_coluna(amostra[col]) for col in amostra.columns}
+    resumo = ", ".join(f"{c}={t['sql']}" for c, t in tipos.items())
+    render_logger.info(f"🔍 [TIPOS] {len(tipos)} colunas inferidas: {resumo}")
+    return tipos
+
+def aplicar_tipos(chunk: pd.DataFrame, tipos: dict[str, dict]) -> pd.DataFrame:
+    """
+    Converte as colunas de data fora do padrão ISO com o formato explícito
+    detectado na amostra (uma única chamada por coluna). As demais colunas
+    seguem como texto para o COPY. Valores que não casam com o formato
+    interrompem a importação (ValueError), como acontece no COPY com datas
+    ISO inválidas, em vez de virarem NULL silenciosamente.
+    """
+    for col, tipo in tipos.items():
+        formato = tipo.get("formato")
+        if not formato or col not in chunk.columns:
+            continue
+        originais = chunk[col]
+        convertidos = pd.to_datetime(originais, format=formato, errors="coerce")
+        preenchidos = originais.notna() & (originais.astype(str).str.strip() != "")
+        invalidos = convertidos.isna() & preenchidos
+        if invalidos.any():
+            exemplo = originais[invalidos].iloc[0]
+            render_logger.error(
+                f"❌ [TIPOS] Coluna {col}: {int(invalidos.sum())} valores fora do formato {formato} (ex: {exemplo!r})"
+            )
+            raise ValueError(
+                f"Coluna {col}: valor {exemplo!r} não corresponde ao formato de data {formato} "
+                f"detectado na amostra ({int(invalidos.sum())} valores inválidos neste bloco)"
+            )
+        if tipo["categoria"] == "data":
+            chunk[col] = convertidos.dt.strftime("%Y-%m-%d")
+        else:
+            chunk[col] = convertidos.dt.strftime("%Y-%m-%d %H:%M:%S.%f")
+    return chunk
+
+def colunas_ddl(tipos: dict[str, dict]) -> list[str]:
+    """Lista de definições '"coluna" TIPO' para o CREATE TABLE"""
+    return [f'"{col}" {tipo["sql"]}' for col, tipo in tipos.items()]
@@ -1,8 +1,12 @@
-import os, json, csv, logging
-import psycopg2
+import os, re, json, csv, time, logging, threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from psycopg2.extras import execute_values
+from pool_conexoes import obter_conexao
+from armazenamento_clientes import opcoes_conexao
 from vanna.remote import VannaDefault
 from gerar_schema_cliente import gerar_plan_treinamento
+from catalogo_schema import obter_mapa_colunas
 
 
 load_dotenv()
@@ -11,18 +15,35 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(mess
 # Instancia Vanna para uso geral
 vn = VannaDefault(model="jarves", api_key=os.getenv("API_KEY"))
 
-def conectar_postgres():
-    return psycopg2.connect(
-        host=os.getenv("DB_HOST"),
-        port=os.getenv("DB_PORT"),
-        dbname=os.getenv("DB_NAME"),
-        user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD")
-    )
+# Geração de SQL na importação de KPIs: chamadas simultâneas à API da Vanna
+# e teto de chamadas por minuto
+GERACAO_CONCORRENCIA = int(os.getenv("KPI_GERACAO_CONCORRENCIA", "4"))
+GERACAO_POR_MINUTO = int(os.getenv("KPI_GERACAO_POR_MINUTO", "60"))
+EXPLAIN_TIMEOUT_MS = 5000
+
+class LimitadorTaxa:
+    """Espaça as chamadas para no máximo `por_minuto` (compartilhado entre threads)"""
+
+    def __init__(self, por_minuto: int):
+        self.intervalo = 60.0 / por_minuto if por_minuto > 0 else 0.0
+        self._proxima = 0.0
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        with self._lock:
+            agora = time.monotonic()
+            espera = self._proxima - agora
+            self._proxima = max(agora, self._proxima) + self.intervalo
+        if espera > 0:
+            time.sleep(espera)
+
+def conectar_postgres(id_client: int = None):
+    """Conexão emprestada do pool (conn.close() devolve ao pool)"""
+    return obter_conexao(id_client)
 
 def criar_tabela_kpis(id_client: int):
     table = f"cli{int(id_client):02d}_kpis_definicoes"
-    conn = conectar_postgres()
+    conn = conectar_postgres(id_client)
     cur = conn.cursor()
     cur.execute(f"""
         CREATE TABLE IF NOT EXISTS {table} (
@@ -41,7 +62,7 @@ def criar_tabela_kpis(id_client: int):
 
 def inserir_kpi(id_client: int, nome: str, desc: str, formula: str):
     table = f"cli{int(id_client):02d}_kpis_definicoes"
-    conn = conectar_postgres()
+    conn = conectar_postgres(id_client)
     cur = conn.cursor()
     cur.execute(f"""
         INSERT INTO {table} (id_client, nome_kpi, descricao, formula_sql)
@@ -54,29 +75,138 @@ def inserir_kpi(id_client: int, nome: str, desc: str, formula: str):
     cur.close()
     conn.close()
     logging.info("KPI '%s' atualizada/inserida em %s.", nome, table)
+    from kpis_materializados import notificar_formulas
+    notificar_formulas(id_client, {nome: formula})
+
+def _ler_csv_kpis(csv_path: str) -> list[dict]:
+    """Linhas válidas do CSV (nome e descricao preenchidos); nome repetido fica a última"""
+    kpis = {}
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            nome = (row.get("nome") or "").strip()
+            desc = (row.get("descricao") or "").strip()
+            if not nome or not desc:
+                continue
+            kpis[nome] = {"nome": nome, "descricao": desc}
+    return list(kpis.values())
+
+def _gerar_sql_kpi(vn: VannaDefault, kpi: dict, limitador: LimitadorTaxa) -> dict:
+    limitador.aguardar()
+    inicio = time.perf_counter()
+    try:
+        formula_sql = vn.generate_sql(
+            question=f"Crie a consulta SQL para o KPI '{kpi['nome']}': {kpi['descricao']}"
+        )
+        kpi["formula_sql"] = (formula_sql or "").strip().rstrip(";").strip() or None
+        if not kpi["formula_sql"]:
+            kpi.update(status="ERRO_GERACAO", erro="Vanna não retornou SQL")
+    except Exception as e:
+        kpi.update(formula_sql=None, status="ERRO_GERACAO", erro=str(e))
+    kpi["segundos_geracao"] = round(time.perf_counter() - inicio, 3)
+    logging.info("SQL gerada para '%s' em %.2fs: %s", kpi["nome"], kpi["segundos_geracao"], kpi["formula_sql"])
+    return kpi
+
+def _validar_formulas(conn, cur, kpis: list[dict]):
+    """
+    EXPLAIN de cada fórmula na mesma transação somente leitura, isolando
+    falhas com SAVEPOINT. Marca status OK ou SQL_INVALIDO. A transação é
+    encerrada com conn.rollback() para o psycopg2 abrir a próxima (a do upsert).
+    """
+    cur.execute("SET TRANSACTION READ ONLY")
+    cur.execute("SELECT set_config('statement_timeout', %s, true)", (str(EXPLAIN_TIMEOUT_MS),))
+    for kpi in kpis:
+        if kpi.get("status"):
+            continue
+        if not re.match(r"^\s*(SELECT|WITH)\b", kpi["formula_sql"], re.IGNORECASE):
+            kpi.update(status="SQL_INVALIDO", erro="A fórmula deve ser uma consulta SELECT")
+            continue
+        cur.execute("SAVEPOINT validar_kpi")
+        try:
+            cur.execute(f"EXPLAIN {kpi['formula_sql']}")
+            cur.execute("RELEASE SAVEPOINT validar_kpi")
+            kpi.update(status="OK", erro=None)
+        except Exception as e:
+            cur.execute("ROLLBACK TO SAVEPOINT validar_kpi")
+            kpi.update(status="SQL_INVALIDO", erro=str(e).strip().splitlines()[0])
+    conn.rollback()
 
-def processar_csv(csv_path: str, id_client: int, vn: VannaDefault):
+def processar_csv(csv_path: str, id_client: int, vn: VannaDefault) -> list[dict]:
     """
-    1) Treina o agente com o plano de dados do cliente
+    1) Treina o agente com o plano de dados do cliente (uma vez)
     2) Lê o CSV de KPIs
-    3) Para cada KPI chama vn.generate_sql() e insere no banco
+    3) Gera as SQLs em paralelo (GERACAO_CONCORRENCIA, GERACAO_POR_MINUTO)
+    4) Valida cada fórmula com EXPLAIN e grava as válidas em um único
+       INSERT ... ON CONFLICT (execute_values), na mesma conexão
+    Retorna um relatório por KPI: {nome, status, formula_sql, erro, segundos_geracao}
+    com status OK | SQL_INVALIDO | ERRO_GERACAO.
     """
     logging.info("Processando CSV de KPIs: %s", csv_path)
+    inicio = time.perf_counter()
 
-    # re-treina com o plan antes de gerar cada SQL de KPI
     gerar_plan_treinamento(id_client, vn, salvar_em_arquivo=False)
 
-    with open(csv_path, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            nome = row["nome"].strip()
-            desc = row["descricao"].strip()
-            logging.info("Gerando SQL para KPI '%s' via Vanna...", nome)
-            formula_sql = vn.generate_sql(
-                question=f"Crie a consulta SQL para o KPI '{nome}': {desc}"
-            )
-            logging.info("SQL gerada para '%s': %s", nome, formula_sql)
-            inserir_kpi(id_client, nome, desc, formula_sql)
+    kpis = _ler_csv_kpis(csv_path)
+    if not kpis:
+        logging.warning("Nenhum KPI válido em %s", csv_path)
+        return []
+
+    limitador = LimitadorTaxa(GERACAO_POR_MINUTO)
+    with ThreadPoolExecutor(max_workers=max(1, min(GERACAO_CONCORRENCIA, len(kpis))),
+                            thread_name_prefix="kpi-sql") as executor:
+        kpis = list(executor.map(lambda k: _gerar_sql_kpi(vn, k, limitador), kpis))
+
+    table = f"cli{int(id_client):02d}_kpis_definicoes"
+    conn = conectar_postgres(id_client)
+    cur = conn.cursor()
+    try:
+        _validar_formulas(conn, cur, kpis)
+        validos = [k for k in kpis if k["status"] == "OK"]
+        if validos:
+            execute_values(cur, f"""
+                INSERT INTO {table} (id_client, nome_kpi, descricao, formula_sql)
+                VALUES %s
+                ON CONFLICT (id_client, nome_kpi) DO UPDATE SET
+                    descricao = EXCLUDED.descricao,
+                    formula_sql = EXCLUDED.formula_sql;
+            """, [(id_client, k["nome"], k["descricao"], k["formula_sql"]) for k in validos])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+    logging.info(
+        "%d KPIs processados em %.2fs: %d gravados, %d inválidos, %d sem SQL",
+        len(kpis), time.perf_counter() - inicio,
+        sum(k["status"] == "OK" for k in kpis),
+        sum(k["status"] == "SQL_INVALIDO" for k in kpis),
+        sum(k["status"] == "ERRO_GERACAO" for k in kpis),
+    )
+    if validos:
+        from kpis_materializados import notificar_formulas
+        notificar_formulas(id_client, {k["nome"]: k["formula_sql"] for k in validos})
+    return [
+        {key: k.get(key) for key in ("nome", "status", "formula_sql", "erro", "segundos_geracao")}
+        for k in kpis
+    ]
+
+def materializar_kpis(id_client: int, nomes: list[str], intervalo_min: int = None) -> list[dict]:
+    """
+    Opt-in: transforma as fórmulas dos KPIs escolhidos em views materializadas,
+    atualizadas pelo agendador a cada intervalo_min e após importações
+    (ver kpis_materializados). Retorna um resultado por KPI.
+    """
+    from kpis_materializados import materializar_kpi
+    resultados = []
+    for nome in nomes:
+        try:
+            resultados.append({**materializar_kpi(id_client, nome, intervalo_min), "status": "OK"})
+        except Exception as e:
+            logging.error("Erro ao materializar KPI '%s': %s", nome, e)
+            resultados.append({"nome_kpi": nome, "status": "ERRO", "erro": str(e)})
+    return resultados
 
 def criar_kpis_automatico(id_client: int, schema_json: list[dict]):
     """
@@ -91,36 +221,15 @@ def criar_kpis_automatico(id_client: int, schema_json: list[dict]):
 
 def gerar_schema_json(id_client: int) -> list[dict]:
     """
-    1) Lista tabelas public CLIXX_  
-    2) Para cada tabela busca colunas  
-    3) Monta lista de {table_name, columns:[{name,type},…]}  
-    4) Salva em arq/schema_cliente_XX.json  
+    1) Lê o catálogo das tabelas public CLIXX_ (uma única consulta, com cache)
+    2) Monta lista de {table_name, columns:[{name,type},…]}
+    3) Salva em arq/schema_cliente_XX.json
     """
-    conn = conectar_postgres()
-    cur = conn.cursor()
-    prefixo = f"cli{int(id_client):02d}_"
-    cur.execute("""
-        SELECT table_name
-        FROM information_schema.tables
-        WHERE table_schema='public'
-          AND table_name LIKE %s
-        ORDER BY table_name
-    """, (prefixo+"%",))
-    tabelas = [r[0] for r in cur.fetchall()]
-
-    schema = []
-    for tbl in tabelas:
-        cur.execute("""
-            SELECT column_name, data_type
-            FROM information_schema.columns
-            WHERE table_name = %s
-            ORDER BY ordinal_position
-        """, (tbl,))
-        cols = [{"name":c, "type":t} for c,t in cur.fetchall()]
-        schema.append({"table_name": tbl, "columns": cols})
-
-    cur.close()
-    conn.close()
+    mapa = obter_mapa_colunas(id_client)
+    schema = [
+        {"table_name": tbl, "columns": [{"name": c, "type": t} for c, t in cols]}
+        for tbl, cols in sorted(mapa.items())
+    ]
 
     os.makedirs("arq", exist_ok=True)
     fname = f"schema_cliente_{id_client:02d}.json"
@@ -136,7 +245,7 @@ def fetch_kpis(id_client: int) -> list[tuple[str, str, str]]:
     Retorna lista de KPIs definidos para o cliente:
     cada tupla é (nome_kpi, descricao, formula_sql)
     """
-    conn = conectar_postgres()
+    conn = conectar_postgres(id_client)
     cur = conn.cursor()
     table = f"cli{int(id_client):02d}_kpis_definicoes"
     cur.execute(f'''
@@ -161,7 +270,8 @@ if __name__ == "__main__":
         port=os.getenv("DB_PORT"),
         dbname=os.getenv("DB_NAME"),
         user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD")
+        password=os.getenv("DB_PASSWORD"),
+        **opcoes_conexao(ID_CLIENTE)
     )
 
     # 2) Gera somente o JSON de plano, sobrescrevendo se já existir
@@ -179,7 +289,7 @@ def setup_treinamento_cliente(id_client):
     criar_tabela_kpis(id_client)
     csv_kpis = f"csv/kpis_cliente_{id_client:02d}.csv"
     if os.path.exists(csv_kpis):
-        processar_csv(csv_kpis, id_client)
+        processar_csv(csv_kpis, id_client, vn)
     else:
         schema = gerar_schema_json(id_client)
         criar_kpis_automatico(id_client, schema)
@@ -0,0 +1,535 @@
+"""
+KPIs materializados (opt-in por KPI, ver kpis_Setup.materializar_kpis).
+
+A formula_sql do KPI vira uma MATERIALIZED VIEW cliXX_kpi_mv_<nome> com
+índice único sobre as colunas do GROUP BY (ou sobre a coluna _linha,
+constante, em KPIs escalares), o que permite REFRESH MATERIALIZED VIEW
+CONCURRENTLY (leitores não bloqueiam durante a atualização). O registro fica em public.kpis_materializados, com as
+tabelas de que a view depende (pg_depend), o intervalo de atualização e o
+resultado do último refresh.
+
+O AgendadorRefresh (thread do processo ou `python src/kpis_materializados.py`
+como worker separado) atualiza cada view quando o intervalo vence ou quando
+uma importação altera uma das tabelas de origem (notificar_importacao).
+Leitores (motor_kpis, treinamento do chat, alertas) trocam a fórmula pela
+leitura da view via sql_leitura / reescrever_para_view.
+"""
+
+import os
+import re
+import sys
+import time
+import hashlib
+import logging
+import threading
+import unicodedata
+
+from pool_conexoes import obter_conexao, em_segundo_plano
+from catalogo_schema import id_client_da_tabela
+
+# 🔧 [LOGGING] Configuração de logging para Render
+def setup_render_logging():
+    """Configura logging para ser visível no Render"""
+    logger = logging.getLogger('soliris_kpis_mv')
+    if not logger.handlers:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setLevel(logging.INFO)
+        formatter = logging.Formatter(
+            '%(asctime)s - SOLIRIS-KPIS-MV - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+        console_handler.setFormatter(formatter)
+        logger.addHandler(console_handler)
+        logger.setLevel(logging.INFO)
+    return logger
+
+# Inicializar logger
+render_logger = setup_render_logging()
+
+TABELA_REGISTRO = "public.kpis_materializados"
+INTERVALO_PADRAO_MIN = int(os.getenv("KPI_MV_INTERVALO_MIN", "60"))
+# De quanto em quanto tempo o agendador procura views vencidas (segundos)
+INTERVALO_VERIFICACAO_S = float(os.getenv("KPI_MV_VERIFICACAO_S", "30"))
+# Tempo de vida do cache do registro usado pelos leitores (segundos)
+CACHE_REGISTRO_TTL = 60
+
+_cache_registro: dict[int, tuple[float, list[dict]]] = {}
+_cache_lock = threading.Lock()
+
+def criar_tabela_registro(cursor):
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABELA_REGISTRO} (
+            id SERIAL PRIMARY KEY,
+            id_client INTEGER NOT NULL,
+            nome_kpi TEXT NOT NULL,
+            view TEXT NOT NULL,
+            formula_sql TEXT NOT NULL,
+            colunas TEXT[],
+            tabelas TEXT[],
+            intervalo_min INTEGER NOT NULL DEFAULT 60,
+            pendente BOOLEAN NOT NULL DEFAULT FALSE,
+            ultimo_refresh TIMESTAMP,
+            segundos_refresh DOUBLE PRECISION,
+            erro TEXT,
+            criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (id_client, nome_kpi)
+        )
+    """)
+
+def nome_view(id_client: int, nome_kpi: str) -> str:
+    """cliXX_kpi_mv_<nome>, dentro do limite de 63 caracteres"""
+    ascii_ = unicodedata.normalize("NFKD", nome_kpi).encode("ascii", "ignore").decode()
+    slug = re.sub(r"[^a-z0-9]+", "_", ascii_.lower()).strip("_") or "kpi"
+    sufixo = hashlib.sha1(nome_kpi.encode("utf-8")).hexdigest()[:6]
+    return f"cli{int(id_client):02d}_kpi_mv_{slug[:36]}_{sufixo}"
+
+def _formula_kpi(cursor, id_client: int, nome_kpi: str) -> str:
+    tabela = f"cli{int(id_client):02d}_kpis_definicoes"
+    cursor.execute(f'SELECT formula_sql FROM "{tabela}" WHERE nome_kpi = %s', (nome_kpi,))
+    linha = cursor.fetchone()
+    if not linha or not linha[0]:
+        raise ValueError(f"KPI '{nome_kpi}' não encontrado ou sem formula_sql")
+    return linha[0]
+
+_FIM_GROUP_BY = re.compile(
+    r"\s+(HAVING|ORDER\s+BY|LIMIT|OFFSET|FETCH|WINDOW|UNION|INTERSECT|EXCEPT)\b", re.IGNORECASE
+)
+
+def _clausula_group_by(sql: str):
+    """Texto do GROUP BY de nível zero (fora de parênteses e literais) ou None"""
+    nivel, em_literal, inicio = 0, False, None
+    for i, c in enumerate(sql):
+        if c == "'":
+            em_literal = not em_literal
+        elif em_literal:
+            continue
+        elif c == "(":
+            nivel += 1
+        elif c == ")":
+            nivel -= 1
+        elif nivel == 0 and c.isspace():
+            if inicio is None:
+                achou = re.match(r"\s+GROUP\s+BY\s+", sql[i:], re.IGNORECASE)
+                if achou:
+                    inicio = i + achou.end()
+            elif _FIM_GROUP_BY.match(sql[i:]):
+                return sql[inicio:i].strip()
+    return sql[inicio:].strip() if inicio is not None else None
+
+def _colunas_chave(formula: str, colunas: list[str]):
+    """
+    Colunas da view que correspondem ao GROUP BY da fórmula: cada grupo é
+    uma linha, então elas formam a chave única do REFRESH ... CONCURRENTLY.
+    Retorna None para fórmulas sem GROUP BY (KPI escalar).
+    """
+    from motor_kpis import normalizar_sql, _separar_from, _dividir_campos, _ALIAS
+
+    sql = normalizar_sql(formula)
+    grupo = _clausula_group_by(sql)
+    if grupo is None:
+        return None
+    if re.match(r"^(ROLLUP|CUBE|GROUPING\s+SETS)\b", grupo, re.IGNORECASE):
+        raise ValueError("GROUP BY com ROLLUP/CUBE/GROUPING SETS não pode ser materializado")
+
+    # expressões do SELECT com alias, para GROUP BY <expressão> (ex: DATE_TRUNC(...))
+    partes = _separar_from(sql)
+    por_expressao = {}
+    for campo in _dividir_campos(partes[0]) if partes else []:
+        alias = _ALIAS.search(campo)
+        if alias:
+            por_expressao[campo[:alias.start()].strip().lower()] = alias.group(2)
+
+    chave = []
+    for item in _dividir_campos(grupo):
+        simples = re.match(r'^(?:"?\w+"?\.)?("?)(\w+)\1$', item)
+        if item.isdigit() and 0 < int(item) <= len(colunas):
+            nome = colunas[int(item) - 1]
+        elif simples:
+            nome = simples.group(2) if simples.group(1) else simples.group(2).lower()
+        else:
+            nome = por_expressao.get(item.lower())
+        if nome not in colunas:
+            raise ValueError(f"a expressão '{item}' do GROUP BY precisa aparecer no SELECT da fórmula")
+        if nome not in chave:
+            chave.append(nome)
+    return chave
+
+def _criar_view(cursor, view: str, formula: str) -> tuple[list[str], list[str]]:
+    """Cria a view com índice único; retorna (colunas, tabelas de origem)"""
+    formula = formula.strip().rstrip(";")
+    cursor.execute(f"SELECT * FROM ({formula}) q LIMIT 0")
+    chave = _colunas_chave(formula, [d[0] for d in cursor.description])
+
+    # _linha guarda a ordem da fórmula para a leitura; em KPI escalar é a chave constante
+    linha = "1" if chave is None else "row_number() OVER ()"
+    cursor.execute(f'DROP MATERIALIZED VIEW IF EXISTS "{view}"')
+    cursor.execute(f'CREATE MATERIALIZED VIEW "{view}" AS SELECT {linha} AS _linha, q.* FROM ({formula}) q')
+    if chave is None:
+        cursor.execute(f'SELECT COUNT(*) FROM "{view}"')
+        if cursor.fetchone()[0] > 1:
+            raise ValueError("fórmula sem GROUP BY retorna mais de uma linha; não há chave para o refresh")
+        chave = ["_linha"]
+    # índice único em colunas simples é o requisito do REFRESH ... CONCURRENTLY
+    colunas_indice = ", ".join(f'"{c}"' for c in chave)
+    cursor.execute(f'CREATE UNIQUE INDEX "{view[:58]}_uidx" ON "{view}" ({colunas_indice})')
+
+    cursor.execute(f'SELECT * FROM "{view}" LIMIT 0')
+    colunas = [d[0] for d in cursor.description if d[0] != "_linha"]
+    cursor.execute("""
+        SELECT DISTINCT c.relname
+          FROM pg_rewrite r
+          JOIN pg_depend d ON d.objid = r.oid AND d.classid = 'pg_rewrite'::regclass
+          JOIN pg_class c ON c.oid = d.refobjid
+         WHERE r.ev_class = to_regclass(%s)
+           AND c.oid <> r.ev_class
+           AND c.relkind IN ('r', 'p', 'v', 'm')
+    """, (f'"{view}"',))
+    tabelas = sorted(r[0] for r in cursor.fetchall())
+    return colunas, tabelas
+
+def materializar_kpi(id_client: int, nome_kpi: str, intervalo_min: int = None) -> dict:
+    """Cria (ou recria) a view materializada do KPI e a registra"""
+    intervalo_min = intervalo_min or INTERVALO_PADRAO_MIN
+    view = nome_view(id_client, nome_kpi)
+    inicio = time.perf_counter()
+    conn = obter_conexao(id_client)
+    cursor = conn.cursor()
+    try:
+        criar_tabela_registro(cursor)
+        formula = _formula_kpi(cursor, id_client, nome_kpi)
+        colunas, tabelas = _criar_view(cursor, view, formula)
+        segundos = time.perf_counter() - inicio
+        cursor.execute(f"""
+            INSERT INTO {TABELA_REGISTRO}
+                (id_client, nome_kpi, view, formula_sql, colunas, tabelas, intervalo_min,
+                 pendente, ultimo_refresh, segundos_refresh, erro)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, FALSE, CURRENT_TIMESTAMP, %s, NULL)
+            ON CONFLICT (id_client, nome_kpi) DO UPDATE SET
+                view = EXCLUDED.view, formula_sql = EXCLUDED.formula_sql,
+                colunas = EXCLUDED.colunas, tabelas = EXCLUDED.tabelas,
+                intervalo_min = EXCLUDED.intervalo_min, pendente = FALSE,
+                ultimo_refresh = EXCLUDED.ultimo_refresh,
+                segundos_refresh = EXCLUDED.segundos_refresh, erro = NULL
+        """, (id_client, nome_kpi, view, formula, colunas, tabelas, intervalo_min, segundos))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+    _invalidar_registro(id_client)
+    render_logger.info(f"🧊 [KPI-MV] {nome_kpi} materializado em {view} ({segundos:.2f}s, origem: {', '.join(tabelas)})")
+    return {"nome_kpi": nome_kpi, "view": view, "colunas": colunas, "tabelas": tabelas,
+            "intervalo_min": intervalo_min, "segundos": round(segundos, 3)}
+
+def desmaterializar_kpi(id_client: int, nome_kpi: str) -> bool:
+    """Remove a view e o registro; o KPI volta a ser calculado pela fórmula"""
+    conn = obter_conexao(id_client)
+    cursor = conn.cursor()
+    try:
+        criar_tabela_registro(cursor)
+        cursor.execute(
+            f"DELETE FROM {TABELA_REGISTRO} WHERE id_client = %s AND nome_kpi = %s RETURNING view",
+            (id_client, nome_kpi)
+        )
+        linha = cursor.fetchone()
+        if linha:
+            cursor.execute(f'DROP MATERIALIZED VIEW IF EXISTS "{linha[0]}"')
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+    _invalidar_registro(id_client)
+    return bool(linha)
+
+def atualizar_view(registro: dict) -> dict:
+    """
+    REFRESH ... CONCURRENTLY da view do registro. Se a view não existir
+    (ex: removida na troca atômica da tabela de origem) ou a fórmula do KPI
+    mudou desde a materialização, recria a partir da fórmula atual. Outro processo atualizando a mesma view faz
+    este pular (advisory lock).
+    """
+    id_client, view = registro["id_client"], registro["view"]
+    inicio = time.perf_counter()
+    conn = obter_conexao(id_client)
+    cursor = conn.cursor()
+    erro = None
+    try:
+        cursor.execute("SELECT pg_try_advisory_xact_lock(hashtext(%s))", (view,))
+        if not cursor.fetchone()[0]:
+            conn.rollback()
+            return {**registro, "status": "OCUPADO"}
+
+        from motor_kpis import normalizar_sql
+        formula = _formula_kpi(cursor, id_client, registro["nome_kpi"])
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (f'"{view}"',))
+        if cursor.fetchone()[0] and normalizar_sql(formula) == normalizar_sql(registro["formula_sql"]):
+            cursor.execute(f'REFRESH MATERIALIZED VIEW CONCURRENTLY "{view}"')
+            colunas, tabelas = registro["colunas"], registro["tabelas"]
+        else:
+            # view removida ou fórmula alterada na reimportação dos KPIs
+            colunas, tabelas = _criar_view(cursor, view, formula)
+        cursor.execute(f"""
+            UPDATE {TABELA_REGISTRO}
+               SET pendente = FALSE, ultimo_refresh = CURRENT_TIMESTAMP,
+                   segundos_refresh = %s, erro = NULL, formula_sql = %s, colunas = %s, tabelas = %s
+             WHERE id_client = %s AND nome_kpi = %s
+        """, (time.perf_counter() - inicio, formula, colunas, tabelas, id_client, registro["nome_kpi"]))
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        erro = str(e).strip()
+        render_logger.error(f"❌ [KPI-MV] Refresh de {view} falhou: {erro}")
+        try:
+            # ultimo_refresh também avança: a próxima tentativa espera o intervalo
+            cursor.execute(
+                f"UPDATE {TABELA_REGISTRO} SET erro = %s, pendente = FALSE, ultimo_refresh = CURRENT_TIMESTAMP "
+                f"WHERE id_client = %s AND nome_kpi = %s",
+                (erro, id_client, registro["nome_kpi"])
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+    finally:
+        cursor.close()
+        conn.close()
+
+    _invalidar_registro(id_client)
+    segundos = time.perf_counter() - inicio
+    if not erro:
+        render_logger.info(f"🔄 [KPI-MV] {view} atualizada em {segundos:.2f}s")
+    return {**registro, "status": "ERRO" if erro else "OK", "erro": erro, "segundos": round(segundos, 3)}
+
+def _registros(where: str = "TRUE", params: tuple = ()) -> list[dict]:
+    conn = obter_conexao()
+    cursor = conn.cursor()
+    try:
+        criar_tabela_registro(cursor)
+        conn.commit()
+        cursor.execute(f"""
+            SELECT id_client, nome_kpi, view, formula_sql, colunas, tabelas, intervalo_min,
+                   pendente, ultimo_refresh, segundos_refresh, erro
+              FROM {TABELA_REGISTRO}
+             WHERE {where}
+             ORDER BY id_client, nome_kpi
+        """, params)
+        nomes = [d[0] for d in cursor.description]
+        return [dict(zip(nomes, linha)) for linha in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+
+def listar_kpis_materializados(id_client: int) -> list[dict]:
+    return _registros("id_client = %s", (id_client,))
+
+def views_vencidas() -> list[dict]:
+    """Views pendentes (origem alterada) ou com intervalo vencido"""
+    return _registros("""
+        pendente
+        OR ultimo_refresh IS NULL
+        OR ultimo_refresh + intervalo_min * INTERVAL '1 minute' <= CURRENT_TIMESTAMP
+    """)
+
+# --- leitura -------------------------------------------------------------------
+
+def _invalidar_registro(id_client: int):
+    with _cache_lock:
+        _cache_registro.pop(id_client, None)
+
+def _registro_cliente(id_client: int) -> list[dict]:
+    agora = time.monotonic()
+    with _cache_lock:
+        entrada = _cache_registro.get(id_client)
+    if entrada and agora - entrada[0] < CACHE_REGISTRO_TTL:
+        return entrada[1]
+    try:
+        registros = listar_kpis_materializados(id_client)
+    except Exception as e:
+        render_logger.warning(f"⚠️ [KPI-MV] Registro indisponível: {e}")
+        registros = []
+    with _cache_lock:
+        _cache_registro[id_client] = (agora, registros)
+    return registros
+
+def _utilizavel(registro: dict) -> bool:
+    # pendente = a view pode ter sido removida com a tabela de origem
+    return registro["ultimo_refresh"] is not None and not registro["pendente"] and not registro["erro"]
+
+def sql_leitura(registro: dict) -> str:
+    colunas = ", ".join(f'"{c}"' for c in registro["colunas"] or []) or "*"
+    return f'SELECT {colunas} FROM "{registro["view"]}" ORDER BY _linha'
+
+def views_ativas(id_client: int) -> dict[str, dict]:
+    """{nome_kpi: registro} das views prontas para leitura"""
+    return {r["nome_kpi"]: r for r in _registro_cliente(id_client) if _utilizavel(r)}
+
+def view_vigente(views: dict[str, dict], nome_kpi: str, formula: str):
+    """
+    Registro da view do KPI se ela ainda corresponde à formula atual;
+    senão None (fórmula alterada e view ainda não recriada).
+    """
+    from motor_kpis import normalizar_sql
+    registro = views.get(nome_kpi)
+    if registro and formula and normalizar_sql(registro["formula_sql"]) == normalizar_sql(formula):
+        return registro
+    return None
+
+def _registro_da_formula(id_client: int, sql: str):
+    from motor_kpis import normalizar_sql
+    alvo = normalizar_sql(sql)
+    for registro in views_ativas(id_client).values():
+        if normalizar_sql(registro["formula_sql"]) == alvo:
+            return registro
+    return None
+
+def reescrever_para_view(id_client: int, sql: str):
+    """
+    Se sql é a fórmula de um KPI materializado (ignorando espaços e ';'),
+    retorna a leitura da view; senão None.
+    """
+    registro = _registro_da_formula(id_client, sql)
+    return sql_leitura(registro) if registro else None
+
+def versao_view(id_client: int, sql: str):
+    """
+    ultimo_refresh da view que reescrever_para_view usaria para sql, ou None.
+    A view só muda no refresh, então o valor lido dela depende desta versão
+    e não apenas das tabelas de origem.
+    """
+    registro = _registro_da_formula(id_client, sql)
+    return registro["ultimo_refresh"] if registro else None
+
+# --- integração com importações ------------------------------------------------
+
+def remover_views_dependentes(cursor, nome_tabela: str) -> list[str]:
+    """
+    Remove (na transação do cursor) as views materializadas que dependem da
+    tabela e as marca como pendentes, para que DROP/troca da tabela não
+    falhe por dependência. O agendador as recria depois.
+    """
+    criar_tabela_registro(cursor)
+    cursor.execute(
+        f"UPDATE {TABELA_REGISTRO} SET pendente = TRUE WHERE %s = ANY(tabelas) RETURNING view",
+        (nome_tabela,)
+    )
+    views = [r[0] for r in cursor.fetchall()]
+    for view in views:
+        cursor.execute(f'DROP MATERIALIZED VIEW IF EXISTS "{view}"')
+    if views:
+        _invalidar_registro(id_client_da_tabela(nome_tabela))
+        render_logger.info(f"🧊 [KPI-MV] {len(views)} views de {nome_tabela} removidas para a troca")
+    return views
+
+def notificar_importacao(nome_tabela: str) -> int:
+    """
+    Marca como pendentes as views que leem a tabela importada e acorda o
+    agendador. Nunca derruba a importação.
+    """
+    try:
+        conn = obter_conexao()
+        cursor = conn.cursor()
+        try:
+            criar_tabela_registro(cursor)
+            cursor.execute(
+                f"UPDATE {TABELA_REGISTRO} SET pendente = TRUE WHERE %s = ANY(tabelas)",
+                (nome_tabela,)
+            )
+            marcadas = cursor.rowcount
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+    except Exception as e:
+        render_logger.warning(f"⚠️ [KPI-MV] Não foi possível marcar views de {nome_tabela}: {e}")
+        return 0
+    if marcadas:
+        _invalidar_registro(id_client_da_tabela(nome_tabela))
+        if _agendador is not None:
+            _agendador.acordar()
+    return marcadas
+
+def notificar_formulas(id_client: int, formulas: dict[str, str]) -> list[str]:
+    """
+    Marca como pendentes as views de KPIs cuja fórmula mudou ({nome: formula}
+    recém-gravado em cliXX_kpis_definicoes) e acorda o agendador, que as
+    recria. Nunca derruba a gravação dos KPIs.
+    """
+    from motor_kpis import normalizar_sql
+    try:
+        registros = {r["nome_kpi"]: r for r in listar_kpis_materializados(id_client)}
+        alterados = [
+            nome for nome, formula in formulas.items()
+            if nome in registros and normalizar_sql(registros[nome]["formula_sql"]) != normalizar_sql(formula or "")
+        ]
+        if not alterados:
+            return []
+        conn = obter_conexao(id_client)
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                f"UPDATE {TABELA_REGISTRO} SET pendente = TRUE WHERE id_client = %s AND nome_kpi = ANY(%s)",
+                (id_client, alterados)
+            )
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+    except Exception as e:
+        render_logger.warning(f"⚠️ [KPI-MV] Não foi possível marcar views de KPIs alterados: {e}")
+        return []
+    _invalidar_registro(id_client)
+    render_logger.info(f"🧊 [KPI-MV] Fórmula alterada, views pendentes: {', '.join(alterados)}")
+    if _agendador is not None:
+        _agendador.acordar()
+    return alterados
+
+# --- agendador -----------------------------------------------------------------
+
+class AgendadorRefresh(threading.Thread):
+    """Thread que atualiza as views vencidas ou pendentes"""
+
+    def __init__(self, intervalo_s: float = INTERVALO_VERIFICACAO_S):
+        super().__init__(daemon=True, name="kpis-mv-refresh")
+        self.intervalo_s = intervalo_s
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+
+    def acordar(self):
+        self._acordar.set()
+
+    def parar(self):
+        self._parar.set()
+        self._acordar.set()
+
+    def executar_ciclo(self) -> list[dict]:
+        return [atualizar_view(registro) for registro in views_vencidas()]
+
+    def run(self):
+        render_logger.info(f"⏰ [KPI-MV] Agendador iniciado (verificação a cada {self.intervalo_s:.0f}s)")
+        while not self._parar.is_set():
+            try:
+                with em_segundo_plano():
+                    self.executar_ciclo()
+            except Exception as e:
+                render_logger.error(f"❌ [KPI-MV] Ciclo do agendador falhou: {e}")
+            self._acordar.wait(self.intervalo_s)
+            self._acordar.clear()
+
+_agendador = None
+_agendador_lock = threading.Lock()
+
+def iniciar_agendador() -> AgendadorRefresh:
+    """Inicia (uma vez por processo) o agendador de refresh"""
+    global _agendador
+    with _agendador_lock:
+        if _agendador is None or not _agendador.is_alive():
+            _agendador = AgendadorRefresh()
+            _agendador.start()
+    return _agendador
+
+if __name__ == "__main__":
+    # worker separado: python src/kpis_materializados.py
+    agendador = AgendadorRefresh()
+    agendador.run()
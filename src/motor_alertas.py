@@ -0,0 +1,609 @@
+"""
+Avaliação de alertas em segundo plano.
+
+O AgendadorAlertas (thread do processo ou `python src/motor_alertas.py` como
+worker separado) verifica cada alerta ativo no intervalo da sua frequência
+("A cada 5 min", "Diário", "Semanal"); alertas "Manual" são avaliados uma vez
+ao serem criados e depois só sob demanda (verificar_cliente_com_lock(forcar=True)).
+O último status/valor de cada alerta fica no repositorio_alertas e a
+página de alertas apenas lê esse estado (status_alertas), então abrir a
+página não executa nenhuma consulta de alerta e os alertas disparam mesmo
+sem ninguém olhando.
+
+Os alertas tradicionais da mesma tabela são avaliados com uma única
+consulta (planejar_consultas): todos os COUNT/AVG em uma varredura e o
+último valor dos "Valor Simples" em uma subconsulta, com os valores
+distribuídos de volta para cada alerta.
+
+A avaliação é incremental: cada estado guarda a marca d'água das tabelas de
+origem do alerta (relid e contadores n_tup_ins/upd/del do
+pg_stat_user_tables). Enquanto a marca não muda, o alerta vencido só tem a
+próxima verificação reagendada, sem consultar a tabela; consultas que
+dependem do relógio (now(), CURRENT_DATE...) são sempre executadas.
+
+O histórico registra as transições: DISPARADO quando a condição passa a ser
+atendida e RESOLVIDO quando volta ao normal.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import unicodedata
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from psycopg2 import errors
+
+from pool_conexoes import obter_conexao, em_segundo_plano, POOL_MAX_SEGUNDO_PLANO
+from catalogo_schema import id_client_da_tabela
+from executor_async import mapear_em_paralelo
+from visao_geral_cliente import contadores_alteracao
+from repositorio_alertas import (
+    listar_alertas, clientes_com_alertas, registrar_historico, obter_estados, gravar_estados, aplicar_retencao,
+    obter_sql_ia, guardar_sql_ia
+)
+
+# 🔧 [LOGGING] Configuração de logging para Render
+def setup_render_logging():
+    """Configura logging para ser visível no Render"""
+    logger = logging.getLogger('soliris_motor_alertas')
+    if not logger.handlers:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setLevel(logging.INFO)
+        formatter = logging.Formatter(
+            '%(asctime)s - SOLIRIS-MOTOR-ALERTAS - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+        console_handler.setFormatter(formatter)
+        logger.addHandler(console_handler)
+        logger.setLevel(logging.INFO)
+    return logger
+
+# Inicializar logger
+render_logger = setup_render_logging()
+
+# frequência do alerta → intervalo entre verificações (min); "Manual" não é agendado
+INTERVALOS_FREQUENCIA = {
+    "A cada 5 min": 5,
+    "Diário": 24 * 60,
+    "Semanal": 7 * 24 * 60,
+}
+# De quanto em quanto tempo o agendador procura alertas vencidos (segundos)
+INTERVALO_VERIFICACAO_S = float(os.getenv("ALERTAS_VERIFICACAO_S", "30"))
+# Consultas cujo valor muda com o tempo mesmo sem alteração nas tabelas
+_DEPENDE_DO_TEMPO = re.compile(
+    r"\b(now|current_date|current_time|current_timestamp|localtime|localtimestamp|clock_timestamp)\b",
+    re.IGNORECASE,
+)
+# De quanto em quanto tempo o agendador aplica a retenção do histórico (segundos)
+INTERVALO_RETENCAO_S = 3600
+# Tempo máximo de cada consulta de alerta (o alerta pode definir 'timeout_ms')
+ALERTAS_TIMEOUT_MS = int(os.getenv("ALERTAS_TIMEOUT_MS", "10000"))
+# Consultas de alerta simultâneas: o orçamento dos agendadores menos a
+# conexão que segura o advisory lock do cliente durante o ciclo
+ALERTAS_CONCORRENCIA = int(os.getenv("ALERTAS_CONCORRENCIA", str(max(POOL_MAX_SEGUNDO_PLANO - 1, 1))))
+# Custo estimado (EXPLAIN) acima do qual o SQL de um alerta é marcado como caro
+ALERTAS_CUSTO_MAX = float(os.getenv("ALERTAS_CUSTO_MAX", "100000"))
+
+# --- execução ------------------------------------------------------------------
+
+def sql_alerta(alerta: dict, client_id: int = None) -> str:
+    """Consulta que devolve o valor atual do alerta"""
+    # Verifica se é um alerta personalizado (gerado por IA)
+    if alerta.get('tipo') == 'Personalizado IA' and 'sql_personalizado' in alerta:
+        query = alerta['sql_personalizado']
+        # fórmula de KPI materializado: lê a view pré-calculada
+        if client_id is not None:
+            from kpis_materializados import reescrever_para_view
+            query = reescrever_para_view(client_id, query) or query
+        return query
+
+    # Alertas tradicionais
+    tabela = alerta['tabela']
+    coluna = alerta['coluna']
+    tipo = alerta['tipo']
+
+    if tipo == "Valor Simples":
+        return f'SELECT "{coluna}" FROM "{tabela}" ORDER BY "id" DESC LIMIT 1'
+    elif tipo == "Agregação":
+        return f'SELECT COUNT("{coluna}") FROM "{tabela}"'
+    else:  # Outros tipos
+        return f'SELECT AVG("{coluna}") FROM "{tabela}"'
+
+def _valor_numerico(valor):
+    # Converte Decimal para float se necessário
+    if hasattr(valor, '__float__'):  # Se é um tipo numérico (incluindo Decimal)
+        return float(valor)
+    return valor
+
+def _timeout_alerta(alerta: dict) -> int:
+    return int(alerta.get('timeout_ms') or ALERTAS_TIMEOUT_MS)
+
+def _consultar_linha(sql: str, client_id: int, timeout_ms: int = None):
+    """
+    Primeira linha da consulta como dict {coluna: valor} (None se vazia), em
+    transação somente leitura com statement_timeout. Estourar o tempo
+    levanta psycopg2.errors.QueryCanceled.
+    """
+    timeout_ms = ALERTAS_TIMEOUT_MS if timeout_ms is None else timeout_ms
+    conn = obter_conexao(client_id)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SET TRANSACTION READ ONLY")
+        cursor.execute("SELECT set_config('statement_timeout', %s, true)", (str(int(timeout_ms)),))
+        cursor.execute(sql)
+        linha = cursor.fetchone()
+        colunas = [d[0] for d in cursor.description]
+    finally:
+        conn.rollback()
+        cursor.close()
+        conn.close()
+    return dict(zip(colunas, linha)) if linha else None
+
+def executar_query_alerta(alerta: dict, client_id: int = None):
+    """Executa query para obter valor atual do alerta"""
+    if client_id is None:
+        client_id = id_client_da_tabela(alerta.get('tabela') or "")
+    linha = _consultar_linha(sql_alerta(alerta, client_id), client_id, _timeout_alerta(alerta))
+    if linha:
+        return _valor_numerico(next(iter(linha.values())))
+    return 0
+
+def avaliar_condicao_alerta(valor_atual, alerta: dict) -> str:
+    """Avalia se a condição do alerta foi atendida"""
+    valor_limite = alerta['valor_limite']
+    condicao = alerta['condicao']
+
+    if condicao == "Maior que" and valor_atual > valor_limite:
+        return "DISPARADO"
+    elif condicao == "Menor que" and valor_atual < valor_limite:
+        return "DISPARADO"
+    elif condicao == "Igual a" and valor_atual == valor_limite:
+        return "DISPARADO"
+    elif condicao == "Diferente de" and valor_atual != valor_limite:
+        return "DISPARADO"
+    else:
+        return "NORMAL"
+
+# --- SQL gerado por IA ---------------------------------------------------------
+
+def validar_sql_seguro(sql: str) -> bool:
+    """Valida se o SQL é seguro para execução (apenas SELECT)"""
+    sql_upper = sql.upper().strip()
+
+    # Lista de comandos perigosos
+    comandos_proibidos = [
+        'DROP', 'DELETE', 'UPDATE', 'INSERT', 'ALTER', 'CREATE',
+        'TRUNCATE', 'GRANT', 'REVOKE', 'EXEC', 'EXECUTE'
+    ]
+
+    # Verifica se contém apenas SELECT
+    if not sql_upper.startswith('SELECT'):
+        return False
+
+    # Verifica se contém comandos perigosos
+    for comando in comandos_proibidos:
+        if comando in sql_upper:
+            return False
+
+    return True
+
+def chave_sql_ia(descricao: str) -> str:
+    """Descrição normalizada (caixa, acentos, espaços, pontuação final)"""
+    texto = unicodedata.normalize("NFKD", descricao).encode("ascii", "ignore").decode().lower()
+    texto = re.sub(r"\s+", " ", texto).strip(" .!?;")
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()
+
+def compilar_sql_alerta(client_id: int, sql: str, timeout_ms: int = None) -> dict:
+    """
+    Valida o SQL do alerta uma vez: validar_sql_seguro + EXPLAIN (sem executar).
+    Retorna {valido, custo, caro, erro}; custo é o Total Cost estimado do plano.
+    """
+    if not sql or not validar_sql_seguro(sql):
+        return {"valido": False, "custo": None, "caro": False, "erro": "SQL inválido ou inseguro (apenas SELECT)"}
+    try:
+        linha = _consultar_linha(f"EXPLAIN (FORMAT JSON) {sql}", client_id, timeout_ms)
+    except Exception as e:
+        return {"valido": False, "custo": None, "caro": False, "erro": str(e).strip().splitlines()[0]}
+    plano = next(iter(linha.values()))
+    if isinstance(plano, str):
+        plano = json.loads(plano)
+    custo = float(plano[0]["Plan"]["Total Cost"])
+    return {"valido": True, "custo": custo, "caro": custo > ALERTAS_CUSTO_MAX, "erro": None}
+
+def sql_ia_em_cache(client_id: int, descricao: str, tabelas: list[str]):
+    """
+    SQL já gerado e validado para a mesma descrição (ou None). Só vale se as
+    tabelas que o SQL usa ainda estão entre as tabelas do cliente; tabelas
+    novas que ele não usa não invalidam o cache. SQL sem tabela reconhecida
+    não tem como ser conferido e nunca vem do cache.
+    """
+    registro = obter_sql_ia(client_id, chave_sql_ia(descricao))
+    if registro is None or not registro["tabelas"] or not set(registro["tabelas"]) <= set(tabelas):
+        return None
+    return {**registro, "caro": (registro["custo"] or 0) > ALERTAS_CUSTO_MAX}
+
+def guardar_sql_ia_validado(client_id: int, descricao: str, tabelas: list[str], sql: str) -> dict:
+    """
+    Compila o SQL gerado e, se válido, guarda no cache com o custo do plano
+    e as tabelas que ele referencia (sem tabela reconhecida, não guarda)
+    """
+    from motor_kpis import tabelas_referenciadas
+
+    compilado = compilar_sql_alerta(client_id, sql)
+    usadas = sorted(set(tabelas_referenciadas(sql, tabelas)))
+    if compilado["valido"] and usadas:
+        guardar_sql_ia(client_id, chave_sql_ia(descricao), descricao, usadas, sql, compilado["custo"])
+    if compilado["caro"]:
+        render_logger.warning(
+            f"⚠️ [ALERTAS] SQL de alerta caro para o cliente {client_id:02d} "
+            f"(custo {compilado['custo']:.0f} > {ALERTAS_CUSTO_MAX:.0f})"
+        )
+    return compilado
+
+# --- fusão por tabela ----------------------------------------------------------
+
+def _parte_alerta(alerta: dict) -> tuple[str, str]:
+    """('ultima', coluna) para Valor Simples, ('agregado', expressão) para os demais"""
+    coluna = alerta['coluna']
+    if alerta['tipo'] == "Valor Simples":
+        return "ultima", f'"{coluna}"'
+    if alerta['tipo'] == "Agregação":
+        return "agregado", f'COUNT("{coluna}")'
+    return "agregado", f'AVG("{coluna}")'
+
+def planejar_consultas(alertas: list, client_id: int = None) -> list[dict]:
+    """
+    Agrupa os alertas tradicionais por tabela em uma única consulta
+    (todos os agregados em uma varredura; a última linha, para Valor Simples,
+    em uma subconsulta ORDER BY "id" DESC LIMIT 1 da mesma consulta).
+    Alertas personalizados (IA) ficam em consultas próprias.
+    Cada consulta: {sql, alertas: [(alerta, coluna_resultado)], tabela, timeout_ms}
+    (a consulta combinada usa o maior timeout entre os seus alertas).
+    """
+    consultas, por_tabela = [], {}
+    for alerta in alertas:
+        if alerta.get('tipo') == 'Personalizado IA' and 'sql_personalizado' in alerta:
+            consultas.append({"sql": sql_alerta(alerta, client_id), "alertas": [(alerta, None)],
+                              "tabela": None, "timeout_ms": _timeout_alerta(alerta)})
+        else:
+            por_tabela.setdefault(alerta['tabela'], []).append(alerta)
+
+    for tabela, grupo in por_tabela.items():
+        timeout_ms = max(_timeout_alerta(alerta) for alerta in grupo)
+        if len(grupo) == 1:
+            consultas.append({"sql": sql_alerta(grupo[0], client_id), "alertas": [(grupo[0], None)],
+                              "tabela": tabela, "timeout_ms": timeout_ms})
+            continue
+
+        agregados, ultimas, mapa = {}, {}, []
+        for alerta in grupo:
+            parte, expressao = _parte_alerta(alerta)
+            destino = agregados if parte == "agregado" else ultimas
+            prefixo = "_a" if parte == "agregado" else "_u"
+            apelido = destino.setdefault(expressao, f"{prefixo}{len(destino)}")
+            mapa.append((alerta, apelido))
+
+        if not agregados:
+            campos = ", ".join(f'{e} AS "{a}"' for e, a in ultimas.items())
+            sql = f'SELECT {campos} FROM "{tabela}" ORDER BY "id" DESC LIMIT 1'
+        else:
+            campos = [f'{e} AS "{a}"' for e, a in agregados.items()]
+            sql = f'SELECT {", ".join(campos)} FROM "{tabela}"'
+            if ultimas:
+                campos += [f'(SELECT {e} FROM ultima) AS "{a}"' for e, a in ultimas.items()]
+                # tabela vazia: Valor Simples vale 0, como na consulta individual
+                campos.append('EXISTS (SELECT 1 FROM ultima) AS "_tem_ultima"')
+                sql = (f'WITH ultima AS (SELECT {", ".join(ultimas)} FROM "{tabela}" ORDER BY "id" DESC LIMIT 1) '
+                       f'SELECT {", ".join(campos)} FROM "{tabela}"')
+        consultas.append({"sql": sql, "alertas": mapa, "tabela": tabela, "timeout_ms": timeout_ms})
+    return consultas
+
+def _distribuir(consulta: dict, linha) -> list:
+    """Valor de cada alerta da consulta a partir da linha de resultado"""
+    valores = []
+    for _, apelido in consulta["alertas"]:
+        if not linha:
+            valores.append(0)
+        elif apelido is None:
+            valores.append(_valor_numerico(next(iter(linha.values()))))
+        elif apelido.startswith("_u") and linha.get("_tem_ultima") is False:
+            valores.append(0)
+        else:
+            valores.append(_valor_numerico(linha[apelido]))
+    return valores
+
+def avaliar_alertas(client_id: int, alertas: list) -> list[dict]:
+    """
+    Executa os alertas (uma consulta por tabela) em paralelo, com até
+    ALERTAS_CONCORRENCIA consultas simultâneas e statement_timeout por
+    consulta, e devolve um estado por alerta:
+    {id_alerta, status, valor_atual, erro, ultima_verificacao, segundos}
+    status: DISPARADO | NORMAL | ERRO | TIMEOUT. Se a consulta combinada
+    falhar (exceto por tempo), os alertas dela são repetidos
+    individualmente para isolar o que tem erro.
+    """
+    agora = datetime.now()
+    inicio_total = time.perf_counter()
+    consultas = planejar_consultas(alertas, client_id)
+
+    def _executar(consulta):
+        inicio = time.perf_counter()
+        try:
+            linha = _consultar_linha(consulta["sql"], client_id, consulta["timeout_ms"])
+            return _distribuir(consulta, linha), None, time.perf_counter() - inicio
+        except Exception as e:
+            return None, e, time.perf_counter() - inicio
+
+    def _individual(alerta):
+        inicio = time.perf_counter()
+        try:
+            return executar_query_alerta(alerta, client_id), None, time.perf_counter() - inicio
+        except Exception as e:
+            return None, e, time.perf_counter() - inicio
+
+    # id_alerta → (valor, erro, segundos, timeout_ms)
+    resultados, repetir = {}, []
+    execucoes = mapear_em_paralelo(_executar, consultas, ALERTAS_CONCORRENCIA)
+    for consulta, (valores, erro, segundos) in zip(consultas, execucoes):
+        if erro is not None and len(consulta["alertas"]) > 1 and not isinstance(erro, errors.QueryCanceled):
+            render_logger.warning(f"⚠️ [ALERTAS] Consulta combinada de {consulta['tabela']} falhou ({erro}), repetindo por alerta")
+            repetir.extend(alerta for alerta, _ in consulta["alertas"])
+            continue
+        for i, (alerta, _) in enumerate(consulta["alertas"]):
+            resultados[alerta['id']] = (valores[i] if valores else None, erro, segundos, consulta["timeout_ms"])
+    for alerta, (valor, erro, segundos) in zip(repetir, mapear_em_paralelo(_individual, repetir, ALERTAS_CONCORRENCIA)):
+        resultados[alerta['id']] = (valor, erro, segundos, _timeout_alerta(alerta))
+
+    estados = []
+    for alerta in alertas:
+        valor, erro, segundos, timeout_ms = resultados[alerta['id']]
+        if isinstance(erro, errors.QueryCanceled):
+            status, erro = 'TIMEOUT', f"Excedeu {timeout_ms} ms"
+        elif erro is not None:
+            status = 'ERRO'
+        else:
+            try:
+                status = avaliar_condicao_alerta(valor, alerta)
+            except Exception as e:
+                status, erro = 'ERRO', e
+        estados.append({
+            'id_alerta': alerta['id'],
+            'status': status,
+            'valor_atual': valor if isinstance(valor, (int, float)) else None,
+            'erro': str(erro).strip() if erro is not None else None,
+            'ultima_verificacao': agora,
+            'segundos': round(segundos, 3),
+        })
+
+    mais_lento = max(estados, key=lambda e: e['segundos'], default=None)
+    render_logger.info(
+        f"🔎 [ALERTAS] Cliente {client_id:02d}: {len(alertas)} alertas em {len(consultas)} consultas, "
+        f"{time.perf_counter() - inicio_total:.2f}s"
+        + (f" (mais lento: alerta {mais_lento['id_alerta']}, {mais_lento['segundos']:.2f}s)" if mais_lento else "")
+    )
+    return estados
+
+# --- estado --------------------------------------------------------------------
+
+def proxima_verificacao(alerta: dict, referencia: datetime):
+    intervalo = INTERVALOS_FREQUENCIA.get(alerta.get('frequencia', 'Manual'))
+    return referencia + timedelta(minutes=intervalo) if intervalo else None
+
+def alertas_vencidos(alertas: list, estados: dict, agora: datetime = None) -> list:
+    """Alertas ativos nunca avaliados ou com a próxima verificação vencida"""
+    agora = agora or datetime.now()
+    vencidos = []
+    for alerta in alertas:
+        if not alerta.get('ativo', True):
+            continue
+        estado = estados.get(alerta['id'])
+        if estado is None or (estado['proxima_verificacao'] and estado['proxima_verificacao'] <= agora):
+            vencidos.append(alerta)
+    return vencidos
+
+# --- marca d'água ---------------------------------------------------------------
+
+def tabelas_do_alerta(alerta: dict, tabelas_cliente: list[str]):
+    """Tabelas de origem do alerta, ou None se o valor não depende só delas"""
+    if alerta.get('tipo') == 'Personalizado IA' and 'sql_personalizado' in alerta:
+        from motor_kpis import tabelas_referenciadas
+        sql = alerta['sql_personalizado']
+        if _DEPENDE_DO_TEMPO.search(sql):
+            return None
+        return tabelas_referenciadas(sql, tabelas_cliente) or None
+    return [alerta['tabela']]
+
+def marca_alerta(alerta: dict, contadores: dict, client_id: int = None):
+    """
+    Marca d'água (texto) das tabelas do alerta; None = sempre avaliar.
+    Fórmulas reescritas para uma view materializada incluem o ultimo_refresh
+    da view: depois de uma importação o valor só muda quando a view é
+    atualizada, não quando as tabelas mudam.
+    """
+    tabelas = tabelas_do_alerta(alerta, list(contadores))
+    if not tabelas:
+        return None
+    marca = sorted([t, list(contadores[t]) if t in contadores else None] for t in tabelas)
+    if client_id is not None and alerta.get('tipo') == 'Personalizado IA':
+        from kpis_materializados import versao_view
+        versao = versao_view(client_id, alerta['sql_personalizado'])
+        if versao is not None:
+            marca.append(["_view", str(versao)])
+    return json.dumps(marca)
+
+def verificar_cliente(client_id: int, forcar: bool = False) -> list[dict]:
+    """
+    Avalia os alertas vencidos do cliente (ou todos os ativos, com forcar=True),
+    grava o estado e registra as transições no histórico. Alertas vencidos
+    cujas tabelas não mudaram desde a última avaliação só são reagendados.
+    """
+    alertas = listar_alertas(client_id)
+    estados_anteriores = obter_estados(client_id)
+    if forcar:
+        pendentes = [a for a in alertas if a.get('ativo', True)]
+    else:
+        pendentes = alertas_vencidos(alertas, estados_anteriores)
+    if not pendentes:
+        return []
+
+    try:
+        contadores = contadores_alteracao(client_id)
+        marcas = {a['id']: marca_alerta(a, contadores, client_id) for a in pendentes}
+    except Exception as e:
+        render_logger.warning(f"⚠️ [ALERTAS] Marca d'água do cliente {client_id:02d} indisponível: {e}")
+        marcas = {}
+
+    agora = datetime.now()
+    reagendados = []
+    if not forcar:
+        avaliar = []
+        for alerta in pendentes:
+            anterior = estados_anteriores.get(alerta['id'])
+            marca = marcas.get(alerta['id'])
+            if (anterior and marca is not None and anterior.get('marca') == marca
+                    and anterior['status'] in ('DISPARADO', 'NORMAL')):
+                reagendados.append({**anterior, 'proxima_verificacao': proxima_verificacao(alerta, agora)})
+            else:
+                avaliar.append(alerta)
+        pendentes = avaliar
+
+    estados = avaliar_alertas(client_id, pendentes) if pendentes else []
+    for alerta, estado in zip(pendentes, estados):
+        estado['proxima_verificacao'] = proxima_verificacao(alerta, estado['ultima_verificacao'])
+        estado['marca'] = marcas.get(alerta['id'])
+        anterior = (estados_anteriores.get(alerta['id']) or {}).get('status')
+        try:
+            if estado['status'] == 'DISPARADO' and anterior != 'DISPARADO':
+                registrar_historico(client_id, alerta, 'DISPARADO', estado['valor_atual'])
+            elif estado['status'] == 'NORMAL' and anterior == 'DISPARADO':
+                registrar_historico(client_id, alerta, 'RESOLVIDO', estado['valor_atual'])
+        except Exception as e:
+            render_logger.warning(f"⚠️ [ALERTAS] Histórico do alerta {alerta['id']} não gravado: {e}")
+    gravar_estados(client_id, estados + reagendados)
+
+    disparados = sum(1 for e in estados if e['status'] == 'DISPARADO')
+    render_logger.info(
+        f"🔔 [ALERTAS] Cliente {client_id:02d}: {len(estados)} alertas avaliados, {disparados} disparados, "
+        f"{len(reagendados)} sem alteração nas tabelas"
+    )
+    return estados
+
+def verificar_cliente_com_lock(client_id: int, forcar: bool = False):
+    """
+    verificar_cliente sob o advisory lock do cliente, compartilhado pelo
+    agendador (de qualquer processo) e pelo botão "Atualizar Status".
+    Retorna None se outra verificação do mesmo cliente estiver em andamento.
+    """
+    conn = obter_conexao()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT pg_try_advisory_lock(hashtext('alertas'), %s)", (client_id,))
+        if not cursor.fetchone()[0]:
+            return None
+        try:
+            return verificar_cliente(client_id, forcar)
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(hashtext('alertas'), %s)", (client_id,))
+    finally:
+        conn.rollback()
+        cursor.close()
+        conn.close()
+
+def status_alertas(client_id: int) -> list[dict]:
+    """
+    Alertas ativos do cliente com o último estado gravado (sem consultar as
+    tabelas). Alertas ainda não avaliados vêm com status PENDENTE.
+    """
+    estados = obter_estados(client_id)
+    resultado = []
+    for alerta in listar_alertas(client_id):
+        if not alerta.get('ativo', True):
+            continue
+        estado = estados.get(alerta['id'])
+        if estado is None:
+            resultado.append({**alerta, 'status': 'PENDENTE', 'valor_atual': None, 'ultima_verificacao': None})
+            continue
+        resultado.append({
+            **alerta,
+            'status': estado['status'],
+            'valor_atual': estado['valor_atual'],
+            'erro': estado['erro'],
+            'ultima_verificacao': estado['ultima_verificacao'].strftime("%Y-%m-%d %H:%M:%S"),
+            'proxima_verificacao': estado['proxima_verificacao'],
+            'segundos': estado['segundos'],
+        })
+    return resultado
+
+# --- agendador -----------------------------------------------------------------
+
+class AgendadorAlertas(threading.Thread):
+    """Thread que avalia os alertas vencidos de todos os clientes"""
+
+    def __init__(self, intervalo_s: float = INTERVALO_VERIFICACAO_S):
+        super().__init__(daemon=True, name="alertas")
+        self.intervalo_s = intervalo_s
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._ultima_retencao = 0.0
+
+    def acordar(self):
+        self._acordar.set()
+
+    def parar(self):
+        self._parar.set()
+        self._acordar.set()
+
+    def executar_ciclo(self) -> dict:
+        resultados = {}
+        if time.monotonic() - self._ultima_retencao >= INTERVALO_RETENCAO_S:
+            self._ultima_retencao = time.monotonic()
+            try:
+                aplicar_retencao()
+            except Exception as e:
+                render_logger.error(f"❌ [ALERTAS] Retenção do histórico falhou: {e}")
+        for client_id in clientes_com_alertas():
+            try:
+                estados = verificar_cliente_com_lock(client_id)
+            except Exception as e:
+                render_logger.error(f"❌ [ALERTAS] Cliente {client_id:02d}: {e}")
+                continue
+            if estados is not None:
+                resultados[client_id] = estados
+        return resultados
+
+    def run(self):
+        render_logger.info(f"⏰ [ALERTAS] Agendador iniciado (verificação a cada {self.intervalo_s:.0f}s)")
+        while not self._parar.is_set():
+            try:
+                with em_segundo_plano():
+                    self.executar_ciclo()
+            except Exception as e:
+                render_logger.error(f"❌ [ALERTAS] Ciclo do agendador falhou: {e}")
+            self._acordar.wait(self.intervalo_s)
+            self._acordar.clear()
+
+_agendador = None
+_agendador_lock = threading.Lock()
+
+def iniciar_agendador() -> AgendadorAlertas:
+    """Inicia (uma vez por processo) o agendador de alertas"""
+    global _agendador
+    with _agendador_lock:
+        if _agendador is None or not _agendador.is_alive():
+            _agendador = AgendadorAlertas()
+            _agendador.start()
+    return _agendador
+
+def notificar_alteracao():
+    """Alerta criado/alterado: antecipa o próximo ciclo do agendador"""
+    if _agendador is not None and _agendador.is_alive():
+        _agendador.acordar()
+
+if __name__ == "__main__":
+    # worker separado: python src/motor_alertas.py
+    AgendadorAlertas().run()
@@ -0,0 +1,448 @@
+"""
+Cálculo em lote dos KPIs de um cliente (cliXX_kpis_definicoes.formula_sql).
+
+Todas as fórmulas são avaliadas em uma passada:
+- fórmulas idênticas (após normalizar espaços e ';') rodam uma única vez;
+- fórmulas de agregação simples sobre a mesma base (mesmo FROM/WHERE, sem
+  GROUP BY) são fundidas em um único SELECT, ou seja, uma varredura só;
+- as consultas restantes rodam em paralelo no pool de conexões, cada uma
+  em transação somente leitura com statement_timeout próprio. Um KPI pode
+  trazer "timeout_ms" na definição; a consulta fundida usa o maior timeout
+  do grupo, e se ela falhar ou estourar o tempo cada KPI é reavaliado
+  sozinho, com o próprio timeout.
+
+Cada consulta fica em cache junto com a marca d'água das tabelas que ela
+lê (pg_stat_user_tables, ver visao_geral_cliente.contadores_alteracao):
+enquanto essas tabelas não mudam, o valor é servido sem tocar no banco.
+
+Formato do resultado de calcular_kpis():
+    {"id_client", "calculado_em", "segundos", "consultas_executadas",
+     "consultas_em_cache", "kpis": [
+        {"nome", "descricao", "status" ("OK" | "ERRO" | "TIMEOUT"),
+         "tipo" ("escalar" | "tabela" | "vazio"), "valor", "colunas",
+         "linhas", "segundos", "em_cache", "consulta" (id da consulta
+         compartilhada), "erro"}, ...]}
+"""
+
+import os
+import re
+import sys
+import time
+import logging
+import threading
+from datetime import datetime
+from decimal import Decimal
+
+from psycopg2 import errors
+
+from pool_conexoes import obter_conexao, POOL_MAX
+from catalogo_schema import obter_tabelas
+from visao_geral_cliente import contadores_alteracao
+from executor_async import em_thread, em_paralelo, rodar
+
+# 🔧 [LOGGING] Configuração de logging para Render
+def setup_render_logging():
+    """Configura logging para ser visível no Render"""
+    logger = logging.getLogger('soliris_motor_kpis')
+    if not logger.handlers:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setLevel(logging.INFO)
+        formatter = logging.Formatter(
+            '%(asctime)s - SOLIRIS-MOTOR-KPIS - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+        console_handler.setFormatter(formatter)
+        logger.addHandler(console_handler)
+        logger.setLevel(logging.INFO)
+    return logger
+
+# Inicializar logger
+render_logger = setup_render_logging()
+
+# Tempo máximo de cada consulta de KPI (milissegundos)
+KPI_TIMEOUT_MS = int(os.getenv("KPI_TIMEOUT_MS", "15000"))
+# Consultas de KPI simultâneas (deixa conexões livres para o resto do app)
+KPI_CONCORRENCIA = int(os.getenv("KPI_CONCORRENCIA", str(max(POOL_MAX // 2, 1))))
+# Linhas guardadas de KPIs que retornam tabela
+KPI_MAX_LINHAS = 1000
+
+_AGREGACAO = re.compile(r"^(COUNT|SUM|AVG|MIN|MAX)\s*\(", re.IGNORECASE)
+_ALIAS = re.compile(r'\s+AS\s+("?)(\w+)\1\s*$', re.IGNORECASE)
+_CLAUSULAS_BLOQUEADAS = re.compile(
+    r"\b(SELECT|GROUP\s+BY|HAVING|ORDER\s+BY|LIMIT|OFFSET|FETCH|UNION|INTERSECT|EXCEPT|WINDOW|OVER)\b",
+    re.IGNORECASE
+)
+
+# {id_client: {sql: {"marca": ..., "resultado": {...}}}}
+_cache: dict[int, dict[str, dict]] = {}
+_cache_lock = threading.Lock()
+
+# --- normalização e fusão --------------------------------------------------
+
+def _remover_comentarios(sql: str) -> str:
+    """Troca comentários -- e /* */ (fora de literais e identificadores) por espaço"""
+    partes, i, aspas = [], 0, None
+    while i < len(sql):
+        c = sql[i]
+        if aspas:
+            if c == aspas:
+                aspas = None
+        elif c in ("'", '"'):
+            aspas = c
+        elif sql.startswith("--", i):
+            fim = sql.find("\n", i)
+            i = len(sql) if fim < 0 else fim
+            partes.append(" ")
+            continue
+        elif sql.startswith("/*", i):
+            fim = sql.find("*/", i + 2)
+            i = len(sql) if fim < 0 else fim + 2
+            partes.append(" ")
+            continue
+        partes.append(c)
+        i += 1
+    return "".join(partes)
+
+def normalizar_sql(sql: str) -> str:
+    """Remove comentários e ';' final e colapsa espaços fora de literais"""
+    partes, em_literal, espaco = [], False, False
+    for c in _remover_comentarios(sql or "").strip().rstrip(";").strip():
+        if c == "'":
+            em_literal = not em_literal
+        if not em_literal and c.isspace():
+            espaco = True
+            continue
+        if espaco and partes:
+            partes.append(" ")
+        espaco = False
+        partes.append(c)
+    return "".join(partes)
+
+def _dividir_campos(lista: str) -> list[str]:
+    """Divide a lista do SELECT nas vírgulas de nível zero"""
+    campos, atual, nivel, em_literal = [], [], 0, False
+    for c in lista:
+        if c == "'":
+            em_literal = not em_literal
+        elif not em_literal and c == "(":
+            nivel += 1
+        elif not em_literal and c == ")":
+            nivel -= 1
+        elif not em_literal and nivel == 0 and c == ",":
+            campos.append("".join(atual).strip())
+            atual = []
+            continue
+        atual.append(c)
+    campos.append("".join(atual).strip())
+    return campos
+
+def _separar_from(sql: str):
+    """
+    Divide 'SELECT <lista> FROM <base>' no FROM de nível zero, ignorando os
+    que ficam dentro de parênteses (EXTRACT(... FROM ...), SUBSTRING, TRIM)
+    ou de literais. Retorna (lista, base) ou None.
+    """
+    inicio = re.match(r"^SELECT\s+", sql, re.IGNORECASE)
+    if not inicio:
+        return None
+    nivel, em_literal = 0, False
+    for i in range(inicio.end(), len(sql)):
+        c = sql[i]
+        if c == "'":
+            em_literal = not em_literal
+        elif em_literal:
+            continue
+        elif c == "(":
+            nivel += 1
+        elif c == ")":
+            nivel -= 1
+        elif nivel == 0 and c.isspace():
+            achou = re.match(r"\s+FROM\s+", sql[i:], re.IGNORECASE)
+            if achou:
+                return sql[inicio.end():i].strip(), sql[i + achou.end():].strip()
+    return None
+
+def decompor_agregacao(sql: str):
+    """
+    Para SELECT <agregações> FROM <base> (uma linha de resultado, sem
+    subconsultas/GROUP BY), retorna (base, [(expressao, nome_coluna), ...]).
+    Outras consultas retornam None e rodam sozinhas.
+    """
+    partes = _separar_from(sql)
+    if not partes or not partes[0] or not partes[1]:
+        return None
+    lista, base = partes
+    if _CLAUSULAS_BLOQUEADAS.search(base) or _CLAUSULAS_BLOQUEADAS.search(lista):
+        return None
+    if re.match(r"^(DISTINCT|ALL)\b", lista, re.IGNORECASE):
+        return None
+
+    campos = []
+    for campo in _dividir_campos(lista):
+        alias = _ALIAS.search(campo)
+        expressao = campo[:alias.start()] if alias else campo
+        # alias sem AS (ex: SUM(x) total) não é suportado na fusão
+        if not _AGREGACAO.match(expressao) or re.search(r"\)\s+\w+\s*$", expressao):
+            return None
+        nome = alias.group(2) if alias else _AGREGACAO.match(expressao).group(1).lower()
+        campos.append((expressao, nome))
+    return base, campos
+
+def _timeout_kpi(kpi: dict, timeout_ms: int = None) -> int:
+    padrao = KPI_TIMEOUT_MS if timeout_ms is None else timeout_ms
+    return int(kpi.get("timeout_ms") or padrao)
+
+def planejar_consultas(kpis: list[dict], timeout_ms: int = None) -> list[dict]:
+    """
+    Agrupa as fórmulas em consultas a executar:
+    [{"id", "sql", "timeout_ms", "kpis": [(nome_kpi, [(indice_coluna, nome_coluna)] | None)]}]
+    None = o KPI usa o resultado inteiro da consulta. timeout_ms é o maior
+    entre os KPIs da consulta (timeout_ms do argumento é o padrão de quem não
+    tem o próprio).
+    """
+    consultas: list[dict] = []
+    por_sql: dict[str, dict] = {}
+    por_base: dict[str, dict] = {}
+
+    for kpi in kpis:
+        sql = normalizar_sql(kpi["formula_sql"])
+        if not sql:
+            continue
+        limite = _timeout_kpi(kpi, timeout_ms)
+        if sql in por_sql:
+            por_sql[sql]["kpis"].append((kpi["nome"], por_sql[sql]["mapa"].get(sql)))
+            por_sql[sql]["timeout_ms"] = max(por_sql[sql]["timeout_ms"], limite)
+            continue
+
+        decomposta = decompor_agregacao(sql)
+        if decomposta:
+            base, campos = decomposta
+            grupo = por_base.get(base)
+            if grupo is None:
+                grupo = {"base": base, "expressoes": [], "kpis": [], "mapa": {}, "timeout_ms": limite}
+                por_base[base] = grupo
+                consultas.append(grupo)
+            indices = []
+            for expressao, nome_coluna in campos:
+                if expressao not in grupo["expressoes"]:
+                    grupo["expressoes"].append(expressao)
+                indices.append((grupo["expressoes"].index(expressao), nome_coluna))
+            grupo["mapa"][sql] = indices
+            grupo["kpis"].append((kpi["nome"], indices))
+            grupo["timeout_ms"] = max(grupo["timeout_ms"], limite)
+            por_sql[sql] = grupo
+        else:
+            consulta = {"sql": sql, "kpis": [(kpi["nome"], None)], "mapa": {}, "timeout_ms": limite}
+            por_sql[sql] = consulta
+            consultas.append(consulta)
+
+    for i, consulta in enumerate(consultas):
+        consulta["id"] = i
+        if "base" in consulta:
+            colunas = ", ".join(f'{e} AS "_k{j}"' for j, e in enumerate(consulta["expressoes"]))
+            consulta["sql"] = f"SELECT {colunas} FROM {consulta['base']}"
+    return consultas
+
+# --- execução --------------------------------------------------------------
+
+def _converter(valor):
+    if isinstance(valor, Decimal):
+        return float(valor)
+    return valor
+
+def executar_consulta(sql: str, id_client: int, timeout_ms: int = None) -> dict:
+    """
+    Executa uma consulta de KPI em transação somente leitura com
+    statement_timeout. Retorna {status, colunas, linhas, segundos, erro}.
+    """
+    timeout_ms = KPI_TIMEOUT_MS if timeout_ms is None else timeout_ms
+    inicio = time.perf_counter()
+    conn = obter_conexao(id_client)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SET TRANSACTION READ ONLY")
+        cursor.execute("SELECT set_config('statement_timeout', %s, true)", (str(int(timeout_ms)),))
+        cursor.execute(sql)
+        colunas = [d[0] for d in cursor.description] if cursor.description else []
+        linhas = [tuple(_converter(v) for v in linha) for linha in cursor.fetchmany(KPI_MAX_LINHAS)] if colunas else []
+        status, erro = "OK", None
+    except errors.QueryCanceled:
+        colunas, linhas, status, erro = [], [], "TIMEOUT", f"Excedeu {timeout_ms} ms"
+    except Exception as e:
+        colunas, linhas, status, erro = [], [], "ERRO", str(e).strip()
+    finally:
+        conn.rollback()
+        cursor.close()
+        conn.close()
+    return {
+        "status": status, "colunas": colunas, "linhas": linhas,
+        "segundos": round(time.perf_counter() - inicio, 4), "erro": erro,
+    }
+
+def _resultado_kpi(kpi: dict, consulta: dict, execucao: dict, indices, em_cache: bool) -> dict:
+    colunas, linhas = execucao["colunas"], execucao["linhas"]
+    if indices is not None and execucao["status"] == "OK":
+        colunas = [nome for _, nome in indices]
+        linhas = [tuple(linha[i] for i, _ in indices) for linha in linhas]
+
+    if execucao["status"] != "OK" or not linhas:
+        tipo, valor = "vazio", None
+    elif len(linhas) == 1 and len(colunas) == 1:
+        tipo, valor = "escalar", linhas[0][0]
+    else:
+        tipo, valor = "tabela", None
+
+    return {
+        "nome": kpi["nome"],
+        "descricao": kpi.get("descricao"),
+        "status": execucao["status"],
+        "tipo": tipo,
+        "valor": valor,
+        "colunas": colunas,
+        "linhas": linhas,
+        "segundos": execucao["segundos"],
+        "em_cache": em_cache,
+        "consulta": consulta["id"],
+        "erro": execucao["erro"],
+    }
+
+def tabelas_referenciadas(sql: str, tabelas: list[str]) -> list[str]:
+    """Tabelas da lista que aparecem na consulta"""
+    texto = sql.lower()
+    return [t for t in tabelas if re.search(rf'(?<![\w"]){re.escape(t.lower())}(?![\w"])|"{re.escape(t.lower())}"', texto)]
+
+def _marca(sql: str, tabelas: list[str], contadores: dict) -> tuple:
+    # sem tabela reconhecida na fórmula: depende de todas as tabelas do cliente
+    usadas = tabelas_referenciadas(sql, tabelas) or tabelas
+    return tuple(sorted((t, contadores.get(t)) for t in usadas))
+
+def carregar_kpis(id_client: int) -> list[dict]:
+    """Definições do cliente; KPIs materializados leem a própria view"""
+    from kpis_Setup import fetch_kpis
+    from kpis_materializados import views_ativas, view_vigente, sql_leitura
+
+    views = views_ativas(id_client)
+    kpis = []
+    for nome, descricao, formula in fetch_kpis(id_client):
+        if not formula:
+            continue
+        # view de uma fórmula antiga (KPI reimportado) não é usada até ser recriada
+        view = view_vigente(views, nome, formula)
+        kpis.append({
+            "nome": nome, "descricao": descricao,
+            "formula_sql": sql_leitura(view) if view else formula,
+            "materializado": view is not None,
+            # a view muda no refresh, não quando as tabelas mudam
+            "versao": view["ultimo_refresh"] if view else None,
+        })
+    return kpis
+
+async def calcular_kpis_async(id_client: int, kpis: list[dict] = None, usar_cache: bool = True,
+                              timeout_ms: int = None) -> dict:
+    """Versão corrotina de calcular_kpis"""
+    inicio = time.perf_counter()
+    if kpis is None:
+        kpis = await em_thread(carregar_kpis, id_client)
+    consultas = planejar_consultas(kpis, timeout_ms)
+
+    tabelas, contadores = await em_paralelo(
+        [em_thread(obter_tabelas, id_client), em_thread(contadores_alteracao, id_client)],
+        retornar_excecoes=False
+    )
+    versoes = {normalizar_sql(k["formula_sql"]): k.get("versao") for k in kpis}
+    marcas = {c["id"]: (_marca(c["sql"], tabelas, contadores), versoes.get(c["sql"])) for c in consultas}
+
+    with _cache_lock:
+        cache_cliente = dict(_cache.get(id_client, {}))
+    execucoes, pendentes = {}, []
+    for consulta in consultas:
+        entrada = cache_cliente.get(consulta["sql"]) if usar_cache else None
+        if entrada and entrada["marca"] == marcas[consulta["id"]]:
+            execucoes[consulta["id"]] = (entrada["resultado"], True)
+        else:
+            pendentes.append(consulta)
+
+    resultados = await em_paralelo(
+        {c["id"]: em_thread(executar_consulta, c["sql"], id_client, c["timeout_ms"]) for c in pendentes},
+        limite=KPI_CONCORRENCIA
+    )
+
+    por_nome = {k["nome"]: k for k in kpis}
+    novas = {}
+    for consulta in pendentes:
+        execucao = resultados[consulta["id"]]
+        if isinstance(execucao, Exception):
+            execucao = {"status": "ERRO", "colunas": [], "linhas": [], "segundos": 0.0, "erro": str(execucao)}
+        # consulta fundida com erro ou timeout: reavalia cada KPI com a fórmula
+        # original, sem reescrita e com o próprio timeout, para isolar a fórmula
+        # ruim ou lenta (ou um erro da própria fusão). Sozinho, um KPI que
+        # estourou o tempo estouraria de novo.
+        falhou = execucao["status"] == "ERRO" or (execucao["status"] == "TIMEOUT" and len(consulta["kpis"]) > 1)
+        if falhou and "base" in consulta:
+            render_logger.warning(
+                f"⚠️ [KPIS] Consulta fundida {consulta['id']} terminou com {execucao['status']}, reavaliando separadamente"
+            )
+            separadas = {
+                nome: {"id": consulta["id"], "sql": normalizar_sql(por_nome[nome]["formula_sql"]), "kpis": [(nome, None)],
+                       "timeout_ms": _timeout_kpi(por_nome[nome], timeout_ms)}
+                for nome, _ in consulta["kpis"]
+            }
+            individuais = await em_paralelo(
+                {nome: em_thread(executar_consulta, c["sql"], id_client, c["timeout_ms"]) for nome, c in separadas.items()},
+                limite=KPI_CONCORRENCIA, retornar_excecoes=False
+            )
+            consulta["individuais"] = {nome: (separadas[nome], individuais[nome]) for nome in separadas}
+        elif execucao["status"] == "OK":
+            novas[consulta["sql"]] = {"marca": marcas[consulta["id"]], "resultado": execucao}
+        execucoes[consulta["id"]] = (execucao, False)
+
+    if novas:
+        with _cache_lock:
+            _cache.setdefault(id_client, {}).update(novas)
+
+    saida = []
+    for consulta in consultas:
+        execucao, em_cache = execucoes[consulta["id"]]
+        for nome, indices in consulta["kpis"]:
+            individual = consulta.get("individuais", {}).get(nome)
+            if individual:
+                sozinha, execucao_kpi = individual
+                _, indices_kpi = sozinha["kpis"][0]
+                item = _resultado_kpi(por_nome[nome], sozinha, execucao_kpi, indices_kpi, False)
+                item["consulta"] = consulta["id"]
+            else:
+                item = _resultado_kpi(por_nome[nome], consulta, execucao, indices, em_cache)
+            saida.append(item)
+
+    ordem = {k["nome"]: i for i, k in enumerate(kpis)}
+    saida.sort(key=lambda item: ordem[item["nome"]])
+    resultado = {
+        "id_client": id_client,
+        "calculado_em": datetime.now(),
+        "segundos": round(time.perf_counter() - inicio, 4),
+        "consultas_executadas": len(pendentes),
+        "consultas_em_cache": len(consultas) - len(pendentes),
+        "kpis": saida,
+    }
+    render_logger.info(
+        f"📊 [KPIS] Cliente {id_client:02d}: {len(saida)} KPIs em {len(consultas)} consultas "
+        f"({len(pendentes)} executadas, {resultado['consultas_em_cache']} do cache) em {resultado['segundos']:.2f}s"
+    )
+    return resultado
+
+def calcular_kpis(id_client: int, kpis: list[dict] = None, usar_cache: bool = True,
+                  timeout_ms: int = None) -> dict:
+    """
+    Calcula todos os KPIs do cliente (ou a lista `kpis`, com chaves nome,
+    descricao, formula_sql e, opcional, timeout_ms) em uma passada. timeout_ms
+    é o padrão dos KPIs sem timeout próprio. Ver o formato no topo do módulo.
+    """
+    return rodar(calcular_kpis_async(id_client, kpis, usar_cache, timeout_ms))
+
+def invalidar_cache_kpis(id_client: int = None):
+    """Descarta os resultados em cache de um cliente (ou de todos)"""
+    with _cache_lock:
+        if id_client is None:
+            _cache.clear()
+        else:
+            _cache.pop(int(id_client), None)
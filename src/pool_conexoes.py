@@ -0,0 +1,376 @@
+"""
+Pool de conexões PostgreSQL compartilhado pelo processo.
+
+Substitui o psycopg2.connect a cada chamada (handshake TCP + autenticação
+por consulta) por conexões reaproveitadas, com:
+- health check (SELECT 1) nas conexões ociosas há mais de POOL_HEALTHCHECK_S
+- reciclagem de conexões mais velhas que POOL_MAX_LIFETIME_S
+- contabilidade de uso por cliente (id_client)
+- métricas de saturação (esperas, timeouts, tempo de espera)
+
+As conexões emprestadas são um proxy da conexão psycopg2: conn.close()
+devolve ao pool em vez de fechar, então o código existente
+(conn = conectar_...(); ...; conn.close()) funciona sem mudanças.
+Também há a API de context manager: `with conexao(id_client) as conn:`.
+
+Com TENANT_STORAGE=schema, a conexão emprestada com id_client já vem com o
+search_path do cliente (ver armazenamento_clientes); o DISCARD ALL na
+devolução restaura o padrão.
+
+Os agendadores (alertas, snapshots e refresh de views de KPI) rodam dentro
+de `with em_segundo_plano():` e juntos nunca passam de
+POOL_MAX_SEGUNDO_PLANO conexões; o restante do pool fica sempre livre para
+as páginas. A marca é um contextvar, repassado às threads do executor_async.
+"""
+
+import os
+import sys
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+from dotenv import load_dotenv
+
+# 🔧 [LOGGING] Configuração de logging para Render
+def setup_render_logging():
+    """Configura logging para ser visível no Render"""
+    logger = logging.getLogger('soliris_pool')
+    if not logger.handlers:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setLevel(logging.INFO)
+        formatter = logging.Formatter(
+            '%(asctime)s - SOLIRIS-POOL - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+        console_handler.setFormatter(formatter)
+        logger.addHandler(console_handler)
+        logger.setLevel(logging.INFO)
+    return logger
+
+# Inicializar logger
+render_logger = setup_render_logging()
+
+load_dotenv()
+
+POOL_MAX = int(os.getenv("POOL_MAX", "10"))
+# Tempo máximo esperando uma conexão livre antes de desistir (segundos)
+POOL_TIMEOUT_S = float(os.getenv("POOL_TIMEOUT_S", "30"))
+POOL_MAX_LIFETIME_S = float(os.getenv("POOL_MAX_LIFETIME_S", "1800"))
+POOL_HEALTHCHECK_S = float(os.getenv("POOL_HEALTHCHECK_S", "30"))
+# Conexões que os agendadores podem usar ao mesmo tempo (somados)
+# (mínimo 2: o ciclo de alertas segura o advisory lock enquanto consulta)
+POOL_MAX_SEGUNDO_PLANO = int(os.getenv("POOL_MAX_SEGUNDO_PLANO", str(max(POOL_MAX // 2, 2))))
+
+_segundo_plano = contextvars.ContextVar("soliris_segundo_plano", default=False)
+
+@contextmanager
+def em_segundo_plano():
+    """Conexões obtidas dentro do bloco contam no orçamento dos agendadores"""
+    token = _segundo_plano.set(True)
+    try:
+        yield
+    finally:
+        _segundo_plano.reset(token)
+
+class PoolEsgotado(Exception):
+    """Nenhuma conexão livre dentro do tempo limite"""
+
+class _ConexaoPool:
+    """Proxy de uma conexão psycopg2 emprestada do pool"""
+
+    def __init__(self, pool, conn, id_client, segundo_plano=False):
+        self._pool = pool
+        self._conn = conn
+        self._id_client = id_client
+        self._segundo_plano = segundo_plano
+        self._emprestada_em = time.monotonic()
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool._devolver(conn, self._id_client, time.monotonic() - self._emprestada_em,
+                                 self._segundo_plano)
+
+    @property
+    def closed(self):
+        return 1 if self._conn is None else self._conn.closed
+
+    def __getattr__(self, nome):
+        if self._conn is None:
+            raise psycopg2.InterfaceError("connection already closed")
+        return getattr(self._conn, nome)
+
+    def __setattr__(self, nome, valor):
+        if nome.startswith("_"):
+            object.__setattr__(self, nome, valor)
+        else:
+            setattr(self._conn, nome, valor)
+
+    # mesma semântica do psycopg2: o bloco with controla a transação
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, tb):
+        if self._conn is None:
+            return
+        if tipo is None:
+            self._conn.commit()
+        else:
+            self._conn.rollback()
+
+    def __del__(self):
+        # conexão esquecida sem close() volta ao pool ao ser coletada
+        try:
+            self.close()
+        except Exception:
+            pass
+
+class PoolConexoes:
+    def __init__(self, maximo: int = POOL_MAX, timeout_s: float = POOL_TIMEOUT_S,
+                 max_lifetime_s: float = POOL_MAX_LIFETIME_S,
+                 healthcheck_s: float = POOL_HEALTHCHECK_S,
+                 maximo_segundo_plano: int = POOL_MAX_SEGUNDO_PLANO):
+        self.maximo = maximo
+        self.maximo_segundo_plano = min(maximo_segundo_plano, maximo)
+        self.timeout_s = timeout_s
+        self.max_lifetime_s = max_lifetime_s
+        self.healthcheck_s = healthcheck_s
+        self._cond = threading.Condition()
+        # ociosas: [(conn, criada_em, usada_em)]
+        self._ociosas: list[tuple] = []
+        self._criada_em: dict[int, float] = {}
+        self._em_uso = 0
+        self._em_uso_segundo_plano = 0
+        self._pid = os.getpid()
+        self._metricas = {
+            "emprestimos": 0, "criadas": 0, "recicladas": 0, "descartadas_healthcheck": 0,
+            "esperas": 0, "timeouts": 0, "segundos_espera": 0.0, "pico_em_uso": 0,
+        }
+        self._por_cliente: dict = {}
+
+    # --- conexões físicas -------------------------------------------------
+    def _nova_conexao(self):
+        conn = psycopg2.connect(
+            host=os.getenv("DB_HOST"),
+            port=os.getenv("DB_PORT"),
+            dbname=os.getenv("DB_NAME"),
+            user=os.getenv("DB_USER"),
+            password=os.getenv("DB_PASSWORD")
+        )
+        # connect() fora do lock; o estado do pool só muda com ele (RLock: pode já estar com ele)
+        with self._cond:
+            self._criada_em[id(conn)] = time.monotonic()
+            self._metricas["criadas"] += 1
+        return conn
+
+    def _fechar(self, conn):
+        with self._cond:
+            self._criada_em.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _saudavel(self, conn, usada_em: float) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - usada_em < self.healthcheck_s:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.fetchone()
+            cur.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _verificar_fork(self):
+        # um processo filho não pode reaproveitar os sockets do pai
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._ociosas, self._criada_em, self._em_uso = [], {}, 0
+            self._em_uso_segundo_plano = 0
+
+    # --- empréstimo -------------------------------------------------------
+    def obter(self, id_client: int = None, timeout_s: float = None) -> _ConexaoPool:
+        """Empresta uma conexão (devolvida com .close())"""
+        limite = self.timeout_s if timeout_s is None else timeout_s
+        segundo_plano = _segundo_plano.get()
+        inicio = time.monotonic()
+        esperou = False
+        while True:
+            candidata = None
+            with self._cond:
+                self._verificar_fork()
+                while True:
+                    livre = not segundo_plano or self._em_uso_segundo_plano < self.maximo_segundo_plano
+                    if livre and self._ociosas:
+                        conn, criada_em, usada_em = self._ociosas.pop()
+                        if time.monotonic() - criada_em > self.max_lifetime_s:
+                            self._metricas["recicladas"] += 1
+                            self._fechar(conn)
+                            continue
+                        candidata = (conn, usada_em)
+                    if livre and (candidata or self._em_uso < self.maximo):
+                        # reserva a vaga antes do health check / conexão nova
+                        self._em_uso += 1
+                        if segundo_plano:
+                            self._em_uso_segundo_plano += 1
+                        break
+
+                    restante = limite - (time.monotonic() - inicio)
+                    if restante <= 0:
+                        self._metricas["timeouts"] += 1
+                        render_logger.error(
+                            f"❌ [POOL] Esgotado: {self._em_uso}/{self.maximo} em uso "
+                            f"({self._em_uso_segundo_plano}/{self.maximo_segundo_plano} em segundo plano) após {limite:.1f}s"
+                        )
+                        raise PoolEsgotado(f"Nenhuma conexão livre em {limite:.1f}s ({self.maximo} em uso)")
+                    if not esperou:
+                        esperou = True
+                        self._metricas["esperas"] += 1
+                        render_logger.warning(f"⏳ [POOL] Saturado ({self._em_uso}/{self.maximo}), aguardando conexão")
+                    self._cond.wait(restante)
+
+            # health check e conexão nova fora do lock para não travar os demais
+            try:
+                if candidata:
+                    conn, usada_em = candidata
+                    if not self._saudavel(conn, usada_em):
+                        self._fechar(conn)
+                        self._liberar_vaga(segundo_plano, descartada=True)
+                        continue
+                else:
+                    conn = self._nova_conexao()
+            except Exception:
+                self._liberar_vaga(segundo_plano)
+                raise
+            with self._cond:
+                return self._emprestar(conn, id_client, inicio, esperou, segundo_plano)
+
+    def _liberar_vaga(self, segundo_plano: bool, descartada: bool = False):
+        with self._cond:
+            self._em_uso = max(self._em_uso - 1, 0)
+            if segundo_plano:
+                self._em_uso_segundo_plano = max(self._em_uso_segundo_plano - 1, 0)
+            if descartada:
+                self._metricas["descartadas_healthcheck"] += 1
+            self._cond.notify_all()
+
+    def _emprestar(self, conn, id_client, inicio, esperou, segundo_plano=False) -> _ConexaoPool:
+        # a vaga (em_uso) já foi reservada em obter()
+        m = self._metricas
+        m["emprestimos"] += 1
+        m["pico_em_uso"] = max(m["pico_em_uso"], self._em_uso)
+        if esperou:
+            m["segundos_espera"] += time.monotonic() - inicio
+        uso = self._por_cliente.setdefault(id_client, {"emprestimos": 0, "em_uso": 0, "segundos_em_uso": 0.0})
+        uso["emprestimos"] += 1
+        uso["em_uso"] += 1
+        return _ConexaoPool(self, conn, id_client, segundo_plano)
+
+    def _devolver(self, conn, id_client, segundos_em_uso: float, segundo_plano: bool = False):
+        reutilizavel = not conn.closed
+        if reutilizavel:
+            try:
+                # transação pendente e parâmetros de sessão não vazam para o próximo
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                conn.autocommit = True
+                cur = conn.cursor()
+                cur.execute("DISCARD ALL")
+                cur.close()
+                conn.autocommit = False
+            except Exception:
+                reutilizavel = False
+
+        with self._cond:
+            if os.getpid() != self._pid:
+                return
+            self._em_uso = max(self._em_uso - 1, 0)
+            if segundo_plano:
+                self._em_uso_segundo_plano = max(self._em_uso_segundo_plano - 1, 0)
+            uso = self._por_cliente.get(id_client)
+            if uso:
+                uso["em_uso"] = max(uso["em_uso"] - 1, 0)
+                uso["segundos_em_uso"] += segundos_em_uso
+            if reutilizavel:
+                criada_em = self._criada_em.get(id(conn), time.monotonic())
+                self._ociosas.append((conn, criada_em, time.monotonic()))
+            else:
+                self._fechar(conn)
+            # quem espera pode ser de primeiro ou de segundo plano
+            self._cond.notify_all()
+
+    # --- observabilidade --------------------------------------------------
+    def metricas(self) -> dict:
+        with self._cond:
+            m = dict(self._metricas)
+            m.update({
+                "maximo": self.maximo,
+                "em_uso": self._em_uso,
+                "maximo_segundo_plano": self.maximo_segundo_plano,
+                "em_uso_segundo_plano": self._em_uso_segundo_plano,
+                "ociosas": len(self._ociosas),
+                "saturacao": round(self._em_uso / self.maximo, 2) if self.maximo else 0.0,
+                "espera_media_s": round(m["segundos_espera"] / m["esperas"], 3) if m["esperas"] else 0.0,
+                "por_cliente": {k: dict(v) for k, v in self._por_cliente.items()},
+            })
+            return m
+
+    def fechar_todas(self):
+        """Fecha as conexões ociosas (as emprestadas são fechadas ao voltar)"""
+        with self._cond:
+            for conn, _, _ in self._ociosas:
+                self._fechar(conn)
+            self._ociosas = []
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def obter_pool() -> PoolConexoes:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PoolConexoes()
+                render_logger.info(
+                    f"🏊 [POOL] Pool criado (máx {_pool.maximo} conexões, {_pool.maximo_segundo_plano} para agendadores)"
+                )
+    return _pool
+
+def obter_conexao(id_client: int = None):
+    """Empresta uma conexão do pool; conn.close() a devolve"""
+    from armazenamento_clientes import aplicar_search_path
+    conn = obter_pool().obter(id_client)
+    try:
+        aplicar_search_path(conn, id_client)
+    except Exception:
+        conn.close()
+        raise
+    return conn
+
+@contextmanager
+def conexao(id_client: int = None):
+    """
+    with conexao(id_client) as conn: ...
+    Faz commit ao sair sem erro, rollback em caso de exceção e devolve a conexão.
+    """
+    conn = obter_conexao(id_client)
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def metricas_pool() -> dict:
+    return obter_pool().metricas()
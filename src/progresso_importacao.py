@@ -0,0 +1,239 @@
+"""
+Eventos de progresso e registro de execuções de importação.
+
+O MonitorImportacao acompanha uma importação (bytes lidos do arquivo,
+linhas lidas pelo parser, linhas carregadas pelo COPY), calcula linhas/s
+e ETA e entrega eventos a um callback (ex: barra de progresso do
+Streamlit). Ao final, a execução é gravada em importacoes_execucoes com
+uma linha do tempo resumida dos eventos, para análise de desempenho.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+
+from catalogo_schema import id_client_da_tabela
+
+# 🔧 [LOGGING] Configuração de logging para Render
+def setup_render_logging():
+    """Configura logging para ser visível no Render"""
+    logger = logging.getLogger('soliris_progresso')
+    if not logger.handlers:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setLevel(logging.INFO)
+        formatter = logging.Formatter(
+            '%(asctime)s - SOLIRIS-PROGRESSO - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+        console_handler.setFormatter(formatter)
+        logger.addHandler(console_handler)
+        logger.setLevel(logging.INFO)
+    return logger
+
+# Inicializar logger
+render_logger = setup_render_logging()
+
+TABELA_EXECUCOES = "importacoes_execucoes"
+# Intervalo mínimo entre eventos entregues ao callback (segundos)
+INTERVALO_EVENTOS = 0.5
+# Máximo de eventos guardados na linha do tempo da execução
+MAX_EVENTOS_REGISTRADOS = 200
+
+_tabela_criada = False
+_tabela_lock = threading.Lock()
+
+class MonitorImportacao:
+    """Acompanha uma importação e emite eventos de progresso"""
+
+    def __init__(self, nome_tabela: str, arquivo: str = None, modo: str = None,
+                 callback=None, total_linhas: int = None):
+        self.nome_tabela = nome_tabela
+        self.arquivo = arquivo
+        self.modo = modo
+        self.callback = callback
+        self.bytes_total = os.path.getsize(arquivo) if isinstance(arquivo, str) and os.path.exists(arquivo) else None
+        self.total_linhas = total_linhas
+        self.bytes_lidos = 0
+        self.linhas_lidas = 0
+        self.linhas_carregadas = 0
+        self.fase = "lendo"
+        self.inicio = time.perf_counter()
+        self.iniciado_em = datetime.now()
+        self._ultimo_evento = 0.0
+        self._eventos: list[dict] = []
+
+    # --- contadores -------------------------------------------------------
+    def ao_ler_bytes(self, n: int):
+        self.bytes_lidos += n
+        self._emitir()
+
+    def ao_ler_linhas(self, n: int):
+        self.linhas_lidas += n
+        self._emitir()
+
+    def ao_carregar_linhas(self, n: int):
+        self.linhas_carregadas += n
+        self._emitir()
+
+    def mudar_fase(self, fase: str):
+        self.fase = fase
+        self._emitir(forcar=True)
+
+    # --- eventos ----------------------------------------------------------
+    def _fracao(self):
+        if self.total_linhas:
+            return min(self.linhas_carregadas / self.total_linhas, 1.0)
+        if self.bytes_total:
+            return min(self.bytes_lidos / self.bytes_total, 1.0)
+        return None
+
+    def evento(self) -> dict:
+        segundos = max(time.perf_counter() - self.inicio, 1e-9)
+        fracao = self._fracao()
+        eta = None
+        if fracao and fracao < 1.0 and self.fase == "lendo":
+            eta = round(segundos * (1 - fracao) / fracao, 1)
+        return {
+            "tabela": self.nome_tabela,
+            "fase": self.fase,
+            "bytes_lidos": self.bytes_lidos,
+            "bytes_total": self.bytes_total,
+            "linhas_lidas": self.linhas_lidas,
+            "linhas_carregadas": self.linhas_carregadas,
+            "linhas_por_segundo": round(self.linhas_carregadas / segundos, 1),
+            "percentual": fracao,
+            "eta_segundos": eta,
+            "segundos": round(segundos, 3),
+        }
+
+    def _emitir(self, forcar: bool = False):
+        agora = time.perf_counter()
+        if not forcar and agora - self._ultimo_evento < INTERVALO_EVENTOS:
+            return
+        self._ultimo_evento = agora
+        evento = self.evento()
+        if len(self._eventos) < MAX_EVENTOS_REGISTRADOS:
+            self._eventos.append({k: evento[k] for k in (
+                "segundos", "fase", "bytes_lidos", "linhas_lidas", "linhas_carregadas"
+            )})
+        if self.callback:
+            try:
+                self.callback(evento)
+            except Exception as e:  # a interface nunca derruba o import
+                render_logger.warning(f"⚠️ [PROGRESSO] Callback falhou: {e}")
+
+    # --- registro ---------------------------------------------------------
+    def finalizar(self, status: str = "OK", erro: str = None, stats: dict = None):
+        """Emite o evento final e grava a execução (falhas só vão para o log)"""
+        self.fase = "concluido" if status == "OK" else "erro"
+        self._emitir(forcar=True)
+        final = self.evento()
+        render_logger.info(
+            f"📈 [PROGRESSO] {self.nome_tabela}: {status}, {final['linhas_carregadas']} linhas, "
+            f"{final['bytes_lidos']} bytes, {final['segundos']:.2f}s ({final['linhas_por_segundo']:.0f} linhas/s)"
+        )
+        try:
+            registrar_execucao(self, status, erro, final, stats or {})
+        except Exception as e:
+            render_logger.warning(f"⚠️ [PROGRESSO] Não foi possível registrar a execução: {e}")
+
+def criar_tabela_execucoes(cursor):
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABELA_EXECUCOES} (
+            id SERIAL PRIMARY KEY,
+            id_client INTEGER,
+            tabela TEXT NOT NULL,
+            arquivo TEXT,
+            modo TEXT,
+            status TEXT NOT NULL,
+            erro TEXT,
+            bytes_total BIGINT,
+            bytes_lidos BIGINT,
+            linhas_lidas BIGINT,
+            linhas_carregadas BIGINT,
+            segundos DOUBLE PRECISION,
+            linhas_por_segundo DOUBLE PRECISION,
+            detalhes JSONB,
+            eventos JSONB,
+            iniciado_em TIMESTAMP,
+            finalizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute(
+        f"CREATE INDEX IF NOT EXISTS {TABELA_EXECUCOES}_cliente_idx "
+        f"ON {TABELA_EXECUCOES} (id_client, iniciado_em DESC)"
+    )
+
+def _garantir_tabela_execucoes(conn, cursor):
+    """criar_tabela_execucoes uma única vez por processo"""
+    global _tabela_criada
+    if not _tabela_criada:
+        with _tabela_lock:
+            if not _tabela_criada:
+                criar_tabela_execucoes(cursor)
+                conn.commit()
+                _tabela_criada = True
+
+def registrar_execucao(monitor: MonitorImportacao, status: str, erro: str, final: dict, stats: dict):
+    from import_csv import conectar_banco
+    detalhes = {k: v for k, v in stats.items() if isinstance(v, (str, int, float, bool, list, type(None)))}
+    conn = conectar_banco()
+    cursor = conn.cursor()
+    try:
+        _garantir_tabela_execucoes(conn, cursor)
+        cursor.execute(f"""
+            INSERT INTO {TABELA_EXECUCOES}
+                (id_client, tabela, arquivo, modo, status, erro, bytes_total, bytes_lidos,
+                 linhas_lidas, linhas_carregadas, segundos, linhas_por_segundo,
+                 detalhes, eventos, iniciado_em)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, (
+            id_client_da_tabela(monitor.nome_tabela), monitor.nome_tabela,
+            os.path.basename(monitor.arquivo) if isinstance(monitor.arquivo, str) else None,
+            monitor.modo, status, erro, monitor.bytes_total, final["bytes_lidos"],
+            final["linhas_lidas"], final["linhas_carregadas"], final["segundos"],
+            final["linhas_por_segundo"], json.dumps(detalhes, default=str),
+            json.dumps(monitor._eventos), monitor.iniciado_em,
+        ))
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+def listar_execucoes(id_client: int, limite: int = 50) -> list[dict]:
+    """Últimas execuções de importação do cliente (mais recentes primeiro)"""
+    from import_csv import conectar_banco
+    conn = conectar_banco()
+    cursor = conn.cursor()
+    try:
+        _garantir_tabela_execucoes(conn, cursor)
+        cursor.execute(f"""
+            SELECT tabela, arquivo, modo, status, erro, bytes_total, linhas_carregadas,
+                   segundos, linhas_por_segundo, iniciado_em
+              FROM {TABELA_EXECUCOES}
+             WHERE id_client = %s
+             ORDER BY iniciado_em DESC
+             LIMIT %s
+        """, (id_client, limite))
+        nomes = [d[0] for d in cursor.description]
+        return [dict(zip(nomes, linha)) for linha in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+
+def formatar_evento(evento: dict) -> str:
+    """Texto curto para a barra de progresso"""
+    partes = [f"{evento['linhas_carregadas']:,} linhas".replace(",", ".")]
+    if evento["linhas_por_segundo"]:
+        partes.append(f"{evento['linhas_por_segundo']:,.0f} linhas/s".replace(",", "."))
+    if evento["bytes_total"]:
+        partes.append(f"{evento['bytes_lidos'] / 1024 / 1024:.1f} de {evento['bytes_total'] / 1024 / 1024:.1f} MB")
+    if evento["eta_segundos"] is not None:
+        partes.append(f"~{evento['eta_segundos']:.0f}s restantes")
+    if evento["fase"] == "indices":
+        partes.append("criando índices")
+    return " · ".join(partes)
@@ -0,0 +1,470 @@
+"""
+Repositório de alertas: definições, histórico e último estado.
+
+Substitui os arquivos alertas_cliXX.json / historico_alertas_cliXX.json
+(lidos e regravados inteiros a cada alteração) por tabelas indexadas:
+cada disparo é um INSERT, o histórico é consultado paginado e filtrado no
+banco e a retenção (ALERTAS_RETENCAO_DIAS) é um DELETE por data em vez do
+corte em 1000 registros.
+
+Backend (ALERTAS_BACKEND): "postgres" (padrão, tabelas em public) ou
+"sqlite" (ALERTAS_SQLITE_PATH) para rodar localmente sem o banco.
+Os arquivos JSON antigos (ALERTAS_DIR) são importados automaticamente na
+primeira leitura de cada cliente; `python src/repositorio_alertas.py importar
+--todos` faz a importação de uma vez. Cada importação concluída fica em
+alertas_importacoes, então o arquivo nunca é importado duas vezes (nem
+depois de o cliente remover todos os alertas).
+"""
+
+import os
+import sys
+import glob
+import json
+import sqlite3
+import logging
+import threading
+import contextlib
+from datetime import datetime, timedelta
+
+from psycopg2.extras import execute_values
+
+from pool_conexoes import obter_conexao
+
+# 🔧 [LOGGING] Configuração de logging para Render
+def setup_render_logging():
+    """Configura logging para ser visível no Render"""
+    logger = logging.getLogger('soliris_repositorio_alertas')
+    if not logger.handlers:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setLevel(logging.INFO)
+        formatter = logging.Formatter(
+            '%(asctime)s - SOLIRIS-REPOSITORIO-ALERTAS - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+        console_handler.setFormatter(formatter)
+        logger.addHandler(console_handler)
+        logger.setLevel(logging.INFO)
+    return logger
+
+# Inicializar logger
+render_logger = setup_render_logging()
+
+BACKEND = os.getenv("ALERTAS_BACKEND", "postgres").lower()
+SQLITE_PATH = os.getenv("ALERTAS_SQLITE_PATH", "alertas.db")
+# Histórico mais antigo que isso é removido pelo agendador (0 = guarda tudo)
+RETENCAO_DIAS = int(os.getenv("ALERTAS_RETENCAO_DIAS", "90"))
+# Diretório dos arquivos JSON antigos (apenas para importação)
+DIRETORIO_JSON = os.getenv("ALERTAS_DIR", "/home/lanna/Estudos/2025-1/Soliris/interface/hist_alerta")
+POR_PAGINA = 50
+
+# colunas próprias da tabela; o restante da configuração do alerta vai em `config`
+CAMPOS_ALERTA = ("id", "id_client", "nome", "ativo", "criado_em")
+
+_tabelas_criadas = False
+_tabelas_lock = threading.Lock()
+_importados: set[int] = set()
+
+def usa_sqlite() -> bool:
+    return BACKEND == "sqlite"
+
+def _tabela(nome: str) -> str:
+    return nome if usa_sqlite() else f"public.{nome}"
+
+def _sql(sql: str) -> str:
+    return sql.replace("%s", "?") if usa_sqlite() else sql
+
+if usa_sqlite():
+    sqlite3.register_adapter(datetime, lambda d: d.isoformat(" "))
+    sqlite3.register_converter("TIMESTAMP", lambda b: datetime.fromisoformat(b.decode()))
+
+def _criar_tabelas(cursor):
+    chave = "INTEGER PRIMARY KEY AUTOINCREMENT" if usa_sqlite() else "SERIAL PRIMARY KEY"
+    alertas, historico, estado = _tabela("alertas"), _tabela("alertas_historico"), _tabela("alertas_estado")
+    comandos = [
+        f"""CREATE TABLE IF NOT EXISTS {alertas} (
+                id {chave},
+                id_client INTEGER NOT NULL,
+                nome TEXT NOT NULL,
+                ativo BOOLEAN NOT NULL DEFAULT TRUE,
+                config TEXT NOT NULL,
+                criado_em TIMESTAMP NOT NULL
+            )""",
+        f"CREATE UNIQUE INDEX IF NOT EXISTS alertas_cliente_nome_idx ON {alertas} (id_client, nome)",
+        f"""CREATE TABLE IF NOT EXISTS {historico} (
+                id {chave},
+                id_client INTEGER NOT NULL,
+                id_alerta INTEGER,
+                data TIMESTAMP NOT NULL,
+                alerta TEXT,
+                status TEXT NOT NULL,
+                valor DOUBLE PRECISION,
+                limite DOUBLE PRECISION,
+                condicao TEXT,
+                tipo TEXT
+            )""",
+        f"CREATE INDEX IF NOT EXISTS alertas_historico_cliente_data_idx ON {historico} (id_client, data)",
+        f"CREATE INDEX IF NOT EXISTS alertas_historico_alerta_data_idx ON {historico} (id_alerta, data)",
+        f"""CREATE TABLE IF NOT EXISTS {estado} (
+                id_client INTEGER NOT NULL,
+                id_alerta INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                valor_atual DOUBLE PRECISION,
+                erro TEXT,
+                ultima_verificacao TIMESTAMP NOT NULL,
+                proxima_verificacao TIMESTAMP,
+                segundos DOUBLE PRECISION,
+                marca TEXT,
+                PRIMARY KEY (id_client, id_alerta)
+            )""",
+        f"""CREATE TABLE IF NOT EXISTS {_tabela('alertas_sql_ia')} (
+                id_client INTEGER NOT NULL,
+                chave TEXT NOT NULL,
+                descricao TEXT NOT NULL,
+                tabelas TEXT NOT NULL,
+                sql TEXT NOT NULL,
+                custo DOUBLE PRECISION,
+                criado_em TIMESTAMP NOT NULL,
+                PRIMARY KEY (id_client, chave)
+            )""",
+        f"""CREATE TABLE IF NOT EXISTS {_tabela('alertas_importacoes')} (
+                id_client INTEGER PRIMARY KEY,
+                importado_em TIMESTAMP NOT NULL,
+                alertas INTEGER NOT NULL,
+                historico INTEGER NOT NULL
+            )""",
+    ]
+    for comando in comandos:
+        cursor.execute(comando)
+
+@contextlib.contextmanager
+def _cursor():
+    """Cursor em transação (commit ao sair, rollback em erro)"""
+    global _tabelas_criadas
+    if usa_sqlite():
+        conn = sqlite3.connect(SQLITE_PATH, timeout=30, detect_types=sqlite3.PARSE_DECLTYPES)
+    else:
+        conn = obter_conexao()
+    cursor = conn.cursor()
+    try:
+        if not _tabelas_criadas:
+            with _tabelas_lock:
+                if not _tabelas_criadas:
+                    _criar_tabelas(cursor)
+                    # commit próprio: um rollback do bloco abaixo não desfaz as tabelas
+                    conn.commit()
+                    _tabelas_criadas = True
+        yield cursor
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+def _inserir_varios(cursor, sql: str, linhas: list[tuple]):
+    """INSERT ... VALUES %s em lote (execute_values no Postgres)"""
+    if usa_sqlite():
+        marcadores = "(" + ", ".join("?" * len(linhas[0])) + ")"
+        cursor.executemany(sql.replace("VALUES %s", f"VALUES {marcadores}"), linhas)
+    else:
+        execute_values(cursor, sql, linhas)
+
+def _linhas_dict(cursor) -> list[dict]:
+    colunas = [d[0] for d in cursor.description]
+    return [dict(zip(colunas, linha)) for linha in cursor.fetchall()]
+
+# --- definições ----------------------------------------------------------------
+
+def _alerta_do_registro(registro: dict) -> dict:
+    return {
+        **json.loads(registro["config"]),
+        "id": registro["id"],
+        "nome": registro["nome"],
+        "ativo": bool(registro["ativo"]),
+        "criado_em": registro["criado_em"].isoformat() if registro["criado_em"] else None,
+    }
+
+def listar_alertas(client_id: int) -> list[dict]:
+    """Alertas do cliente, na ordem de criação"""
+    _importar_json_se_preciso(client_id)
+    with _cursor() as cursor:
+        cursor.execute(_sql(f"""
+            SELECT id, nome, ativo, config, criado_em
+              FROM {_tabela('alertas')}
+             WHERE id_client = %s
+             ORDER BY id
+        """), (client_id,))
+        return [_alerta_do_registro(r) for r in _linhas_dict(cursor)]
+
+def _inserir_alerta(cursor, client_id: int, alerta: dict) -> int:
+    config = {k: v for k, v in alerta.items() if k not in CAMPOS_ALERTA}
+    criado_em = alerta.get("criado_em")
+    criado_em = datetime.fromisoformat(criado_em) if isinstance(criado_em, str) else (criado_em or datetime.now())
+    parametros = (client_id, alerta["nome"], bool(alerta.get("ativo", True)),
+                  json.dumps(config, ensure_ascii=False, default=str), criado_em)
+    sql = f"""
+        INSERT INTO {_tabela('alertas')} (id_client, nome, ativo, config, criado_em)
+        VALUES (%s, %s, %s, %s, %s)
+    """
+    if usa_sqlite():
+        cursor.execute(_sql(sql), parametros)
+        return cursor.lastrowid
+    cursor.execute(sql + " RETURNING id", parametros)
+    return cursor.fetchone()[0]
+
+def criar_alerta(client_id: int, alerta: dict) -> int:
+    """Grava um novo alerta e devolve o id (nome repetido no cliente levanta erro)"""
+    _importar_json_se_preciso(client_id)
+    with _cursor() as cursor:
+        return _inserir_alerta(cursor, client_id, alerta)
+
+def remover_alerta(client_id: int, alerta_id: int) -> bool:
+    """Remove o alerta e o seu estado (o histórico é mantido)"""
+    with _cursor() as cursor:
+        cursor.execute(_sql(f"DELETE FROM {_tabela('alertas_estado')} WHERE id_client = %s AND id_alerta = %s"),
+                       (client_id, alerta_id))
+        cursor.execute(_sql(f"DELETE FROM {_tabela('alertas')} WHERE id_client = %s AND id = %s"),
+                       (client_id, alerta_id))
+        return cursor.rowcount > 0
+
+def clientes_com_alertas() -> list[int]:
+    """Clientes com pelo menos um alerta ativo"""
+    with _cursor() as cursor:
+        cursor.execute(f"SELECT DISTINCT id_client FROM {_tabela('alertas')} WHERE ativo ORDER BY id_client")
+        clientes = [r[0] for r in cursor.fetchall()]
+    # clientes que ainda só têm o arquivo JSON antigo
+    for client_id in clientes_com_json():
+        if client_id not in clientes and client_id not in _importados:
+            if _importar_json_se_preciso(client_id):
+                clientes.append(client_id)
+    return sorted(clientes)
+
+# --- histórico -----------------------------------------------------------------
+
+def registrar_historico(client_id: int, alerta: dict, status: str, valor_atual=None):
+    """Acrescenta uma entrada ao histórico (um INSERT)"""
+    with _cursor() as cursor:
+        cursor.execute(_sql(f"""
+            INSERT INTO {_tabela('alertas_historico')}
+                (id_client, id_alerta, data, alerta, status, valor, limite, condicao, tipo)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """), (client_id, alerta.get('id'), datetime.now(), alerta['nome'], status,
+               valor_atual, alerta['valor_limite'], alerta['condicao'], alerta.get('tipo', 'N/A')))
+
+def _filtro_historico(client_id: int, desde: datetime = None, status: str = None,
+                      id_alerta: int = None) -> tuple[str, list]:
+    condicoes, parametros = ["id_client = %s"], [client_id]
+    if desde is not None:
+        condicoes.append("data >= %s")
+        parametros.append(desde)
+    if status:
+        condicoes.append("status = %s")
+        parametros.append(status)
+    if id_alerta is not None:
+        condicoes.append("id_alerta = %s")
+        parametros.append(id_alerta)
+    return " AND ".join(condicoes), parametros
+
+def listar_historico(client_id: int, desde: datetime = None, status: str = None, id_alerta: int = None,
+                     pagina: int = 1, por_pagina: int = POR_PAGINA) -> dict:
+    """
+    Uma página do histórico, mais recentes primeiro:
+    {itens: [{id, data, alerta, status, valor, limite, condicao, tipo}], total, pagina, paginas}
+    """
+    _importar_json_se_preciso(client_id)
+    condicao, parametros = _filtro_historico(client_id, desde, status, id_alerta)
+    pagina = max(int(pagina), 1)
+    with _cursor() as cursor:
+        cursor.execute(_sql(f"SELECT COUNT(*) FROM {_tabela('alertas_historico')} WHERE {condicao}"), parametros)
+        total = cursor.fetchone()[0]
+        cursor.execute(_sql(f"""
+            SELECT id, data, alerta, status, valor, limite, condicao, tipo
+              FROM {_tabela('alertas_historico')}
+             WHERE {condicao}
+             ORDER BY data DESC, id DESC
+             LIMIT %s OFFSET %s
+        """), parametros + [por_pagina, (pagina - 1) * por_pagina])
+        itens = _linhas_dict(cursor)
+    return {"itens": itens, "total": total, "pagina": pagina, "paginas": max((total + por_pagina - 1) // por_pagina, 1)}
+
+def contagem_por_dia(client_id: int, desde: datetime = None, status: str = None) -> list[tuple]:
+    """[(dia, quantidade)] do histórico filtrado, agregado no banco"""
+    condicao, parametros = _filtro_historico(client_id, desde, status)
+    dia = "date(data)" if usa_sqlite() else "data::date"
+    with _cursor() as cursor:
+        cursor.execute(_sql(f"""
+            SELECT {dia} AS dia, COUNT(*)
+              FROM {_tabela('alertas_historico')}
+             WHERE {condicao}
+             GROUP BY 1
+             ORDER BY 1
+        """), parametros)
+        return cursor.fetchall()
+
+def aplicar_retencao(dias: int = None) -> int:
+    """Remove o histórico mais antigo que `dias` (RETENCAO_DIAS); devolve quantas linhas"""
+    dias = RETENCAO_DIAS if dias is None else dias
+    if dias <= 0:
+        return 0
+    with _cursor() as cursor:
+        cursor.execute(_sql(f"DELETE FROM {_tabela('alertas_historico')} WHERE data < %s"),
+                       (datetime.now() - timedelta(days=dias),))
+        removidas = cursor.rowcount
+    if removidas:
+        render_logger.info(f"🧹 [ALERTAS] Retenção: {removidas} registros de histórico com mais de {dias} dias removidos")
+    return removidas
+
+# --- estado --------------------------------------------------------------------
+
+def obter_estados(client_id: int) -> dict[int, dict]:
+    """Último estado gravado de cada alerta do cliente: {id_alerta: estado}"""
+    with _cursor() as cursor:
+        cursor.execute(_sql(f"""
+            SELECT id_alerta, status, valor_atual, erro, ultima_verificacao, proxima_verificacao, segundos, marca
+              FROM {_tabela('alertas_estado')}
+             WHERE id_client = %s
+        """), (client_id,))
+        return {estado["id_alerta"]: estado for estado in _linhas_dict(cursor)}
+
+def gravar_estados(client_id: int, estados: list[dict]):
+    if not estados:
+        return
+    with _cursor() as cursor:
+        _inserir_varios(cursor, f"""
+            INSERT INTO {_tabela('alertas_estado')}
+                (id_client, id_alerta, status, valor_atual, erro, ultima_verificacao, proxima_verificacao, segundos, marca)
+            VALUES %s
+            ON CONFLICT (id_client, id_alerta) DO UPDATE SET
+                status = EXCLUDED.status,
+                valor_atual = EXCLUDED.valor_atual,
+                erro = EXCLUDED.erro,
+                ultima_verificacao = EXCLUDED.ultima_verificacao,
+                proxima_verificacao = EXCLUDED.proxima_verificacao,
+                segundos = EXCLUDED.segundos,
+                marca = EXCLUDED.marca
+        """, [
+            (client_id, e['id_alerta'], e['status'], e['valor_atual'], e['erro'],
+             e['ultima_verificacao'], e['proxima_verificacao'], e['segundos'], e.get('marca'))
+            for e in estados
+        ])
+
+# --- SQL gerado por IA ---------------------------------------------------------
+
+def obter_sql_ia(client_id: int, chave: str):
+    """SQL de alerta já gerado e validado para a chave (ou None)"""
+    with _cursor() as cursor:
+        cursor.execute(_sql(f"""
+            SELECT descricao, tabelas, sql, custo, criado_em
+              FROM {_tabela('alertas_sql_ia')}
+             WHERE id_client = %s AND chave = %s
+        """), (client_id, chave))
+        registros = _linhas_dict(cursor)
+    if not registros:
+        return None
+    return {**registros[0], "tabelas": json.loads(registros[0]["tabelas"])}
+
+def guardar_sql_ia(client_id: int, chave: str, descricao: str, tabelas: list[str], sql: str, custo: float):
+    with _cursor() as cursor:
+        cursor.execute(_sql(f"""
+            INSERT INTO {_tabela('alertas_sql_ia')} (id_client, chave, descricao, tabelas, sql, custo, criado_em)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (id_client, chave) DO UPDATE SET
+                sql = EXCLUDED.sql,
+                custo = EXCLUDED.custo,
+                criado_em = EXCLUDED.criado_em
+        """), (client_id, chave, descricao, json.dumps(tabelas, ensure_ascii=False), sql, custo, datetime.now()))
+
+# --- importação dos arquivos JSON ----------------------------------------------
+
+def clientes_com_json() -> list[int]:
+    clientes = []
+    for caminho in glob.glob(os.path.join(DIRETORIO_JSON, "alertas_cli*.json")):
+        numero = os.path.basename(caminho)[len("alertas_cli"):-len(".json")]
+        if numero.isdigit():
+            clientes.append(int(numero))
+    return sorted(clientes)
+
+def _ler_json(caminho: str) -> list:
+    if os.path.exists(caminho):
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return []
+
+def importar_json(client_id: int) -> dict:
+    """
+    Copia alertas_cliXX.json e historico_alertas_cliXX.json para o
+    repositório, uma única vez por cliente (registrada em
+    alertas_importacoes na mesma transação).
+    Os alertas recebem ids novos; o histórico é ligado pelo nome.
+    """
+    alertas = _ler_json(os.path.join(DIRETORIO_JSON, f"alertas_cli{client_id:02d}.json"))
+    historico = _ler_json(os.path.join(DIRETORIO_JSON, f"historico_alertas_cli{client_id:02d}.json"))
+    importacoes = _tabela('alertas_importacoes')
+    with _cursor() as cursor:
+        cursor.execute(_sql(f"SELECT 1 FROM {importacoes} WHERE id_client = %s"), (client_id,))
+        if cursor.fetchone():
+            return {"alertas": 0, "historico": 0}
+
+        ids = {}
+        for alerta in alertas:
+            if alerta.get("nome") and alerta["nome"] not in ids:
+                ids[alerta["nome"]] = _inserir_alerta(cursor, client_id, alerta)
+
+        linhas = [
+            (client_id, ids.get(h.get('alerta')), datetime.fromisoformat(h['data']), h.get('alerta'),
+             h.get('status'), h.get('valor'), h.get('limite'), h.get('condicao'), h.get('tipo'))
+            for h in historico if h.get('data') and h.get('status')
+        ]
+        if linhas:
+            _inserir_varios(cursor, f"""
+                INSERT INTO {_tabela('alertas_historico')}
+                    (id_client, id_alerta, data, alerta, status, valor, limite, condicao, tipo)
+                VALUES %s
+            """, linhas)
+        cursor.execute(_sql(f"INSERT INTO {importacoes} (id_client, importado_em, alertas, historico) VALUES (%s, %s, %s, %s)"),
+                       (client_id, datetime.now(), len(ids), len(linhas)))
+    render_logger.info(f"📥 [ALERTAS] Cliente {client_id:02d}: {len(ids)} alertas e {len(linhas)} registros importados do JSON")
+    return {"alertas": len(ids), "historico": len(linhas)}
+
+def _importar_json_se_preciso(client_id: int) -> int:
+    """
+    Importação automática (verificada uma vez por cliente por processo);
+    retorna alertas importados. Uma importação que falhou é tentada de novo
+    na próxima leitura.
+    """
+    if client_id in _importados:
+        return 0
+    importados = 0
+    if os.path.exists(os.path.join(DIRETORIO_JSON, f"alertas_cli{client_id:02d}.json")):
+        try:
+            importados = importar_json(client_id)["alertas"]
+        except Exception as e:
+            render_logger.error(f"❌ [ALERTAS] Falha ao importar JSON do cliente {client_id:02d}: {e}")
+            return 0
+    _importados.add(client_id)
+    return importados
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Importa os alertas dos arquivos JSON para o repositório")
+    parser.add_argument("acao", choices=["importar", "retencao"])
+    parser.add_argument("id_client", nargs="?", type=int)
+    parser.add_argument("--todos", action="store_true", help="todos os clientes com arquivo JSON")
+    args = parser.parse_args()
+
+    if args.acao == "retencao":
+        print(f"{aplicar_retencao()} registros removidos")
+        sys.exit(0)
+
+    if args.todos:
+        ids = clientes_com_json()
+    elif args.id_client is not None:
+        ids = [args.id_client]
+    else:
+        parser.error("informe o id do cliente ou --todos")
+
+    for id_client in ids:
+        resultado = importar_json(id_client)
+        print(f"cliente {id_client:02d}: {resultado['alertas']} alertas, {resultado['historico']} registros de histórico")
@@ -0,0 +1,316 @@
+"""
+Histórico de valores dos KPIs (série temporal).
+
+Cada cliente tem uma tabela compacta _cliXX_kpi_snapshots
+(nome_kpi, capturado_em, valor) particionada por mês. O "_" inicial deixa a
+tabela e as partições fora do prefixo cliXX_ do cliente, então elas não
+aparecem no catálogo (listagens, treino do Vanna, exclusão de tabelas): consultas de um
+período só leem as partições do intervalo, e a retenção é um DROP da
+partição antiga em vez de DELETE. O AgendadorSnapshots grava, a cada
+KPI_SNAPSHOT_INTERVALO_MIN, o valor de cada KPI escalar calculado pelo
+motor_kpis (que reaproveita o cache enquanto as tabelas não mudam).
+
+serie_kpi() devolve a série com downsampling (date_trunc na granularidade
+escolhida ou automática para no máximo max_pontos pontos) e
+comparar_periodos() o crescimento entre o período atual e o anterior,
+sem reprocessar as tabelas de fatos.
+"""
+
+import os
+import sys
+import time
+import logging
+import threading
+from datetime import datetime, date, timedelta
+
+from psycopg2.extras import execute_values
+
+from armazenamento_clientes import schema_do_cliente, usa_schema_por_cliente
+from pool_conexoes import obter_conexao, em_segundo_plano
+
+# 🔧 [LOGGING] Configuração de logging para Render
+def setup_render_logging():
+    """Configura logging para ser visível no Render"""
+    logger = logging.getLogger('soliris_snapshots')
+    if not logger.handlers:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setLevel(logging.INFO)
+        formatter = logging.Formatter(
+            '%(asctime)s - SOLIRIS-SNAPSHOTS - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+        console_handler.setFormatter(formatter)
+        logger.addHandler(console_handler)
+        logger.setLevel(logging.INFO)
+    return logger
+
+# Inicializar logger
+render_logger = setup_render_logging()
+
+INTERVALO_SNAPSHOT_MIN = int(os.getenv("KPI_SNAPSHOT_INTERVALO_MIN", "60"))
+# Partições mais antigas que isso são removidas (0 = guarda tudo)
+RETENCAO_MESES = int(os.getenv("KPI_SNAPSHOT_RETENCAO_MESES", "24"))
+MAX_PONTOS = 200
+
+# granularidade → duração aproximada de um ponto (segundos)
+GRANULARIDADES = {
+    "hour": 3600,
+    "day": 86400,
+    "week": 7 * 86400,
+    "month": 30 * 86400,
+}
+AGREGACOES = {"avg": "AVG", "min": "MIN", "max": "MAX", "last": None}
+
+def tabela_snapshots(id_client: int) -> str:
+    return f"_cli{int(id_client):02d}_kpi_snapshots"
+
+def _regclass_snapshots(id_client: int) -> str:
+    # fora do prefixo, schema_da_tabela não reconhece o cliente pelo nome
+    schema = schema_do_cliente(id_client) if usa_schema_por_cliente() else "public"
+    return f'"{schema}"."{tabela_snapshots(id_client)}"'
+
+def _nome_particao(id_client: int, inicio: date) -> str:
+    return f"{tabela_snapshots(id_client)}_{inicio:%Y_%m}"
+
+def _inicio_mes(dia: date) -> date:
+    return dia.replace(day=1)
+
+def _somar_meses(dia: date, meses: int) -> date:
+    total = dia.year * 12 + dia.month - 1 + meses
+    return date(total // 12, total % 12 + 1, 1)
+
+def criar_tabela_snapshots(cursor, id_client: int, meses_a_frente: int = 1):
+    """Tabela particionada + partições do mês atual e dos próximos meses"""
+    tabela = tabela_snapshots(id_client)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS "{tabela}" (
+            nome_kpi TEXT NOT NULL,
+            capturado_em TIMESTAMPTZ NOT NULL,
+            valor DOUBLE PRECISION,
+            PRIMARY KEY (nome_kpi, capturado_em)
+        ) PARTITION BY RANGE (capturado_em)
+    """)
+    mes = _inicio_mes(date.today())
+    for i in range(meses_a_frente + 1):
+        inicio, fim = _somar_meses(mes, i), _somar_meses(mes, i + 1)
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS "{_nome_particao(id_client, inicio)}"
+                PARTITION OF "{tabela}" FOR VALUES FROM ('{inicio}') TO ('{fim}')
+        """)
+
+def aplicar_retencao(cursor, id_client: int) -> list[str]:
+    """Remove partições inteiras mais antigas que RETENCAO_MESES"""
+    if RETENCAO_MESES <= 0:
+        return []
+    limite = _somar_meses(_inicio_mes(date.today()), -RETENCAO_MESES)
+    cursor.execute("""
+        SELECT c.relname
+          FROM pg_inherits i
+          JOIN pg_class c ON c.oid = i.inhrelid
+         WHERE i.inhparent = to_regclass(%s)
+    """, (_regclass_snapshots(id_client),))
+    removidas = []
+    for (particao,) in cursor.fetchall():
+        try:
+            ano, mes = particao.rsplit("_", 2)[-2:]
+            inicio = date(int(ano), int(mes), 1)
+        except ValueError:
+            continue
+        if inicio < limite:
+            cursor.execute(f'DROP TABLE IF EXISTS "{particao}"')
+            removidas.append(particao)
+    return removidas
+
+def registrar_snapshot(id_client: int, capturado_em: datetime = None) -> dict:
+    """
+    Calcula os KPIs do cliente (motor_kpis) e grava o valor de cada KPI
+    escalar numérico. Retorna {gravados, ignorados, segundos}.
+    """
+    from motor_kpis import calcular_kpis
+
+    inicio = time.perf_counter()
+    capturado_em = capturado_em or datetime.now().astimezone()
+    resultado = calcular_kpis(id_client)
+    linhas = [
+        (k["nome"], capturado_em, float(k["valor"]))
+        for k in resultado["kpis"]
+        if k["status"] == "OK" and k["tipo"] == "escalar" and isinstance(k["valor"], (int, float))
+    ]
+
+    conn = obter_conexao(id_client)
+    cursor = conn.cursor()
+    try:
+        criar_tabela_snapshots(cursor, id_client)
+        if linhas:
+            execute_values(cursor, f"""
+                INSERT INTO "{tabela_snapshots(id_client)}" (nome_kpi, capturado_em, valor)
+                VALUES %s ON CONFLICT DO NOTHING
+            """, linhas)
+        removidas = aplicar_retencao(cursor, id_client)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+    segundos = time.perf_counter() - inicio
+    render_logger.info(
+        f"📸 [SNAPSHOT] Cliente {id_client:02d}: {len(linhas)} valores gravados "
+        f"({len(resultado['kpis']) - len(linhas)} ignorados) em {segundos:.2f}s"
+        + (f", {len(removidas)} partições antigas removidas" if removidas else "")
+    )
+    return {"gravados": len(linhas), "ignorados": len(resultado["kpis"]) - len(linhas),
+            "particoes_removidas": removidas, "segundos": round(segundos, 3)}
+
+# --- consulta ------------------------------------------------------------------
+
+def escolher_granularidade(inicio: datetime, fim: datetime, max_pontos: int = MAX_PONTOS) -> str:
+    """Menor granularidade que mantém a série em até max_pontos pontos"""
+    duracao = max((fim - inicio).total_seconds(), 1)
+    for granularidade, segundos in GRANULARIDADES.items():
+        if duracao / segundos <= max_pontos:
+            return granularidade
+    return "month"
+
+def serie_kpi(id_client: int, nome_kpi: str, inicio: datetime = None, fim: datetime = None,
+              granularidade: str = "auto", agregacao: str = "avg", max_pontos: int = MAX_PONTOS) -> list[dict]:
+    """
+    Série temporal do KPI: [{periodo, valor, amostras}, ...] em ordem.
+    granularidade: hour | day | week | month | auto
+    agregacao: avg | min | max | last (valor do último snapshot do período)
+    """
+    fim = fim or datetime.now().astimezone()
+    inicio = inicio or fim - timedelta(days=90)
+    if granularidade == "auto":
+        granularidade = escolher_granularidade(inicio, fim, max_pontos)
+    if granularidade not in GRANULARIDADES:
+        raise ValueError(f"Granularidade inválida: {granularidade}")
+    if agregacao not in AGREGACOES:
+        raise ValueError(f"Agregação inválida: {agregacao}")
+
+    funcao = AGREGACOES[agregacao]
+    expressao = (f"{funcao}(valor)" if funcao
+                 else "(array_agg(valor ORDER BY capturado_em DESC))[1]")
+    conn = obter_conexao(id_client)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (_regclass_snapshots(id_client),))
+        if not cursor.fetchone()[0]:
+            return []
+        # o filtro em capturado_em limita a leitura às partições do intervalo
+        cursor.execute(f"""
+            SELECT date_trunc(%s, capturado_em) AS periodo, {expressao}, COUNT(*)
+              FROM "{tabela_snapshots(id_client)}"
+             WHERE nome_kpi = %s AND capturado_em >= %s AND capturado_em < %s
+             GROUP BY 1
+             ORDER BY 1
+        """, (granularidade, nome_kpi, inicio, fim))
+        return [{"periodo": p, "valor": v, "amostras": n} for p, v, n in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+
+def comparar_periodos(id_client: int, nome_kpi: str, dias: int = 30) -> dict:
+    """
+    Média do KPI nos últimos `dias` contra os `dias` anteriores:
+    {atual, anterior, crescimento_pct}
+    """
+    fim = datetime.now().astimezone()
+    meio = fim - timedelta(days=dias)
+    atual = serie_kpi(id_client, nome_kpi, meio, fim, "month", max_pontos=1)
+    anterior = serie_kpi(id_client, nome_kpi, meio - timedelta(days=dias), meio, "month", max_pontos=1)
+
+    def _media(pontos):
+        total = sum(p["amostras"] for p in pontos)
+        return sum(p["valor"] * p["amostras"] for p in pontos) / total if total else None
+
+    valor_atual, valor_anterior = _media(atual), _media(anterior)
+    crescimento = None
+    if valor_atual is not None and valor_anterior:
+        crescimento = round((valor_atual - valor_anterior) / abs(valor_anterior) * 100, 2)
+    return {"atual": valor_atual, "anterior": valor_anterior, "crescimento_pct": crescimento}
+
+# --- agendador -----------------------------------------------------------------
+
+def clientes_com_kpis() -> list[int]:
+    """Clientes que têm tabela de definições de KPI (em qualquer schema)"""
+    conn = obter_conexao()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT DISTINCT substring(tablename FROM '^cli(\\d+)_')::int
+              FROM pg_tables
+             WHERE tablename ~ '^cli\\d+_kpis_definicoes$'
+             ORDER BY 1
+        """)
+        return [r[0] for r in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+
+def _ultimo_snapshot(id_client: int):
+    conn = obter_conexao(id_client)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (_regclass_snapshots(id_client),))
+        if not cursor.fetchone()[0]:
+            return None
+        cursor.execute(f'SELECT MAX(capturado_em) FROM "{tabela_snapshots(id_client)}"')
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+        conn.close()
+
+class AgendadorSnapshots(threading.Thread):
+    """Grava um snapshot por cliente a cada INTERVALO_SNAPSHOT_MIN"""
+
+    def __init__(self, intervalo_min: int = INTERVALO_SNAPSHOT_MIN):
+        super().__init__(daemon=True, name="kpis-snapshots")
+        self.intervalo_min = intervalo_min
+        self._parar = threading.Event()
+
+    def parar(self):
+        self._parar.set()
+
+    def executar_ciclo(self) -> dict:
+        resultados = {}
+        agora = datetime.now().astimezone()
+        for id_client in clientes_com_kpis():
+            try:
+                # outro processo (ou reinício recente) já gravou neste intervalo
+                ultimo = _ultimo_snapshot(id_client)
+                if ultimo and agora - ultimo < timedelta(minutes=self.intervalo_min) * 0.9:
+                    continue
+                resultados[id_client] = registrar_snapshot(id_client, agora)
+            except Exception as e:
+                render_logger.error(f"❌ [SNAPSHOT] Cliente {id_client:02d}: {e}")
+                resultados[id_client] = {"erro": str(e)}
+        return resultados
+
+    def run(self):
+        render_logger.info(f"⏰ [SNAPSHOT] Agendador iniciado (a cada {self.intervalo_min} min)")
+        while not self._parar.is_set():
+            try:
+                with em_segundo_plano():
+                    self.executar_ciclo()
+            except Exception as e:
+                render_logger.error(f"❌ [SNAPSHOT] Ciclo do agendador falhou: {e}")
+            self._parar.wait(self.intervalo_min * 60)
+
+_agendador = None
+_agendador_lock = threading.Lock()
+
+def iniciar_agendador() -> AgendadorSnapshots:
+    """Inicia (uma vez por processo) o agendador de snapshots"""
+    global _agendador
+    with _agendador_lock:
+        if _agendador is None or not _agendador.is_alive():
+            _agendador = AgendadorSnapshots()
+            _agendador.start()
+    return _agendador
+
+if __name__ == "__main__":
+    # worker separado: python src/snapshots_kpis.py
+    AgendadorSnapshots().run()
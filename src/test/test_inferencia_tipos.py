@@ -0,0 +1,89 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from inferencia_tipos import inferir_tipo_coluna, aplicar_tipos, LIMITE_BIGINT
+
+
+def tipo(*valores):
+    return inferir_tipo_coluna(pd.Series(list(valores), dtype=object))
+
+
+# --- inteiros --------------------------------------------------------------
+
+def test_inteiros_pequenos_sao_bigint():
+    assert tipo("1", "-2", "+30")["sql"] == "BIGINT"
+
+def test_limite_bigint_com_19_digitos():
+    assert tipo(str(LIMITE_BIGINT))["sql"] == "BIGINT"
+    assert tipo(str(LIMITE_BIGINT + 1))["sql"] == "NUMERIC"
+
+def test_19_digitos_misturados_com_valores_curtos():
+    # a comparação de strings não pode usar "95" como máximo
+    assert tipo("95", "1000000000000000000")["sql"] == "BIGINT"
+    assert tipo("95", str(LIMITE_BIGINT + 1))["sql"] == "NUMERIC"
+
+def test_limite_negativo():
+    assert tipo(str(-LIMITE_BIGINT - 1), "1")["sql"] == "BIGINT"
+    assert tipo(str(-LIMITE_BIGINT - 2))["sql"] == "NUMERIC"
+
+def test_mais_de_19_digitos_e_numeric():
+    assert tipo("12345678901234567890")["sql"] == "NUMERIC"
+
+def test_zeros_a_esquerda_ficam_texto():
+    assert tipo("01310100", "20040002")["sql"] == "TEXT"
+    assert tipo("-0123")["sql"] == "TEXT"
+
+def test_zero_sozinho_continua_inteiro():
+    assert tipo("0", "10")["sql"] == "BIGINT"
+
+
+# --- datas -----------------------------------------------------------------
+
+@pytest.mark.parametrize("valores, sql, formato", [
+    (["2024-01-31"], "DATE", None),
+    (["2024-01-31 13:45:00"], "TIMESTAMP", None),
+    (["2024-01-31 13:45:00.123"], "TIMESTAMP", None),
+    (["2024-01-31 13:45"], "TIMESTAMP", None),
+    (["2024-01-31T13:45:00"], "TIMESTAMP", None),
+    (["2024-01-31T13:45:00Z", "2024-01-31T13:45:00.5-03:00"], "TIMESTAMPTZ", None),
+    (["31/01/2024"], "DATE", "%d/%m/%Y"),
+    (["12/31/2024"], "DATE", "%m/%d/%Y"),
+    (["31/01/2024 13:45:00"], "TIMESTAMP", "%d/%m/%Y %H:%M:%S"),
+    (["12/31/2024 13:45:00"], "TIMESTAMP", "%m/%d/%Y %H:%M:%S"),
+    (["31/01/2024 13:45"], "TIMESTAMP", "%d/%m/%Y %H:%M"),
+    (["12/31/2024 13:45"], "TIMESTAMP", "%m/%d/%Y %H:%M"),
+    (["31-01-2024"], "DATE", "%d-%m-%Y"),
+])
+def test_formatos_de_data(valores, sql, formato):
+    resultado = tipo(*valores)
+    assert resultado["sql"] == sql
+    assert resultado["formato"] == formato
+
+def test_formato_com_hora_a_meia_noite_continua_timestamp():
+    assert tipo("31/01/2024 00:00:00")["sql"] == "TIMESTAMP"
+
+def test_data_impossivel_nao_vira_data():
+    assert tipo("31/13/2024", "12/31/2024")["sql"] == "TEXT"
+
+
+# --- aplicar_tipos -----------------------------------------------------------
+
+def test_aplicar_tipos_converte_para_iso():
+    tipos = {"d": tipo("31/01/2024")}
+    chunk = aplicar_tipos(pd.DataFrame({"d": ["31/01/2024", "", None]}), tipos)
+    assert chunk["d"].iloc[0] == "2024-01-31"
+    assert chunk["d"].iloc[1:].isna().all()
+
+def test_aplicar_tipos_rejeita_data_invalida():
+    tipos = {"d": tipo("31/01/2024")}
+    with pytest.raises(ValueError, match="não corresponde ao formato"):
+        aplicar_tipos(pd.DataFrame({"d": ["31/01/2024", "2024-02-01"]}), tipos)
+
+def test_aplicar_tipos_ignora_colunas_iso():
+    tipos = {"d": tipo("2024-01-31"), "n": tipo("1")}
+    chunk = pd.DataFrame({"d": ["2024-01-31"], "n": ["1"]})
+    assert aplicar_tipos(chunk.copy(), tipos).equals(chunk)
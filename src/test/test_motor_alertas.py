@@ -0,0 +1,84 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from motor_alertas import planejar_consultas, _distribuir
+
+
+def alerta(id_, tabela, coluna, tipo, **extra):
+    return {"id": id_, "tabela": tabela, "coluna": coluna, "tipo": tipo, **extra}
+
+
+def test_alertas_da_mesma_tabela_viram_uma_consulta():
+    alertas = [
+        alerta(1, "cli01_vendas", "valor", "Agregação"),
+        alerta(2, "cli01_vendas", "valor", "Média"),
+        alerta(3, "cli01_vendas", "status", "Valor Simples"),
+    ]
+    consultas = planejar_consultas(alertas)
+    assert len(consultas) == 1
+    consulta = consultas[0]
+    assert consulta["tabela"] == "cli01_vendas"
+    assert consulta["sql"] == (
+        'WITH ultima AS (SELECT "status" FROM "cli01_vendas" ORDER BY "id" DESC LIMIT 1) '
+        'SELECT COUNT("valor") AS "_a0", AVG("valor") AS "_a1", '
+        '(SELECT "status" FROM ultima) AS "_u0", '
+        'EXISTS (SELECT 1 FROM ultima) AS "_tem_ultima" FROM "cli01_vendas"'
+    )
+    assert [(a["id"], apelido) for a, apelido in consulta["alertas"]] == [(1, "_a0"), (2, "_a1"), (3, "_u0")]
+
+def test_expressoes_repetidas_sao_calculadas_uma_vez():
+    consultas = planejar_consultas([
+        alerta(1, "cli01_vendas", "valor", "Agregação"),
+        alerta(2, "cli01_vendas", "valor", "Agregação"),
+    ])
+    assert consultas[0]["sql"] == 'SELECT COUNT("valor") AS "_a0" FROM "cli01_vendas"'
+    assert [apelido for _, apelido in consultas[0]["alertas"]] == ["_a0", "_a0"]
+
+def test_so_valor_simples_nao_usa_cte():
+    consultas = planejar_consultas([
+        alerta(1, "cli01_vendas", "status", "Valor Simples"),
+        alerta(2, "cli01_vendas", "valor", "Valor Simples"),
+    ])
+    assert consultas[0]["sql"] == (
+        'SELECT "status" AS "_u0", "valor" AS "_u1" FROM "cli01_vendas" ORDER BY "id" DESC LIMIT 1'
+    )
+
+def test_tabelas_diferentes_nao_sao_fundidas():
+    consultas = planejar_consultas([
+        alerta(1, "cli01_vendas", "valor", "Agregação"),
+        alerta(2, "cli01_pedidos", "valor", "Agregação"),
+    ])
+    assert [c["sql"] for c in consultas] == [
+        'SELECT COUNT("valor") FROM "cli01_vendas"',
+        'SELECT COUNT("valor") FROM "cli01_pedidos"',
+    ]
+    assert all(c["alertas"][0][1] is None for c in consultas)
+
+def test_sql_personalizado_fica_em_consulta_propria():
+    personalizado = alerta(2, "cli01_vendas", "valor", "Personalizado IA",
+                           sql_personalizado="SELECT SUM(valor) FROM cli01_vendas")
+    consultas = planejar_consultas([
+        alerta(1, "cli01_vendas", "valor", "Agregação"),
+        personalizado,
+        alerta(3, "cli01_vendas", "valor", "Média"),
+    ])
+    assert len(consultas) == 2
+    assert consultas[0]["sql"] == "SELECT SUM(valor) FROM cli01_vendas"
+    assert consultas[0]["alertas"] == [(personalizado, None)]
+    assert consultas[1]["sql"] == 'SELECT COUNT("valor") AS "_a0", AVG("valor") AS "_a1" FROM "cli01_vendas"'
+
+def test_consulta_combinada_usa_o_maior_timeout():
+    consultas = planejar_consultas([
+        alerta(1, "cli01_vendas", "valor", "Agregação", timeout_ms=1000),
+        alerta(2, "cli01_vendas", "valor", "Média", timeout_ms=9000),
+    ])
+    assert consultas[0]["timeout_ms"] == 9000
+
+def test_distribuir_tabela_vazia_vale_zero_para_valor_simples():
+    consulta = planejar_consultas([
+        alerta(1, "cli01_vendas", "valor", "Agregação"),
+        alerta(2, "cli01_vendas", "status", "Valor Simples"),
+    ])[0]
+    linha = {"_a0": 0, "_u0": None, "_tem_ultima": False}
+    assert _distribuir(consulta, linha) == [0, 0]
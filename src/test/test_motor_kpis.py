@@ -0,0 +1,98 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from motor_kpis import normalizar_sql, _separar_from, decompor_agregacao, planejar_consultas
+
+
+def kpi(nome, formula, **extra):
+    return {"nome": nome, "formula_sql": formula, **extra}
+
+
+# --- normalizar_sql ----------------------------------------------------------
+
+def test_normalizar_colapsa_espacos_e_remove_ponto_e_virgula():
+    assert normalizar_sql("SELECT  COUNT(*)\n\tFROM   vendas ;") == "SELECT COUNT(*) FROM vendas"
+
+def test_normalizar_remove_comentarios():
+    sql = "SELECT COUNT(*) -- total\nFROM vendas /* todas\nas linhas */ WHERE ativo"
+    assert normalizar_sql(sql) == "SELECT COUNT(*) FROM vendas WHERE ativo"
+
+def test_normalizar_preserva_literais():
+    sql = "SELECT COUNT(*) FROM vendas WHERE obs = 'a  -- b'"
+    assert normalizar_sql(sql) == sql
+
+
+# --- _separar_from -------------------------------------------------------------
+
+def test_separar_from_ignora_from_entre_parenteses():
+    sql = "SELECT EXTRACT(YEAR FROM data) AS ano FROM vendas"
+    assert _separar_from(sql) == ("EXTRACT(YEAR FROM data) AS ano", "vendas")
+
+def test_separar_from_ignora_from_em_literal():
+    sql = "SELECT COUNT(*) FROM vendas WHERE origem = 'vindo FROM site'"
+    assert _separar_from(sql) == ("COUNT(*)", "vendas WHERE origem = 'vindo FROM site'")
+
+
+# --- decompor_agregacao --------------------------------------------------------
+
+def test_decompor_agregacoes_simples():
+    sql = "SELECT SUM(valor) AS total, COUNT(*) FROM vendas WHERE ativo"
+    assert decompor_agregacao(sql) == ("vendas WHERE ativo", [("SUM(valor)", "total"), ("COUNT(*)", "count")])
+
+def test_decompor_recusa_subconsulta():
+    assert decompor_agregacao("SELECT COUNT(*) FROM (SELECT * FROM vendas) v") is None
+    assert decompor_agregacao("SELECT COUNT(*) FROM vendas WHERE id IN (SELECT id FROM pedidos)") is None
+
+def test_decompor_recusa_group_by_e_colunas_simples():
+    assert decompor_agregacao("SELECT regiao, SUM(valor) AS total FROM vendas GROUP BY regiao") is None
+    assert decompor_agregacao("SELECT valor FROM vendas") is None
+
+def test_decompor_recusa_alias_sem_as():
+    assert decompor_agregacao("SELECT SUM(valor) total FROM vendas") is None
+
+
+# --- planejar_consultas --------------------------------------------------------
+
+def test_kpis_com_mesma_base_sao_fundidos():
+    consultas = planejar_consultas([
+        kpi("Receita", "SELECT SUM(valor) AS receita FROM vendas WHERE ativo"),
+        kpi("Pedidos", "SELECT COUNT(*) AS pedidos FROM vendas  WHERE ativo;"),
+    ])
+    assert len(consultas) == 1
+    consulta = consultas[0]
+    assert consulta["sql"] == 'SELECT SUM(valor) AS "_k0", COUNT(*) AS "_k1" FROM vendas WHERE ativo'
+    assert consulta["kpis"] == [("Receita", [(0, "receita")]), ("Pedidos", [(1, "pedidos")])]
+
+def test_bases_diferentes_nao_sao_fundidas():
+    consultas = planejar_consultas([
+        kpi("Receita", "SELECT SUM(valor) AS receita FROM vendas"),
+        kpi("Clientes", "SELECT COUNT(*) AS clientes FROM clientes"),
+    ])
+    assert len(consultas) == 2
+
+def test_formula_nao_decomponivel_fica_sozinha():
+    agrupada = "SELECT regiao, SUM(valor) AS total FROM vendas GROUP BY regiao"
+    consultas = planejar_consultas([
+        kpi("Receita", "SELECT SUM(valor) AS receita FROM vendas"),
+        kpi("Por região", agrupada),
+    ])
+    assert len(consultas) == 2
+    sozinha = next(c for c in consultas if "base" not in c)
+    assert sozinha["sql"] == agrupada
+    assert sozinha["kpis"] == [("Por região", None)]
+
+def test_formulas_identicas_rodam_uma_vez():
+    consultas = planejar_consultas([
+        kpi("A", "SELECT regiao FROM vendas GROUP BY regiao"),
+        kpi("B", "SELECT regiao  FROM vendas GROUP BY regiao;"),
+    ])
+    assert len(consultas) == 1
+    assert [nome for nome, _ in consultas[0]["kpis"]] == ["A", "B"]
+
+def test_consulta_fundida_usa_o_maior_timeout():
+    consultas = planejar_consultas([
+        kpi("Receita", "SELECT SUM(valor) AS receita FROM vendas", timeout_ms=30000),
+        kpi("Pedidos", "SELECT COUNT(*) AS pedidos FROM vendas"),
+    ], timeout_ms=1000)
+    assert consultas[0]["timeout_ms"] == 30000
@@ -0,0 +1,244 @@
+"""
+Importação com troca atômica de tabela (staging + rename).
+
+O CSV é carregado em uma tabela separada (_novo_cliXX_..., fora do prefixo
+do cliente, então não aparece no catálogo, nas listas de tabelas nem no
+treinamento do Vanna), recebe os índices e grants da tabela atual e ANALYZE
+e só então substitui a tabela do cliente com renames dentro de uma única
+transação. Consultas do chat e alertas nunca enxergam uma tabela pela
+metade, e qualquer falha (carga ou troca) remove a staging e deixa a tabela
+original intacta.
+
+WAL: por padrão a staging já nasce LOGGED. Carregar UNLOGGED e depois
+rodar SET LOGGED reescreveria a tabela inteira no WAL, custando mais do que
+gravar direto. IMPORT_MANTER_UNLOGGED=1 carrega e mantém a tabela UNLOGGED
+(sem WAL nenhum, mas ela é esvaziada após crash do servidor e não vai para
+réplicas).
+"""
+
+import os
+import re
+import sys
+import time
+import logging
+
+from carga_copy import copiar_chunks
+from catalogo_schema import invalidar_cache_tabela, id_client_da_tabela
+from armazenamento_clientes import nome_regclass
+
+# 🔧 [LOGGING] Configuração de logging para Render
+def setup_render_logging():
+    """Configura logging para ser visível no Render"""
+    logger = logging.getLogger('soliris_troca_atomica')
+    if not logger.handlers:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setLevel(logging.INFO)
+        formatter = logging.Formatter(
+            '%(asctime)s - SOLIRIS-TROCA - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+        console_handler.setFormatter(formatter)
+        logger.addHandler(console_handler)
+        logger.setLevel(logging.INFO)
+    return logger
+
+# Inicializar logger
+render_logger = setup_render_logging()
+
+# Se "1", a carga e a tabela final são UNLOGGED (mais rápido, mas é truncada após crash do servidor)
+MANTER_UNLOGGED = os.getenv("IMPORT_MANTER_UNLOGGED", "0") == "1"
+# Espera máxima pelo lock exclusivo da troca, e quantas vezes tentar
+LOCK_TIMEOUT = os.getenv("IMPORT_LOCK_TIMEOUT", "5s")
+TENTATIVAS_TROCA = 3
+
+def _nome(base: str, sufixo: str) -> str:
+    """Nome derivado respeitando o limite de 63 caracteres do Postgres"""
+    return f"{base[:63 - len(sufixo)]}{sufixo}"
+
+def nome_staging(nome_tabela: str) -> str:
+    """Staging fora do prefixo cliXX_ (invisível para o catálogo do cliente)"""
+    return f"_novo_{nome_tabela}"[:63]
+
+def _indices_existentes(cursor, nome_tabela: str) -> list[dict]:
+    """Índices da tabela atual: nome, DDL, colunas e constraint (PK/UNIQUE) dona do índice"""
+    cursor.execute("""
+        SELECT c.relname, pg_get_indexdef(i.indexrelid), con.conname, con.contype,
+               ARRAY(SELECT a.attname
+                       FROM unnest(i.indkey) WITH ORDINALITY AS k(attnum, ordem)
+                       JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+                      ORDER BY k.ordem),
+               i.indexprs IS NULL AND i.indpred IS NULL AND NOT i.indisunique
+          FROM pg_index i
+          JOIN pg_class c ON c.oid = i.indexrelid
+          LEFT JOIN pg_constraint con ON con.conindid = i.indexrelid AND con.contype IN ('p', 'u')
+         WHERE i.indrelid = to_regclass(%s)
+         ORDER BY c.relname
+    """, (nome_regclass(nome_tabela),))
+    return [
+        {"nome": nome, "ddl": ddl, "constraint": constraint, "tipo": tipo, "colunas": list(colunas), "simples": simples}
+        for nome, ddl, constraint, tipo, colunas, simples in cursor.fetchall()
+    ]
+
+def _copiar_indices(cursor, staging: str, nome_tabela: str, chaves: list[list[str]]) -> list[dict]:
+    """
+    Cria na staging os índices da chave sugerida e todos os índices da tabela
+    atual (inclusive PK/UNIQUE e o índice único do upsert incremental), com
+    nomes temporários; trocar_tabelas devolve os nomes originais.
+    Um índice que não cabe nos dados novos (coluna removida, repetições em
+    índice único) é registrado no log e ignorado.
+    """
+    criados = []
+    nomes_chave = [_nome(nome_tabela, f"_idx{i}") for i in range(len(chaves))]
+    for i, cols in enumerate(chaves):
+        temporario = _nome(staging, f"_idx{i}")
+        lista = ", ".join(f'"{c}"' for c in cols)
+        cursor.execute(f'CREATE INDEX "{temporario}" ON "{staging}" ({lista})')
+        criados.append({"temporario": temporario, "nome": nomes_chave[i], "constraint": None})
+
+    for j, indice in enumerate(_indices_existentes(cursor, nome_tabela)):
+        # índices da chave recriados acima (importação atômica anterior ou mesmo conjunto de colunas)
+        if indice["nome"] in nomes_chave or (indice["simples"] and indice["colunas"] in chaves):
+            continue
+        temporario = _nome(staging, f"_r{j}")
+        match = re.match(r"^(CREATE (?:UNIQUE )?INDEX) .+? ON (?:ONLY )?.+? (USING .*)$", indice["ddl"], re.DOTALL)
+        if not match:
+            render_logger.warning(f"⚠️ [TROCA] Índice {indice['nome']} não reconhecido, ignorado: {indice['ddl']}")
+            continue
+        cursor.execute("SAVEPOINT copiar_indice")
+        try:
+            cursor.execute(f'{match.group(1)} "{temporario}" ON "{staging}" {match.group(2)}')
+            if indice["constraint"]:
+                tipo = "PRIMARY KEY" if indice["tipo"] == "p" else "UNIQUE"
+                cursor.execute(f'ALTER TABLE "{staging}" ADD CONSTRAINT "{temporario}" {tipo} USING INDEX "{temporario}"')
+            cursor.execute("RELEASE SAVEPOINT copiar_indice")
+        except Exception as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT copiar_indice")
+            render_logger.warning(f"⚠️ [TROCA] Índice {indice['nome']} não recriado em {nome_tabela}: {str(e).strip()}")
+            continue
+        criados.append({"temporario": temporario, "nome": indice["constraint"] or indice["nome"],
+                        "constraint": indice["constraint"]})
+    return criados
+
+def _copiar_grants(cursor, staging: str, nome_tabela: str) -> int:
+    """Repete na staging os privilégios concedidos na tabela atual (exceto os do dono)"""
+    cursor.execute("""
+        SELECT CASE WHEN a.grantee = 0 THEN 'PUBLIC' ELSE quote_ident(pg_get_userbyid(a.grantee)) END,
+               a.privilege_type
+          FROM pg_class c, aclexplode(c.relacl) a
+         WHERE c.oid = to_regclass(%s) AND a.grantee <> c.relowner
+    """, (nome_regclass(nome_tabela),))
+    grants = cursor.fetchall()
+    for grantee, privilegio in grants:
+        cursor.execute(f'GRANT {privilegio} ON "{staging}" TO {grantee}')
+    return len(grants)
+
+def trocar_tabelas(conn, staging: str, nome_tabela: str, indices: list[dict]):
+    """
+    Substitui nome_tabela por staging em uma única transação:
+    renomeia a atual, promove a staging, remove a antiga e devolve aos
+    índices (e constraints PK/UNIQUE) os nomes originais.
+    Views materializadas de KPI sobre a tabela são removidas na mesma
+    transação e recriadas depois pelo agendador (kpis_materializados).
+    """
+    from kpis_materializados import remover_views_dependentes
+
+    antiga = _nome(nome_tabela, "__antiga")
+    for tentativa in range(1, TENTATIVAS_TROCA + 1):
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+            # views de KPI impediriam o DROP da antiga; o agendador as recria
+            remover_views_dependentes(cursor, nome_tabela)
+            cursor.execute(f'ALTER TABLE IF EXISTS "{nome_tabela}" RENAME TO "{antiga}"')
+            cursor.execute(f'ALTER TABLE "{staging}" RENAME TO "{nome_tabela}"')
+            cursor.execute(f'DROP TABLE IF EXISTS "{antiga}"')
+            for indice in indices:
+                if indice["constraint"]:
+                    # renomear a constraint renomeia o índice dela
+                    cursor.execute(
+                        f'ALTER TABLE "{nome_tabela}" RENAME CONSTRAINT "{indice["temporario"]}" TO "{indice["nome"]}"'
+                    )
+                else:
+                    cursor.execute(f'ALTER INDEX "{indice["temporario"]}" RENAME TO "{indice["nome"]}"')
+            conn.commit()
+            return
+        except Exception as e:
+            conn.rollback()
+            # 55P03 = lock_not_available: leitores longos segurando a tabela
+            if getattr(e, "pgcode", None) == "55P03" and tentativa < TENTATIVAS_TROCA:
+                render_logger.warning(f"⏳ [TROCA] Lock ocupado em {nome_tabela}, tentativa {tentativa}")
+                time.sleep(tentativa)
+                continue
+            raise
+        finally:
+            cursor.close()
+
+def importar_csv_atomico(caminho_csv: str, nome_tabela: str, linhas_por_chunk: int = None,
+                         monitor=None) -> dict:
+    """
+    Carrega o CSV em uma staging, cria índices nas colunas de chave sugeridas
+    e os índices/grants da tabela atual, roda ANALYZE e troca atomicamente
+    com a tabela do cliente.
+    """
+    from import_csv import conectar_banco, ler_amostra_csv, ler_csv_em_chunks, sugestao_pk
+    from inferencia_tipos import inferir_tipos, aplicar_tipos, colunas_ddl
+
+    inicio = time.perf_counter()
+    amostra = ler_amostra_csv(caminho_csv)
+    tipos = inferir_tipos(amostra)
+    colunas = list(amostra.columns)
+    del amostra
+
+    staging = nome_staging(nome_tabela)
+    persistencia = "UNLOGGED " if MANTER_UNLOGGED else ""
+    conn = conectar_banco(id_client_da_tabela(nome_tabela))
+    try:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f'DROP TABLE IF EXISTS "{staging}"')
+            cursor.execute(
+                f'CREATE {persistencia}TABLE "{staging}" (\n  ' + ",\n  ".join(colunas_ddl(tipos)) + "\n)"
+            )
+            conn.commit()
+            render_logger.info(f"🧱 [TROCA] Staging {persistencia or 'LOGGED '}criada: {staging}")
+
+            chunks = (aplicar_tipos(c, tipos) for c in ler_csv_em_chunks(caminho_csv, linhas_por_chunk, monitor))
+            carga = copiar_chunks(conn, staging, chunks,
+                                  ao_carregar=monitor.ao_carregar_linhas if monitor else None)
+            if monitor:
+                monitor.mudar_fase("troca")
+
+            pk = [c for c in sugestao_pk(nome_tabela) if c in colunas]
+            indices = _copiar_indices(cursor, staging, nome_tabela, [pk] if pk else [])
+            _copiar_grants(cursor, staging, nome_tabela)
+            cursor.execute(f'ANALYZE "{staging}"')
+            conn.commit()
+
+            trocar_tabelas(conn, staging, nome_tabela, indices)
+        except Exception:
+            # carga ou troca falhou: a tabela original segue intacta, a staging sai
+            cursor.close()
+            try:
+                conn.rollback()
+                cursor = conn.cursor()
+                cursor.execute(f'DROP TABLE IF EXISTS "{staging}"')
+                conn.commit()
+            except Exception as e:
+                # conexão quebrada, por exemplo: o erro original é o que interessa
+                render_logger.warning(f"⚠️ [TROCA] Não foi possível remover a staging {staging}: {e}")
+            raise
+        finally:
+            cursor.close()
+    finally:
+        conn.close()
+
+    invalidar_cache_tabela(nome_tabela)
+    segundos = max(time.perf_counter() - inicio, 1e-9)
+    render_logger.info(f"🔀 [TROCA] {nome_tabela} substituída atomicamente ({carga['linhas']} linhas, {segundos:.2f}s)")
+    return {
+        **carga,
+        "tabela": nome_tabela,
+        "modo": "atomico",
+        "segundos": round(segundos, 3),
+        "linhas_por_segundo": round(carga["linhas"] / segundos, 1),
+    }
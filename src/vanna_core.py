@@ -11,8 +11,9 @@ import pandas as pd
 
 from vanna.remote import VannaDefault
  # ou ajuste conforme o import correto
-import psycopg2
 from gerarDDL import gerar_ddl_para_cliente
+from pool_conexoes import obter_conexao
+from armazenamento_clientes import opcoes_conexao
 
 from gerar_schema_cliente import gerar_plan_treinamento
 from kpis_Setup import (
@@ -267,13 +268,7 @@ def obter_id_client_por_email(email: str) -> int:
     logging.info("Buscando ID do cliente para o e-mail: %s", email)
     render_logger.info(f"🔍 [DB] Buscando ID do cliente para email: {email}")
     
-    conn = psycopg2.connect(
-        host=os.getenv("DB_HOST"),
-        port=os.getenv("DB_PORT"),
-        dbname=os.getenv("DB_NAME"),
-        user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD")
-    )
+    conn = obter_conexao()
     cur = conn.cursor()
     cur.execute("SELECT id FROM usuarios WHERE email = %s;", (email,))
     row = cur.fetchone()
@@ -313,18 +308,22 @@ def treinar_com_plan(id_client: int, vn: VannaDefault):
 
 def treinar_com_kpis(id_client: int, vn: VannaDefault):
     logging.info("Treinando Vanna com definições de KPI...")
-    conn = conectar_postgres()
+    conn = conectar_postgres(id_client)
     cur = conn.cursor()
     table = f"cli{int(id_client):02d}_kpis_definicoes"
     cur.execute(
         f"SELECT nome_kpi, descricao, formula_sql FROM {table} WHERE id_client = %s",
         (id_client,)
     )
+    # KPIs materializados: o chat aprende a ler a view pré-calculada
+    from kpis_materializados import views_ativas, view_vigente, sql_leitura
+    views = views_ativas(id_client)
     for nome, desc, formula in cur.fetchall():
         logging.info("\tKPI '%s': %s", nome, desc)
+        view = view_vigente(views, nome, formula)
         vn.train(
             question=f"O KPI '{nome}' é definido como: {desc}",
-            sql=formula
+            sql=sql_leitura(view) if view else formula
         )
     cur.close()
     conn.close()
@@ -346,7 +345,8 @@ def setup_treinamento_cliente(id_client: int) -> VannaDefault:
         port=os.getenv("DB_PORT"),
         dbname=os.getenv("DB_NAME"),
         user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD")
+        password=os.getenv("DB_PASSWORD"),
+        **opcoes_conexao(id_client)
     )
     render_logger.info("✅ [SETUP] Conexão com PostgreSQL estabelecida")
 
@@ -0,0 +1,217 @@
+"""
+Visão geral / integridade das tabelas de um cliente via estatísticas do catálogo.
+
+Em vez de SELECT COUNT(*) em cada tabela (varredura completa) e de contar
+colunas no information_schema com subconsulta correlacionada, uma única
+consulta ao pg_class / pg_stat_user_tables / pg_attribute traz, por tabela,
+linhas estimadas, colunas, tamanho e a data do último ANALYZE. O custo é
+proporcional ao número de tabelas, não de linhas.
+
+Contagens exatas são opcionais e rodam em uma thread de fundo; o resultado
+fica disponível em obter_contagem_exata().
+"""
+
+import sys
+import logging
+import threading
+from datetime import datetime
+
+from catalogo_schema import prefixo_cliente
+from armazenamento_clientes import filtro_catalogo
+from pool_conexoes import obter_conexao
+
+# 🔧 [LOGGING] Configuração de logging para Render
+def setup_render_logging():
+    """Configura logging para ser visível no Render"""
+    logger = logging.getLogger('soliris_visao_geral')
+    if not logger.handlers:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setLevel(logging.INFO)
+        formatter = logging.Formatter(
+            '%(asctime)s - SOLIRIS-VISAO-GERAL - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+        console_handler.setFormatter(formatter)
+        logger.addHandler(console_handler)
+        logger.setLevel(logging.INFO)
+    return logger
+
+# Inicializar logger
+render_logger = setup_render_logging()
+
+# {id_client: {"status", "tabelas": {nome: linhas}, "iniciado_em", "concluido_em", "erro"}}
+_contagens: dict[int, dict] = {}
+_contagens_lock = threading.Lock()
+
+def estatisticas_tabelas(id_client: int) -> list[dict]:
+    """
+    Uma linha por tabela do cliente, em uma única consulta ao catálogo:
+    {nome, colunas, registros (estimado), bytes, ultimo_analyze, modificacoes_desde_analyze}
+    """
+    conn = obter_conexao(id_client)
+    cursor = conn.cursor()
+    condicao, params = filtro_catalogo(id_client, "n.nspname", "c.relname")
+    try:
+        cursor.execute(f"""
+            SELECT c.relname,
+                   c.reltuples,
+                   s.n_live_tup,
+                   (SELECT COUNT(*) FROM pg_attribute a
+                     WHERE a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped) AS colunas,
+                   pg_total_relation_size(c.oid) AS bytes,
+                   GREATEST(s.last_analyze, s.last_autoanalyze) AS ultimo_analyze,
+                   s.n_mod_since_analyze
+              FROM pg_class c
+              JOIN pg_namespace n ON n.oid = c.relnamespace
+              LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+             WHERE {condicao}
+               AND c.relkind IN ('r', 'p')
+             ORDER BY c.relname
+        """, params)
+        linhas = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+    tabelas = []
+    for nome, reltuples, n_live_tup, colunas, tamanho, ultimo_analyze, modificacoes in linhas:
+        # reltuples = -1 (PG14+) ou 0 quando a tabela nunca foi analisada
+        if reltuples is not None and reltuples > 0:
+            registros, fonte = int(reltuples), "pg_class.reltuples"
+        else:
+            registros, fonte = int(n_live_tup or 0), "pg_stat_user_tables.n_live_tup"
+        tabelas.append({
+            "nome": nome,
+            "colunas": int(colunas),
+            "registros": registros,
+            "registros_fonte": fonte,
+            "bytes": int(tamanho or 0),
+            "ultimo_analyze": ultimo_analyze,
+            "modificacoes_desde_analyze": int(modificacoes or 0),
+            "tipo": "kpis" if "kpis" in nome else "dados",
+        })
+    return tabelas
+
+def contadores_alteracao(id_client: int) -> dict[str, tuple]:
+    """
+    Marca d'água de alteração por tabela do cliente:
+    {nome: (relid, n_tup_ins, n_tup_upd, n_tup_del)}.
+    Qualquer INSERT/UPDATE/DELETE muda os contadores; recriar a tabela
+    (troca atômica, replace) muda o relid.
+    """
+    conn = obter_conexao(id_client)
+    cursor = conn.cursor()
+    condicao, params = filtro_catalogo(id_client, "schemaname", "relname")
+    try:
+        cursor.execute(f"""
+            SELECT relname, relid, n_tup_ins, n_tup_upd, n_tup_del
+              FROM pg_stat_user_tables
+             WHERE {condicao}
+        """, params)
+        return {nome: (relid, ins, upd, dele) for nome, relid, ins, upd, dele in cursor.fetchall()}
+    finally:
+        cursor.close()
+        conn.close()
+
+def _contar_exato(id_client: int, nomes: list[str]):
+    with _contagens_lock:
+        estado = _contagens[id_client]
+    try:
+        for nome in nomes:
+            conn = obter_conexao(id_client)
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f'SELECT COUNT(*) FROM "{nome}"')
+                contagem = cursor.fetchone()[0]
+            except Exception as e:
+                conn.rollback()
+                contagem = None
+                render_logger.warning(f"⚠️ [VISAO] Contagem de {nome} falhou: {e}")
+            finally:
+                cursor.close()
+                conn.close()
+            with _contagens_lock:
+                estado["tabelas"][nome] = contagem
+        with _contagens_lock:
+            estado["status"] = "concluido"
+    except Exception as e:
+        with _contagens_lock:
+            estado["status"] = "erro"
+            estado["erro"] = str(e)
+    with _contagens_lock:
+        estado["concluido_em"] = datetime.now()
+    render_logger.info(f"🔢 [VISAO] Contagem exata do cliente {id_client}: {estado['status']}")
+
+def _copia_estado(estado: dict) -> dict:
+    return {**estado, "tabelas": dict(estado["tabelas"])}
+
+def iniciar_contagem_exata(id_client: int, nomes: list[str] = None) -> dict:
+    """
+    Dispara as contagens exatas em segundo plano (uma por vez, para não
+    competir com o uso normal do banco). Não inicia outra se já houver uma
+    em andamento para o cliente.
+    """
+    with _contagens_lock:
+        atual = _contagens.get(id_client)
+        if atual and atual["status"] == "executando":
+            return _copia_estado(atual)
+    # consulta ao catálogo fora do lock: não segura as páginas que leem o estado
+    if nomes is None:
+        nomes = [t["nome"] for t in estatisticas_tabelas(id_client)]
+    with _contagens_lock:
+        atual = _contagens.get(id_client)
+        if atual and atual["status"] == "executando":
+            return _copia_estado(atual)
+        _contagens[id_client] = {
+            "status": "executando",
+            "tabelas": {},
+            "total_tabelas": len(nomes),
+            "iniciado_em": datetime.now(),
+            "concluido_em": None,
+            "erro": None,
+        }
+        estado = _copia_estado(_contagens[id_client])
+    threading.Thread(
+        target=_contar_exato, args=(id_client, nomes), daemon=True,
+        name=f"contagem-exata-{id_client}"
+    ).start()
+    return estado
+
+def obter_contagem_exata(id_client: int):
+    """Estado da última contagem exata do cliente (ou None)"""
+    with _contagens_lock:
+        estado = _contagens.get(id_client)
+        return _copia_estado(estado) if estado is not None else None
+
+def obter_visao_geral(id_client: int, contagem_exata: bool = False) -> dict:
+    """
+    Integridade do cliente: usuário, tabelas (com linhas estimadas) e,
+    se contagem_exata=True, dispara a contagem exata em segundo plano.
+    """
+    conn = obter_conexao(id_client)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT id, nome, email FROM usuarios WHERE id = %s", (id_client,))
+        usuario = cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+
+    if not usuario:
+        return {"erro": f"Usuário com ID {id_client} não encontrado"}
+
+    tabelas = estatisticas_tabelas(id_client)
+    visao = {
+        "usuario": {"id": usuario[0], "nome": usuario[1], "email": usuario[2]},
+        "tabelas": tabelas,
+        "total_tabelas": len(tabelas),
+        "tem_dados": len(tabelas) > 0,
+        "tem_kpis": any(t["tipo"] == "kpis" for t in tabelas),
+        "registros_estimados": True,
+        "prefixo_esperado": prefixo_cliente(id_client),
+    }
+    if contagem_exata:
+        visao["contagem_exata"] = iniciar_contagem_exata(id_client, [t["nome"] for t in tabelas])
+    elif id_client in _contagens:
+        visao["contagem_exata"] = obter_contagem_exata(id_client)
+    return visao